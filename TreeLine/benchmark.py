@@ -0,0 +1,730 @@
+#!/usr/bin/env python3
+
+"""
+****************************************************************************
+ benchmark.py, times TreeLine operations on large generated trees
+
+ Copyright (C) 2015, Douglas W. Bell
+
+ This is free software; you can redistribute it and/or modify it under the
+ terms of the GNU General Public License, either Version 2 or any later
+ version.  This program is distributed in the hope that it will be useful,
+ but WITTHOUT ANY WARRANTY.  See the included LICENSE file for details.
+*****************************************************************************
+"""
+
+import sys
+import os.path
+import io
+import ast
+import re
+import bisect
+import gc
+import time
+import random
+import getopt
+import types
+import builtins
+import collections
+import tracemalloc
+from xml.etree import ElementTree
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)),
+                                'source'))
+
+defaultNumNodes = 100000
+_wordChars = ('bcdfghklmnprstvz', 'aeiou')
+
+
+def markNoTranslate(text, comment=''):
+    """Dummy translation function, as used by TreeLine without translations.
+
+    Arguments:
+        text -- the text to be translated
+        comment -- a comment used only as a guide for translators
+    """
+    return text
+
+builtins._ = markNoTranslate
+builtins.N_ = markNoTranslate
+
+from PyQt4 import QtCore, QtGui
+import globalref
+import options
+import optiondefaults
+import treeopener
+import conditional
+import treeselection
+import miscdialogs
+import treeview
+import treelocalcontrol
+import matheval
+import searchhighlight
+
+
+def usage(exitCode=2):
+    """Display usage info and exit.
+
+    Arguments:
+        exitCode -- the code to return when exiting.
+    """
+    print('Usage:')
+    print('    python benchmark.py [-h] [-n nodes] [name ...]')
+    print('where:')
+    print('    -h         display this help message')
+    print('    -n nodes   generated tree size [default: {0}]'
+          .format(defaultNumNodes))
+    print('    name       benchmarks to run [default: all]')
+    print('benchmarks:')
+    for name, func in benchmarkFunctions.items():
+        print('    {0:<10} {1}'.format(name, func.__doc__.split('\n')[0]))
+    sys.exit(exitCode)
+
+
+def treeXml(numNodes, breadth=10, mathFields=(), rootFields=()):
+    """Return TreeLine file data with a generated tree.
+
+    Nodes are added breadth first, with up to breadth children each.  The
+    items have a name, a number and a notes field with random words.
+    Arguments:
+        numNodes -- the total number of nodes
+        breadth -- the maximum number of children per node
+        mathFields -- a list of (name, equation) tuples for the item type
+        rootFields -- a list of (name, text) tuples for root number fields
+    """
+    rand = random.Random(0)
+    words = [''.join(rand.choice(_wordChars[i % 2]) for i in
+                     range(rand.randint(3, 8))) for j in range(2000)]
+    root = ElementTree.Element('ROOT', {'item': 'y', 'tlversion': '2.0.2',
+                                        'uniqueid': 'root',
+                                        'line0': '{*Name*}'})
+    ElementTree.SubElement(root, 'Name', {'type': 'Text'}).text = 'Root'
+    for name, text in rootFields:
+        ElementTree.SubElement(root, name, {'type': 'Number'}).text = text
+    parents = collections.deque([root])
+    childCount = 0
+    for num in range(1, numNodes):
+        if childCount == breadth:
+            parents.popleft()
+            childCount = 0
+        item = ElementTree.SubElement(parents[0], 'ITEM',
+                                      {'item': 'y', 'uniqueid':
+                                       'item{0}'.format(num),
+                                       'line0': '{*Name*}'})
+        ElementTree.SubElement(item, 'Name', {'type': 'Text'}).text = \
+                               '{0} {1}'.format(rand.choice(words), num)
+        ElementTree.SubElement(item, 'Amount',
+                               {'type': 'Number', 'format': '#.##'}).text = \
+                               repr(rand.randint(1, 100000) / 100)
+        ElementTree.SubElement(item, 'Notes', {'type': 'Text'}).text = \
+                               ' '.join(rand.sample(words, 8))
+        for name, eqn in mathFields:
+            ElementTree.SubElement(item, name, {'type': 'Math', 'eqn': eqn,
+                                                'format': '#.##'})
+        parents.append(item)
+        childCount += 1
+    return ElementTree.tostring(root, 'utf-8')
+
+
+def loadModel(data):
+    """Return a tree model read from TreeLine file data.
+
+    Arguments:
+        data -- the file contents as bytes
+    """
+    if not globalref.genOptions:
+        globalref.genOptions = options.Options()
+        optiondefaults.setGenOptionDefaults(globalref.genOptions)
+    return treeopener.TreeOpener().readFile(io.BytesIO(data))
+
+
+def application():
+    """Return the Qt application, creating it if needed for widget tests.
+    """
+    return QtGui.QApplication.instance() or QtGui.QApplication(sys.argv)
+
+
+def updateAllMath(model):
+    """Recalculate all math fields in the model, return the changed nodes.
+
+    Uses the local control's full update, which only needs the model.
+    Arguments:
+        model -- the tree model to update
+    """
+    control = types.SimpleNamespace(model=model)
+    return treelocalcontrol.TreeLocalControl.updateAllMathFields(control)
+
+
+def bestTime(func, *args, repeat=3):
+    """Return the lowest run time in seconds and the last function result.
+
+    Arguments:
+        func -- the function to time
+        *args -- the function arguments
+        repeat -- the number of runs
+    """
+    times = []
+    for i in range(repeat):
+        startTime = time.perf_counter()
+        result = func(*args)
+        times.append(time.perf_counter() - startTime)
+    return min(times), result
+
+
+def report(label, value, unit='ms'):
+    """Print a benchmark result line.
+
+    Arguments:
+        label -- a description of the result
+        value -- the result value, seconds are printed as milliseconds
+        unit -- the unit of the value
+    """
+    if unit == 'ms':
+        value *= 1000
+    print('    {0:<46}{1:>12.2f} {2}'.format(label, value, unit))
+
+
+def memoryBenchmark(numNodes):
+    """Memory used per node by a loaded tree.
+
+    Run on different commits to compare node storage changes.
+    Arguments:
+        numNodes -- the number of nodes to generate
+    """
+    data = treeXml(numNodes)
+    gc.collect()
+    tracemalloc.start()
+    model = loadModel(data)
+    gc.collect()
+    size = tracemalloc.get_traced_memory()[0]
+    tracemalloc.stop()
+    report('tree memory per node', size / numNodes, 'bytes')
+    node = model.root.childList[0]
+    nodeSize = sys.getsizeof(node)
+    if hasattr(node, '__dict__'):
+        nodeSize += sys.getsizeof(node.__dict__)
+    report('node object size', nodeSize, 'bytes')
+    del model
+
+
+def scrollBenchmark(numNodes):
+    """Row lookups for a view scrolling through a wide tree.
+
+    All generated nodes are children of the root.
+    Arguments:
+        numNodes -- the number of nodes to generate
+    """
+    model = loadModel(treeXml(numNodes, numNodes))
+    root = model.root
+    rootIndex = model.index(0, 0, QtCore.QModelIndex())
+
+    def scrollPass():
+        for row in range(root.numChildren()):
+            index = model.index(row, 0, rootIndex)
+            model.data(index)
+            model.parent(index)
+            index.internalPointer().row()
+
+    def movedRowPass():
+        root.childList.insert(0, root.childList.pop())
+        for child in root.childList:
+            child.row()
+
+    report('index, title and row of each child', bestTime(scrollPass)[0])
+    report('row of each child after a move', bestTime(movedRowPass)[0])
+
+
+def sortBenchmark(numNodes):
+    """Sorting a large selection in tree order.
+
+    Arguments:
+        numNodes -- the number of nodes to generate
+    """
+    model = loadModel(treeXml(numNodes))
+    nodes = list(model.root.descendantGen())
+    random.Random(0).shuffle(nodes)
+    selection = nodes[:numNodes // 10]
+
+    def sortAfterChange(nodes):
+        model.structureChanged()
+        return model.sortedNodes(nodes)
+
+    report('sort 10% of nodes after a structure change',
+           bestTime(sortAfterChange, selection)[0])
+    report('sort 10% of nodes', bestTime(model.sortedNodes, selection)[0])
+    report('sort 10 nodes after a structure change',
+           bestTime(sortAfterChange, selection[:10])[0])
+
+
+def branchBenchmark(numNodes):
+    """Filtering a large selection to the tops of unique branches.
+
+    Arguments:
+        numNodes -- the number of nodes to generate
+    """
+    model = loadModel(treeXml(numNodes))
+    nodes = list(model.root.descendantGen())
+    random.Random(0).shuffle(nodes)
+    selection = nodes[:numNodes // 10]
+    model.treePosition(model.root)
+    report('unique branches of 10% of nodes',
+           bestTime(model.uniqueBranches, selection)[0])
+
+
+def findBenchmark(numNodes):
+    """Word searches with the search index versus a scan of all nodes.
+
+    Arguments:
+        numNodes -- the number of nodes to generate
+    """
+    model = loadModel(treeXml(numNodes))
+    word = model.root.childList[0].data['Notes'].split()[0]
+
+    def scanSearch(word):
+        return {node for node in model.root.descendantGen() if
+                word in node.searchStrings()[2]}
+
+    report('scan of all node text', bestTime(scanSearch, word)[0])
+    report('index build and first query',
+           bestTime(model.searchIndex.wordCandidates, [word], repeat=1)[0])
+    report('indexed query', bestTime(model.searchIndex.wordCandidates,
+                                     [word])[0])
+    node = model.root.childList[0]
+
+    def editAndQuery(word):
+        node.data['Notes'] += ' ' + word
+        model.nodeDataChanged(node)
+        return model.searchIndex.wordCandidates([word])
+
+    report('indexed query after a node edit', bestTime(editAndQuery, word)[0])
+
+
+def findNextBenchmark(numNodes):
+    """Repeated find next steps, also after data undo and full cache clears.
+
+    Arguments:
+        numNodes -- the number of nodes to generate
+    """
+    model = loadModel(treeXml(numNodes))
+    word = model.root.childList[0].data['Notes'].split()[0]
+    currentNode = [model.root]
+
+    def findNext(numSteps=100):
+        for i in range(numSteps):
+            candidates = model.searchIndex.wordCandidates([word])
+            nodes = sorted(candidates, key=model.treePosition)
+            positions = [model.treePosition(node) for node in nodes]
+            splitPos = bisect.bisect_right(positions,
+                                           model.treePosition(currentNode[0]))
+            for node in nodes[splitPos:] + nodes[:splitPos]:
+                if node.wordSearch([word]):
+                    currentNode[0] = node
+                    break
+
+    findNext(1)
+    report('100 find next steps', bestTime(findNext)[0])
+    node = model.root.childList[-1]
+
+    def undoAndFind():
+        node.data['Notes'] = node.data['Notes'][::-1]
+        model.nodeDataChanged(node)
+        model.structureChanged()
+        findNext(1)
+
+    def clearAndFind():
+        model.clearNodeCaches()
+        findNext(1)
+
+    report('find next after a data undo', bestTime(undoAndFind)[0])
+    report('find next after clearing all node caches',
+           bestTime(clearAndFind)[0])
+
+
+def filterBenchmark(numNodes):
+    """Streaming regular expression filter results and the cancel latency.
+
+    The filter view adds matches in timed batches.  The first batch is the
+    delay before the list starts to fill and the longest batch is the most
+    that an escape key press waits before the filter is cancelled.
+    Arguments:
+        numNodes -- the number of nodes to generate
+    """
+    app = application()
+    model = loadModel(treeXml(numNodes))
+    globalref.genOptions.changeValue('ShowTreeIcons', False)
+    statusBar = QtGui.QStatusBar()
+    globalref.mainControl = types.SimpleNamespace(currentStatusBar=lambda:
+                                                  statusBar)
+    view = treeview.TreeFilterView(model, treeselection.TreeSelection(model),
+                                   {})
+    view.filterHow = miscdialogs.FindFilterDialog.regExp
+    view.filterStr = r'\b[bcd]\w*a\b'
+    batchTimes = []
+
+    def streamFilter():
+        batchTimes.clear()
+        startTime = time.perf_counter()
+        view.updateContents()
+        batchTimes.append(time.perf_counter() - startTime)
+        while view.filterNodeGen:
+            view.filterTimer.stop()
+            startTime = time.perf_counter()
+            view.filterNextBatch()
+            batchTimes.append(time.perf_counter() - startTime)
+        return view.count()
+
+    allTime, count = bestTime(streamFilter)
+    report('first filter batch', batchTimes[0])
+    report('all filter batches', allTime)
+    report('filter batches', len(batchTimes), 'batches')
+    report('longest batch (cancel latency)', max(batchTimes))
+    report('matched nodes', count, 'nodes')
+
+    def cancelFilter():
+        view.updateContents()
+        startTime = time.perf_counter()
+        view.cancelFilter()
+        return time.perf_counter() - startTime, view.count()
+
+    cancelTime, count = cancelFilter()
+    report('cancel after the first batch', cancelTime)
+    report('nodes kept after cancel', count, 'nodes')
+    node = list(model.root.descendantGen())[-1]
+
+    def cancelledEditUpdate():
+        node.data['Name'] = node.data['Name'][::-1]
+        model.nodeDataChanged(node)
+        view.updateNodes([node])
+
+    report('update after cancel', bestTime(cancelledEditUpdate)[0])
+
+
+def conditionBenchmark(numNodes):
+    """Conditional find with the field value index versus a full scan.
+
+    Arguments:
+        numNodes -- the number of nodes to generate
+    """
+    model = loadModel(treeXml(numNodes))
+    condition = conditional.Conditional('Amount > "990"')
+
+    def scanSearch():
+        return [node for node in model.root.descendantGen() if
+                condition.evaluate(node)]
+
+    def indexedSearch():
+        return [node for node in condition.candidateNodes(model) if
+                condition.evaluate(node)]
+
+    report('scan of all nodes', bestTime(scanSearch)[0])
+    report('index build and first query', bestTime(indexedSearch,
+                                                   repeat=1)[0])
+    report('indexed query', bestTime(indexedSearch)[0])
+
+
+def filterEditBenchmark(numNodes):
+    """Updating a filtered list after a node edit.
+
+    Compares re-testing the edited node in place with rebuilding the list,
+    also for an edit that changes math fields in all of its ancestors.
+    Arguments:
+        numNodes -- the number of nodes to generate
+    """
+    app = application()
+    model = loadModel(treeXml(numNodes))
+    globalref.genOptions.changeValue('ShowTreeIcons', False)
+    view = treeview.TreeFilterView(model, treeselection.TreeSelection(model),
+                                   {})
+    view.filterMatchFunc = lambda node: node.wordSearch(['e'])
+
+    def rebuild():
+        view.blockSignals(True)
+        view.clear()
+        for node in model.root.descendantGen():
+            if view.filterMatchFunc(node):
+                treeview.TreeFilterViewItem(node, view)
+        view.blockSignals(False)
+
+    report('rebuild of the filtered list', bestTime(rebuild)[0])
+    node = list(model.root.descendantGen())[numNodes // 2]
+
+    def editUpdate():
+        node.data['Notes'] = node.data['Notes'][::-1]
+        model.nodeDataChanged(node)
+        view.updateNodes([node])
+
+    report('in place update after an edit', bestTime(editUpdate)[0])
+    model = loadModel(treeXml(numNodes, 2,
+                              mathFields=[('Total', '{*Amount*} + '
+                                                    'sum({*&Total*})')]))
+    updateAllMath(model)
+    view.model = model
+    view.filterMatchFunc = lambda node: node.data['Total'].endswith('5')
+    rebuild()
+    leaf = list(model.root.descendantGen())[-1]
+
+    def mathEditUpdate():
+        leaf.data['Amount'] = repr(float(leaf.data['Amount']) + 1)
+        model.nodeDataChanged(leaf)
+        changedNodes = model.updateMathFields([leaf])
+        view.updateNodes([leaf] + list(changedNodes - {leaf}))
+
+    report('in place update after a math edit', bestTime(mathEditUpdate)[0])
+    report('math rebuild of the filtered list', bestTime(rebuild)[0])
+
+
+def mathAllBenchmark(numNodes):
+    """Full tree math updates in batches versus node by node recalculation.
+
+    Arguments:
+        numNodes -- the number of nodes to generate
+    """
+    model = loadModel(treeXml(numNodes,
+                              mathFields=[('Double', '{*Amount*} * 2 + 1'),
+                                          ('Total', 'sum({*&Amount*})')]))
+    nodes = list(model.root.descendantGen())
+
+    def clearResults():
+        for node in nodes:
+            node.data.pop('Double', None)
+            node.data.pop('Total', None)
+
+    clearResults()
+    report('batched full update', bestTime(updateAllMath, model,
+                                           repeat=1)[0])
+    clearResults()
+    report('node by node recalculation', bestTime(model.updateMathFields,
+                                                  nodes, repeat=1)[0])
+
+
+def recalcBenchmark(numNodes):
+    """Dependent math recalculation after a leaf node edit.
+
+    Each item has a running total of its own amount and its children's
+    totals, so an edit is recalculated up through all ancestors.
+    Arguments:
+        numNodes -- the number of nodes to generate
+    """
+    model = loadModel(treeXml(numNodes, 2,
+                              mathFields=[('Total', '{*Amount*} + '
+                                                    'sum({*&Total*})')]))
+    updateAllMath(model)
+    leaf = list(model.root.descendantGen())[-1]
+
+    def editLeaf():
+        leaf.data['Amount'] = repr(float(leaf.data['Amount']) + 1)
+        model.nodeDataChanged(leaf)
+        return model.updateMathFields([leaf])
+
+    editTime, changedNodes = bestTime(editLeaf)
+    report('recalculation after a leaf edit', editTime)
+    report('recalculated fields', model.mathRecalcCount, 'fields')
+    report('leaf depth', leaf.depth(), 'levels')
+
+
+def childrenBenchmark(numNodes):
+    """Child aggregate update after an edit in a wide tree.
+
+    Compares updating the stored child values of the parent with
+    rebuilding them from all of the children.
+    Arguments:
+        numNodes -- the number of nodes to generate
+    """
+    model = loadModel(treeXml(numNodes, 1000,
+                              mathFields=[('Total', 'sum({*&Amount*})')]))
+    updateAllMath(model)
+    parent = model.root.childList[0]
+    child = parent.childList[-1]
+
+    def editChild(rebuild=False):
+        if rebuild:
+            model.aggregateStamp += 1
+        child.data['Amount'] = repr(float(child.data['Amount']) + 1)
+        model.nodeDataChanged(child)
+        return model.updateMathFields([child])
+
+    editTime, changedNodes = bestTime(editChild)
+    report('update after a child edit', editTime)
+    rebuildTime, changedNodes = bestTime(editChild, True)
+    report('rebuild after a child edit', rebuildTime)
+    report('sibling count', len(parent.childList), 'nodes')
+
+
+def mathRepeatBenchmark(numNodes):
+    """Full tree math update with and without changed results.
+
+    Arguments:
+        numNodes -- the number of nodes to generate
+    """
+    model = loadModel(treeXml(numNodes,
+                              mathFields=[('Double', '{*Amount*} * 2 + 1'),
+                                          ('Total', 'sum({*&Double*})')]))
+    nodes = list(model.root.descendantGen())
+
+    def changedUpdate():
+        for node in nodes:
+            node.data.pop('Double', None)
+            node.data.pop('Total', None)
+        return updateAllMath(model)
+
+    changeTime, changedNodes = bestTime(changedUpdate)
+    report('full update with all results changed', changeTime)
+    report('changed nodes', len(changedNodes), 'nodes')
+    repeatTime, changedNodes = bestTime(updateAllMath, model)
+    report('full update without changes', repeatTime)
+    report('changed nodes', len(changedNodes), 'nodes')
+
+
+def foldBenchmark(numNodes):
+    """Compiled equation evaluation with and without constant folding.
+
+    Arguments:
+        numNodes -- the number of values to evaluate
+    """
+    equation = matheval.MathEquation('{*Amount*} * (sqrt(2) + pi / 4) + '
+                                     '100 * 12 / 7 - round(e, 3)')
+    argNames = ['_refValue0']
+    tree = ast.parse(equation.formattedEqnText.format(*argNames))
+    unfoldedFunc = matheval.compiledFunction(argNames, tree.body[0].value,
+                                             matheval.safeGlobals)
+    rand = random.Random(0)
+    values = [rand.randint(1, 100000) / 100 for i in range(numNodes)]
+
+    def evaluate(func):
+        return [func(value) for value in values]
+
+    report('unfolded equation', bestTime(evaluate, unfoldedFunc)[0])
+    report('folded equation', bestTime(evaluate, equation.evalFunc)[0])
+
+
+def decimalBenchmark(numNodes):
+    """Full tree math updates with float versus decimal arithmetic.
+
+    Arguments:
+        numNodes -- the number of nodes to generate
+    """
+    model = loadModel(treeXml(numNodes,
+                              mathFields=[('Price', '{*Amount*} * 1.075 + '
+                                                    '0.25'),
+                                          ('Total', 'sum({*&Amount*}) / 3')]))
+    nodes = list(model.root.descendantGen())
+
+    def fullUpdate():
+        for node in nodes:
+            node.data.pop('Price', None)
+            node.data.pop('Total', None)
+        model.clearNodeCaches()
+        return updateAllMath(model)
+
+    for label, digits in (('float math update', 0),
+                          ('decimal math update (28 digits)', 28)):
+        model.mathDecimalDigits = digits
+        report(label, bestTime(fullUpdate)[0])
+
+
+def compiledBenchmark(numNodes):
+    """Compiled equation evaluation versus evaluating substituted text.
+
+    Arguments:
+        numNodes -- the number of values to evaluate
+    """
+    equation = matheval.MathEquation('({*Amount*} - 500) ** 2 / 1000 + '
+                                     'sqrt({*Amount*})')
+    rand = random.Random(0)
+    values = [rand.randint(1, 100000) / 100 for i in range(numNodes)]
+
+    def textEval():
+        return [eval(equation.formattedEqnText.format(repr(value),
+                                                      repr(value)),
+                     matheval.safeGlobals) for value in values]
+
+    def compiledEval():
+        return [equation.evalFunc(value, value) for value in values]
+
+    report('text evaluation', bestTime(textEval)[0])
+    report('compiled evaluation', bestTime(compiledEval)[0])
+
+
+def highlightBenchmark(numNodes):
+    """Highlighting many search terms, prefix tree versus word alternation.
+
+    The alternation tries every term at each text position, while the
+    prefix tree pattern only follows the terms starting with the text.
+    Arguments:
+        numNodes -- the number of nodes to generate
+    """
+    model = loadModel(treeXml(numNodes))
+    texts = [node.data['Notes'] for node in
+             model.root.descendantGen()][:2000]
+    words = sorted({word for text in texts for word in text.split()})
+    rand = random.Random(0)
+    for numTerms in (10, 100, 1000):
+        terms = rand.sample(words, min(numTerms, len(words)))
+        spec = searchhighlight.HighlightSpec(terms)
+        altPattern = '|'.join(re.escape(term) for term in
+                              sorted(terms, key=len, reverse=True))
+        altRegExp = re.compile('(?=({0}))'.format(altPattern), re.IGNORECASE)
+
+        def treeSpans():
+            return sum(len(spec.spans(text)) for text in texts)
+
+        def alternationSpans():
+            return sum(1 for text in texts for match in
+                       altRegExp.finditer(text))
+
+        report('{0} terms, prefix tree'.format(len(terms)),
+               bestTime(treeSpans)[0])
+        report('{0} terms, alternation'.format(len(terms)),
+               bestTime(alternationSpans)[0])
+
+
+benchmarkFunctions = collections.OrderedDict([('memory', memoryBenchmark),
+                                              ('scroll', scrollBenchmark),
+                                              ('sort', sortBenchmark),
+                                              ('branches', branchBenchmark),
+                                              ('find', findBenchmark),
+                                              ('filter', filterBenchmark),
+                                              ('condition',
+                                               conditionBenchmark),
+                                              ('filteredit',
+                                               filterEditBenchmark),
+                                              ('mathall', mathAllBenchmark),
+                                              ('recalc', recalcBenchmark),
+                                              ('children',
+                                               childrenBenchmark),
+                                              ('mathrepeat',
+                                               mathRepeatBenchmark),
+                                              ('fold', foldBenchmark),
+                                              ('decimal', decimalBenchmark),
+                                              ('compiled',
+                                               compiledBenchmark),
+                                              ('findnext',
+                                               findNextBenchmark),
+                                              ('highlight',
+                                               highlightBenchmark)])
+
+
+def main():
+    """Main benchmark function.
+    """
+    try:
+        opts, args = getopt.getopt(sys.argv[1:], 'hn:')
+    except getopt.GetoptError:
+        usage(2)
+    numNodes = defaultNumNodes
+    for opt, val in opts:
+        if opt == '-h':
+            usage(0)
+        elif opt == '-n':
+            numNodes = int(val)
+    for name in args:
+        if name not in benchmarkFunctions:
+            print('Unknown benchmark: {0}'.format(name))
+            usage(2)
+    for name in args or benchmarkFunctions.keys():
+        print('{0} ({1} nodes):'.format(name, numNodes))
+        benchmarkFunctions[name](numNodes)
+
+
+if __name__ == '__main__':
+    main()
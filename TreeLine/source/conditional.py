@@ -13,18 +13,24 @@
 #******************************************************************************
 
 import re
+import time
+import operator
 from PyQt4 import QtCore, QtGui
 import treeformats
+import fieldformat
 import configdialog
 import undo
 import globalref
 
 _operators = ['==', '<', '<=', '>', '>=', '!=', N_('starts with'),
               N_('ends with'), N_('contains'), N_('True'), N_('False')]
-_functions = {'==': '__eq__', '<': '__lt__', '<=': '__le__',
-              '>': '__gt__', '>=': '__ge__', '!=': '__ne__',
-              'starts with': 'startswith', 'ends with': 'endswith',
-              'contains': 'contains', 'True': 'true', 'False': 'false'}
+_compareFunctions = {'==': operator.eq, '<': operator.lt, '<=': operator.le,
+                     '>': operator.gt, '>=': operator.ge, '!=': operator.ne}
+_textOperators = frozenset(['starts with', 'ends with', 'contains'])
+# field types that use their ISO text for text operators and invalid values
+_compareTextTypes = frozenset(['Date', 'Time'])
+_currentTimeValues = frozenset([fieldformat._dateStampString,
+                                fieldformat._timeStampString])
 _boolOper = [N_('and'), N_('or')]
 _allTypeEntry = _('[All Types]')
 _parseRe = re.compile(r'((?:and)|(?:or)) (\S+) (.+?) '
@@ -50,6 +56,10 @@ class Conditional:
             self.conditionLines.append(ConditionLine(boolOper, fieldName,
                                                      oper, value))
         self.origNodeFormatName = nodeFormatName
+        # compiled test functions by node format, with the model cache stamp
+        self.compiledFuncs = {}
+        # set by compile if "Now" values need a recompile each second
+        self.usesCurrentTime = False
         self.nodeFormatNames = set()
         if nodeFormatName:
             self.nodeFormatNames.add(nodeFormatName)
@@ -66,10 +76,82 @@ class Conditional:
         if (self.nodeFormatNames and
             node.formatName not in self.nodeFormatNames):
             return False
-        result = True
-        for conditon in self.conditionLines:
-            result = conditon.evaluate(node, result)
-        return result
+        nodeFormat = node.nodeFormat()
+        try:
+            funcStamp, func = self.compiledFuncs[nodeFormat]
+            if funcStamp != self.compileStamp(node.modelRef):
+                raise KeyError
+        except KeyError:
+            func = self.compile(nodeFormat)
+            self.compiledFuncs[nodeFormat] = (self.compileStamp(node.modelRef),
+                                              func)
+        return func(node)
+
+    def compileStamp(self, modelRef):
+        """Return a stamp that changes when compiled functions are outdated.
+
+        Includes the current second if a "Now" value was adjusted.
+        Arguments:
+            modelRef -- the tree model of the evaluated nodes
+        """
+        if self.usesCurrentTime:
+            return (modelRef.cacheStamp, int(time.time()))
+        return modelRef.cacheStamp
+
+    def compile(self, nodeFormat):
+        """Return a function that evaluates this condition for a node format.
+
+        The fields are found and the comparison values are adjusted once,
+        so the returned function only gets the node values and compares.
+        The function takes a node of the given format as its only argument.
+        Arguments:
+            nodeFormat -- the format of the nodes to be evaluated
+        """
+        tests = [(condition.boolOper == 'and', condition.compile(nodeFormat))
+                 for condition in self.conditionLines]
+        self.usesCurrentTime = any(condition.value in _currentTimeValues for
+                                   condition in self.conditionLines)
+
+        def evaluate(node):
+            result = True
+            for isAnd, test in tests:
+                if result:
+                    if isAnd:
+                        result = test(node)
+                elif not isAnd:
+                    result = test(node)
+            return result
+
+        return evaluate
+
+    def candidateNodes(self, modelRef):
+        """Return a set of nodes that may match this condition from the index.
+
+        The nodes must still be verified with the evaluate method.
+        Returns None if the condition can not be used to limit the search
+        (no lines or any "or" lines).
+        Arguments:
+            modelRef -- the tree model to search
+        """
+        if not self.conditionLines or any(condition.boolOper != 'and' for
+                                          condition in self.conditionLines):
+            return None
+        if self.nodeFormatNames:
+            nodeFormats = [modelRef.formats[name] for name in
+                           self.nodeFormatNames if name in modelRef.formats]
+        else:
+            nodeFormats = list(modelRef.formats.values())
+        candidates = None
+        for condition in self.conditionLines:
+            nodes = set()
+            for nodeFormat in nodeFormats:
+                if condition.fieldName in nodeFormat.fieldDict:
+                    nodes.update(modelRef.fieldIndex.
+                                 matchingNodes(nodeFormat, condition))
+            candidates = nodes if candidates is None else candidates & nodes
+            if not candidates:
+                break
+        return candidates
 
     def conditionStr(self):
         """Return the condition string for this condition set.
@@ -87,6 +169,7 @@ class Conditional:
         for condition in self.conditionLines:
             if condition.fieldName == oldName:
                 condition.fieldName = newName
+        self.compiledFuncs = {}
 
     def removeField(self, fieldname):
         """Remove conditional lines referencing the given field.
@@ -97,12 +180,22 @@ class Conditional:
         for condition in self.conditionLines[:]:
             if condition.fieldName == fieldname:
                 self.conditionLines.remove(condition)
+        self.compiledFuncs = {}
 
     def __len__(self):
         """Return the number of conditions for truth testing.
         """
         return len(self.conditionLines)
 
+    def __getstate__(self):
+        """Return the state for copies, excluding the compiled functions.
+
+        Avoids copying the node formats used as keys with the tree formats.
+        """
+        state = self.__dict__.copy()
+        state['compiledFuncs'] = {}
+        return state
+
 
 class ConditionLine:
     """Stores & evaluates a portion of a conditional comparison.
@@ -134,61 +227,80 @@ class ConditionLine:
             if self.boolOper == 'and':
                 return False
             return prevResult
-        dataStr = field.compareValue(node)
-        value = field.adjustedCompareValue(self.value)
-        try:
-            func = getattr(dataStr, _functions[self.oper])
-        except AttributeError:
-            dataStr = StringOps(dataStr)
-            func = getattr(dataStr, _functions[self.oper])
-            value = str(value)
+        result = self.valueTest(field)(field.compareValue(node))
         if self.boolOper == 'and':
-            return prevResult and func(value)
+            return prevResult and result
         else:
-            return prevResult or func(value)
-
-    def conditionStr(self):
-        """Return the text line for this condition.
-        """
-        value = self.value.replace('\\', '\\\\').replace('"', '\\"')
-        return '{0} {1} {2} "{3}"'.format(self.boolOper, self.fieldName,
-                                          self.oper, value)
+            return prevResult or result
 
+    def compile(self, nodeFormat):
+        """Return a test function for this line with the given node format.
 
-class StringOps(str):
-    """A string class with extra comparison functions.
-    """
-    def __new__(cls, initStr=''):
-        """Return the str object.
-
+        The returned function takes a node and returns True or False,
+        matching the evaluate result when the previous result is True for
+        "and" lines or False for "or" lines.
         Arguments:
-            initStr -- the initial string value
+            nodeFormat -- the format of the nodes to be evaluated
         """
-        return str.__new__(cls, initStr)
+        try:
+            field = nodeFormat.fieldDict[self.fieldName]
+        except KeyError:
+            return lambda node: False
+        test = self.valueTest(field)
+        compareValue = field.compareValue
+        return lambda node: test(compareValue(node))
 
-    def contains(self, substr):
-        """Return True if self contains substr.
+    def valueTest(self, field):
+        """Return a function that tests a field compare value for this line.
 
+        The returned function takes a value from the field's compareValue
+        method and returns True or False.
         Arguments:
-            substr -- the substring to check
+            field -- the field format object for the line's field name
         """
-        return self.find(substr) != -1
-
-    def true(self, other=''):
-        """Always return True.
+        value = field.adjustedCompareValue(self.value)
+        if (field.typeName in _compareTextTypes and
+            (self.oper in _textOperators or isinstance(value, str))):
+            # test the date or time text instead of the numbers, also used
+            # for condition values that aren't a valid date or time
+            compareText = field.compareText
+            textTest = valueTestFunction(self.oper, compareText(value))
+            return lambda dataValue: textTest(compareText(dataValue))
+        return valueTestFunction(self.oper, value)
 
-        Arguments:
-            other -- unused placeholder
+    def conditionStr(self):
+        """Return the text line for this condition.
         """
-        return True
+        value = self.value.replace('\\', '\\\\').replace('"', '\\"')
+        return '{0} {1} {2} "{3}"'.format(self.boolOper, self.fieldName,
+                                          self.oper, value)
 
-    def false(self, other=''):
-        """Always return False.
 
-        Arguments:
-            other -- unused placeholder
-        """
-        return False
+def valueTestFunction(oper, value):
+    """Return a function that compares a field compare value to value.
+
+    Ordering comparisons of values that can't be ordered return False.
+    Arguments:
+        oper -- the operator string
+        value -- the adjusted comparison value
+    """
+    if oper in ('True', 'False'):
+        constResult = oper == 'True'
+        return lambda dataValue: constResult
+    compareFunc = _compareFunctions.get(oper)
+    if compareFunc:
+        def compareTest(dataValue):
+            try:
+                return bool(compareFunc(dataValue, value))
+            except TypeError:
+                return False
+        return compareTest
+    strValue = str(value)
+    if oper == 'starts with':
+        return lambda dataValue: str(dataValue).startswith(strValue)
+    if oper == 'ends with':
+        return lambda dataValue: str(dataValue).endswith(strValue)
+    return lambda dataValue: strValue in str(dataValue)
 
 
 class ConditionDialog(QtGui.QDialog):
@@ -523,6 +635,7 @@ class ConditionDialog(QtGui.QDialog):
         """Stop filtering nodes.
         """
         window = globalref.mainControl.activeControl.activeWindow
+        window.treeFilterView.cancelFilter()
         window.treeStack.setCurrentWidget(window.treeView)
         self.endFilterButton.setEnabled(False)
         globalref.mainControl.currentStatusBar().clearMessage()
@@ -13,6 +13,7 @@
 #******************************************************************************
 
 import os.path
+import bisect
 from PyQt4 import QtCore, QtGui
 import treenode
 import undo
@@ -492,12 +493,11 @@ class DataEditView(QtGui.QTableWidget):
         global defaultFont
         defaultFont = font
 
-    def highlightSearch(self, wordList=None, regExpList=None):
+    def highlightSearch(self, highlightSpec):
         """Highlight any found search terms.
 
         Arguments:
-            wordList -- list of words to highlight
-            regExpList -- a list of regular expression objects to highlight
+            highlightSpec -- the HighlightSpec object with the search terms
         """
         backColor = self.palette().brush(QtGui.QPalette.Active,
                                          QtGui.QPalette.Highlight)
@@ -506,25 +506,12 @@ class DataEditView(QtGui.QTableWidget):
         charFormat = QtGui.QTextCharFormat()
         charFormat.setBackground(backColor)
         charFormat.setForeground(foreColor)
-        node = self.selectModel.selectedNodes()[0]
-        if wordList is None:
-            wordList = []
-        if regExpList is None:
-            regExpList = []
-        for regExp in regExpList:
-            for match in regExp.finditer('\n'.join(node.formatOutput())):
-                matchText = match.group().lower()
-                if matchText not in wordList:
-                    wordList.append(matchText)
-        cells = []
-        completedCells = []
-        for word in wordList:
-            cells.extend(self.findItems(word, QtCore.Qt.MatchFixedString |
-                                        QtCore.Qt.MatchContains))
-        for cell in cells:
-            if hasattr(cell, 'doc') and cell not in completedCells:
-                highlighter = SearchHighlighter(wordList, charFormat, cell.doc)
-                completedCells.append(cell)
+        for row in range(self.rowCount()):
+            cell = self.item(row, 1)
+            if (hasattr(cell, 'doc') and
+                highlightSpec.spans(cell.doc.toPlainText())):
+                highlighter = SearchHighlighter(highlightSpec, charFormat,
+                                                cell.doc)
 
     def highlightMatch(self, searchText='', regExpObj=None, cellNum=0,
                        skipMatches=0):
@@ -669,31 +656,46 @@ class DataEditView(QtGui.QTableWidget):
 class SearchHighlighter(QtGui.QSyntaxHighlighter):
     """Class override to highlight search terms in cell text.
 
-    Used to highlight search words from a list.
+    Used to highlight search terms from a shared HighlightSpec.
+    The terms are matched against the whole document, so regular
+    expressions can match across lines.
     """
-    def __init__(self, wordList, charFormat, doc):
+    def __init__(self, highlightSpec, charFormat, doc):
         """Initialize the highlighter with the text document.
 
         Arguments:
-            wordList -- list of search terms
+            highlightSpec -- the HighlightSpec object with the search terms
             charFormat -- the formatting to apply
             doc -- the text document
         """
         super().__init__(doc)
-        self.wordList = wordList
+        self.highlightSpec = highlightSpec
         self.charFormat = charFormat
+        self.docText = None
+        self.spanList = []
+        self.spanEnds = []
 
     def highlightBlock(self, text):
         """Override method to highlight search terms in block of text.
 
+        The document spans are found again only if the document changed.
         Arguments:
             text -- the text to highlight
         """
-        for word in self.wordList:
-            pos = text.lower().find(word, 0)
-            while pos >= 0:
-                self.setFormat(pos, len(word), self.charFormat)
-                pos = text.lower().find(word, pos + len(word))
+        docText = self.document().toPlainText()
+        if docText != self.docText:
+            self.docText = docText
+            self.spanList = self.highlightSpec.spans(docText)
+            self.spanEnds = [end for start, end in self.spanList]
+        blockStart = self.currentBlock().position()
+        blockEnd = blockStart + len(text)
+        for start, end in self.spanList[bisect.bisect_right(self.spanEnds,
+                                                            blockStart):]:
+            if start >= blockEnd:
+                break
+            start = max(start, blockStart)
+            end = min(end, blockEnd)
+            self.setFormat(start - blockStart, end - start, self.charFormat)
 
 
 class MatchHighlighter(QtGui.QSyntaxHighlighter):
@@ -725,10 +727,11 @@ class MatchHighlighter(QtGui.QSyntaxHighlighter):
             text -- the text to highlight
         """
         pos = matchLen = 0
+        lowerText = text.lower()
         for matchNum in range(self.skipMatches + 1):
             pos += matchLen
             if self.searchText:
-                pos = text.lower().find(self.searchText, pos)
+                pos = lowerText.find(self.searchText, pos)
                 matchLen = len(self.searchText)
             else:
                 match = self.regExpObj.search(text, pos)
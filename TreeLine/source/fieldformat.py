@@ -14,6 +14,8 @@
 
 import re
 import os.path
+import time
+import decimal
 import xml.sax.saxutils
 from PyQt4 import QtCore, QtGui
 import globalref
@@ -32,6 +34,8 @@ fieldTypes = [N_('Text'), N_('HtmlText'), N_('OneLineText'), N_('SpacedText'),
 _errorStr = '#####'
 _dateStampString = _('Now')
 _timeStampString = _('Now')
+# date and time compare value for blank or invalid data, sorts first
+_blankCompareValue = float('-inf')
 numericResult, dateResult, timeResult, booleanResult, textResult = range(5)
 mathResultStr = {numericResult: 'numeric', dateResult: 'date',
                  timeResult: 'time', booleanResult: 'boolean',
@@ -217,6 +221,46 @@ class TextField:
         storedText = removeMarkup(storedText)
         return storedText if storedText or zeroBlanks else None
 
+    def parseValue(self, storedText, decimalMode=False):
+        """Return a numeric value parsed from non-blank stored text.
+
+        Overloaded by numeric field types, raises a ValueError if invalid.
+        Arguments:
+            storedText -- the stored text to parse
+            decimalMode -- return a decimal instead of a float if True
+        """
+        raise ValueError
+
+    def parsedValue(self, node, decimalMode=False):
+        """Return the cached numeric value of this field in the given node.
+
+        The value is parsed only when the node's stored text changes, so the
+        cache never goes stale after edits or undo.
+        Raises a ValueError if the field is blank or invalid.
+        Arguments:
+            node -- the tree item storing the data
+            decimalMode -- return a decimal instead of a float if True
+        """
+        storedText = node.data.get(self.name, '')
+        cache = node.valueCache
+        key = (self.name, decimalMode)
+        entry = cache.get(key) if cache else None
+        if entry and entry[0] is self and entry[1] == storedText:
+            value = entry[2]
+        else:
+            value = None
+            if storedText:
+                try:
+                    value = self.parseValue(storedText, decimalMode)
+                except ValueError:
+                    pass
+            if cache is None:
+                cache = node.valueCache = {}
+            cache[key] = (self, storedText, value)
+        if value is None:
+            raise ValueError
+        return value
+
     def compareValue(self, node):
         """Return a value for comparison to other nodes and for sorting.
 
@@ -439,11 +483,26 @@ class NumberField(HtmlTextField):
             node -- the tree item storing the data
             zeroBlanks -- replace blank field values with zeros if True
         """
-        storedText = node.data.get(self.name, '')
-        if storedText:
-            return gennumber.GenNumber(storedText).num
+        if node.data.get(self.name, ''):
+            return self.parsedValue(node, node.modelRef.mathDecimalDigits > 0)
         return 0 if zeroBlanks else None
 
+    def parseValue(self, storedText, decimalMode=False):
+        """Return a numeric value parsed from non-blank stored text.
+
+        Raises a ValueError if it isn't a number.
+        Arguments:
+            storedText -- the stored text to parse
+            decimalMode -- return a decimal instead of a float if True
+        """
+        num = gennumber.GenNumber(storedText).num
+        if decimalMode:
+            try:
+                return decimal.Decimal(storedText.strip())
+            except decimal.InvalidOperation:
+                return decimal.Decimal(repr(num))
+        return num
+
     def compareValue(self, node):
         """Return a value for comparison to other nodes and for sorting.
 
@@ -451,9 +510,8 @@ class NumberField(HtmlTextField):
         Arguments:
             node -- the tree item storing the data
         """
-        storedText = node.data.get(self.name, '')
         try:
-            return gennumber.GenNumber(storedText).num
+            return self.parsedValue(node)
         except ValueError:
             return 0
 
@@ -587,27 +645,70 @@ class MathField(NumberField):
         Arguments:
             node -- the tree item with this equation
         """
-        if self.equation:
-            try:
-                num = self.equation.equationValue(node,
-                                             _mathResultBlank[self.resultType])
-            except ValueError:
+        if not self.equation:
+            return ''
+        profiler = node.modelRef.mathProfiler
+        if profiler:
+            startTime = time.perf_counter()
+        zeroValue = _mathResultBlank[self.resultType]
+        try:
+            num = self.equation.equationValue(node, zeroValue)
+        except ValueError:
+            text = _errorStr
+        else:
+            text = self.resultText(num)
+        if profiler:
+            profiler.addEvaluations(node.formatName, self.name, 1,
+                                    time.perf_counter() - startTime)
+        return text
+
+    def equationValues(self, nodes, refValueCache=None):
+        """Return a list of text values from the equation results for nodes.
+
+        Evaluates all of the nodes as a batch.
+        Arguments:
+            nodes -- a list of tree items with this equation
+            refValueCache -- a dict of reference values shared by equations
+        """
+        if not self.equation or not nodes:
+            return [''] * len(nodes)
+        profiler = nodes[0].modelRef.mathProfiler
+        if profiler:
+            startTime = time.perf_counter()
+        zeroValue = _mathResultBlank[self.resultType]
+        texts = [_errorStr if isinstance(num, ValueError) else
+                 self.resultText(num) for num in
+                 self.equation.equationValues(nodes, zeroValue,
+                                              refValueCache)]
+        if profiler:
+            profiler.addEvaluations(nodes[0].formatName, self.name,
+                                    len(nodes),
+                                    time.perf_counter() - startTime)
+        return texts
+
+    def resultText(self, num):
+        """Return the stored text for an equation result.
+
+        Returns the '#####' error string for invalid dates and times.
+        Arguments:
+            num -- the equation result
+        """
+        if num == None:
+            return ''
+        if self.resultType in (numericResult, booleanResult, textResult):
+            return str(num)
+        if isinstance(num, decimal.Decimal):
+            num = int(num)
+        if self.resultType == dateResult:
+            date = DateField.refDate.addDays(num)
+            if not date.isValid():
                 return _errorStr
-            if num == None:
-                return ''
-            if self.resultType in (numericResult, booleanResult, textResult):
-                return str(num)
-            elif self.resultType == dateResult:
-                date = DateField.refDate.addDays(num)
-                if not date.isValid():
-                    return _errorStr
-                return date.toString(QtCore.Qt.ISODate)
-            else:
-                time = TimeField.refTime.addSecs(num)
-                if not time.isValid():
-                    return _errorStr
-                return time.toString()
-        return ''
+            return date.toString(QtCore.Qt.ISODate)
+        else:
+            time = TimeField.refTime.addSecs(num)
+            if not time.isValid():
+                return _errorStr
+            return time.toString()
 
     def xmlAttr(self):
         """Return a dictionary of this field's attributes.
@@ -744,7 +845,7 @@ class NumberingField(HtmlTextField):
         storedText = node.data.get(self.name, '')
         if storedText:
             try:
-                return [int(num) for num in editorText.split('.')]
+                return [int(num) for num in storedText.split('.')]
             except ValueError:
                 pass
         return [0]
@@ -1371,14 +1472,23 @@ class DateField(HtmlTextField):
             node -- the tree item storing the data
             zeroBlanks -- replace blank field values with zeros if True
         """
-        storedText = node.data.get(self.name, '')
-        if storedText:
-            date = QtCore.QDate.fromString(storedText, QtCore.Qt.ISODate)
-            if not date.isValid():
-                raise ValueError
-            return DateField.refDate.daysTo(date)
+        if node.data.get(self.name, ''):
+            return self.parsedValue(node)
         return 0 if zeroBlanks else None
 
+    def parseValue(self, storedText, decimalMode=False):
+        """Return the number of days from the reference date to the text date.
+
+        Raises a ValueError if it isn't a valid date.
+        Arguments:
+            storedText -- the stored text to parse
+            decimalMode -- not used, the result is always an int
+        """
+        date = QtCore.QDate.fromString(storedText, QtCore.Qt.ISODate)
+        if not date.isValid():
+            raise ValueError
+        return DateField.refDate.daysTo(date)
+
     def getInitDefault(self):
         """Return the initial stored value for newly created nodes.
         """
@@ -1417,11 +1527,28 @@ class DateField(HtmlTextField):
         """Return a value for comparison to other nodes and for sorting.
 
         Returns lowercase text for text fields or numbers for non-text fields.
-        Date field uses ISO date format (YYY-MM-DD).
+        Date field uses the cached number of days from the reference date.
         Arguments:
             node -- the tree item storing the data
         """
-        return node.data.get(self.name, '')
+        try:
+            return self.parsedValue(node)
+        except ValueError:
+            return _blankCompareValue
+
+    def compareText(self, value):
+        """Return the ISO date text (YYYY-MM-DD) for a compare value.
+
+        Used for conditional text operators.
+        Arguments:
+            value -- a value from compareValue or adjustedCompareValue
+        """
+        if value == _blankCompareValue:
+            return ''
+        if isinstance(value, int):
+            return DateField.refDate.addDays(value).toString(QtCore.Qt.
+                                                             ISODate)
+        return str(value)
 
     def sortKey(self, node):
         """Return a tuple with field type and comparison values for sorting.
@@ -1435,15 +1562,16 @@ class DateField(HtmlTextField):
     def adjustedCompareValue(self, value):
         """Return value adjusted like the compareValue for use in conditionals.
 
-        Date version converts to an ISO date format (YYY-MM-DD).
+        Date version converts to the number of days from the reference date.
+        Returns the text unchanged if it is not a valid date.
         Arguments:
             value -- the comparison value to adjust
         """
         if not value:
-            return ''
+            return _blankCompareValue
         editorFormat = globalref.genOptions.getValue('EditDateFormat')
         if value == _dateStampString:
-            return QtCore.QDate.currentDate().toString(QtCore.Qt.ISODate)
+            return DateField.refDate.daysTo(QtCore.QDate.currentDate())
         date = QtCore.QDate.fromString(value, editorFormat)
         if not date.isValid():
             # allow use of single digit month and day
@@ -1453,13 +1581,17 @@ class DateField(HtmlTextField):
         if date.isValid():
             if 1900 <= date.year() < 1950 and 'yyyy' not in editorFormat:
                 date = date.addYears(100)
-            return date.toString(QtCore.Qt.ISODate)
+            return DateField.refDate.daysTo(date)
         # allow use of a 4-digit year to fix invalid dates
         if 'yyyy' not in editorFormat and 'yy' in editorFormat:
             modFormat = editorFormat.replace('yy', 'yyyy', 1)
             date = QtCore.QDate.fromString(value, modFormat)
             if date.isValid():
-                return date.toString(QtCore.Qt.ISODate)
+                return DateField.refDate.daysTo(date)
+        # allow the ISO format used for stored dates
+        date = QtCore.QDate.fromString(value, QtCore.Qt.ISODate)
+        if date.isValid():
+            return DateField.refDate.daysTo(date)
         return value
 
 
@@ -1572,14 +1704,23 @@ class TimeField(HtmlTextField):
             node -- the tree item storing the data
             zeroBlanks -- replace blank field values with zeros if True
         """
-        storedText = node.data.get(self.name, '')
-        if storedText:
-            time = QtCore.QTime.fromString(storedText)
-            if not time.isValid():
-                raise ValueError
-            return TimeField.refTime.secsTo(time)
+        if node.data.get(self.name, ''):
+            return self.parsedValue(node)
         return 0 if zeroBlanks else None
 
+    def parseValue(self, storedText, decimalMode=False):
+        """Return the number of seconds from the reference time to the text.
+
+        Raises a ValueError if it isn't a valid time.
+        Arguments:
+            storedText -- the stored text to parse
+            decimalMode -- not used, the result is always an int
+        """
+        time = QtCore.QTime.fromString(storedText)
+        if not time.isValid():
+            raise ValueError
+        return TimeField.refTime.secsTo(time)
+
     def getInitDefault(self):
         """Return the initial stored value for newly created nodes.
         """
@@ -1618,11 +1759,27 @@ class TimeField(HtmlTextField):
         """Return a value for comparison to other nodes and for sorting.
 
         Returns lowercase text for text fields or numbers for non-text fields.
-        Time field uses HH:MM:SS format.
+        Time field uses the cached number of seconds from the reference time.
         Arguments:
             node -- the tree item storing the data
         """
-        return node.data.get(self.name, '')
+        try:
+            return self.parsedValue(node)
+        except ValueError:
+            return _blankCompareValue
+
+    def compareText(self, value):
+        """Return the HH:MM:SS time text for a compare value.
+
+        Used for conditional text operators.
+        Arguments:
+            value -- a value from compareValue or adjustedCompareValue
+        """
+        if value == _blankCompareValue:
+            return ''
+        if isinstance(value, int):
+            return TimeField.refTime.addSecs(value).toString()
+        return str(value)
 
     def sortKey(self, node):
         """Return a tuple with field type and comparison values for sorting.
@@ -1636,12 +1793,13 @@ class TimeField(HtmlTextField):
     def adjustedCompareValue(self, value):
         """Return value adjusted like the compareValue for use in conditionals.
 
-        Time version converts to HH:MM:SS format.
+        Time version converts to the number of seconds from the reference time.
+        Returns the text unchanged if it is not a valid time.
         Arguments:
             value -- the comparison value to adjust
         """
         if not value:
-            return ''
+            return _blankCompareValue
         editorFormat = globalref.genOptions.getValue('EditTimeFormat')
         if value == _timeStampString:
             time = QtCore.QTime.currentTime()
@@ -1656,9 +1814,12 @@ class TimeField(HtmlTextField):
                     editorFormat = editorFormat.replace('ap', '', 1)
                     editorFormat = editorFormat.strip()
                     time = QtCore.QTime.fromString(value, editorFormat)
+            if not time.isValid():
+                # allow the format used for stored times
+                time = QtCore.QTime.fromString(value)
             if not time.isValid():
                 return value
-        return time.toString()
+        return TimeField.refTime.secsTo(time)
 
 
 class ExternalLinkField(HtmlTextField):
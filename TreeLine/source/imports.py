@@ -245,6 +245,7 @@ class ImportControl:
                   encoding=globalref.localTextEncoding) as f:
             textList = f.read().split('<end node> 5P9i0s8y19Z')
         nodeList = []
+        levelList = []
         for text in textList:
             text = text.strip()
             if text:
@@ -259,13 +260,13 @@ class ImportControl:
                 node =  treenode.TreeNode(None, tpFormat.name, model)
                 node.data[nodeformat.defaultFieldName] = title
                 node.data[textFieldName] = '\n'.join(lines)
-                node.level = level
                 node.setUniqueId(True)
                 nodeList.append(node)
+                levelList.append(level)
         parentList = []
-        for node in nodeList:
-            if node.level != 0:
-                parentList = parentList[:node.level]
+        for node, level in zip(nodeList, levelList):
+            if level != 0:
+                parentList = parentList[:level]
                 node.parent = parentList[-1]
                 parentList[-1].childList.append(node)
             parentList.append(node)
@@ -132,5 +132,6 @@ class LinkRefCollection:
                 link.nodeRef.data[link.fieldName] = \
                       linkRegExp.sub(r'<a href="#{}">\1</a>'.format(newTarget),
                                      link.nodeRef.data[link.fieldName])
+                link.nodeRef.modelRef.nodeDataChanged(link.nodeRef)
             del self.targetIdDict[oldTarget]
             self.targetIdDict[newTarget] = links
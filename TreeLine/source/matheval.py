@@ -14,9 +14,20 @@
 
 import re
 import ast
+import heapq
+import time
+import decimal
+import operator
 import builtins
 import gennumber
 from math import *
+try:
+    import numpy
+except ImportError:
+    numpy = None
+
+_minArrayLength = 100   # min. batch size for array evaluation
+defaultDecimalDigits = 28   # default precision for decimal math
 
 
 def sum(*args):
@@ -25,6 +36,8 @@ def sum(*args):
     Arguments:
         *args -- lists of numbers or individual numbers
     """
+    if len(args) == 1 and isinstance(args[0], ChildValueList):
+        return args[0].aggregate.sum()
     fullList = []
     for arg in args:
         if hasattr(arg, 'extend'):
@@ -39,6 +52,8 @@ def max(*args):
     Arguments:
         *args -- lists of numbers or individual numbers
     """
+    if len(args) == 1 and isinstance(args[0], ChildValueList):
+        return args[0].aggregate.max()
     fullList = []
     for arg in args:
         if hasattr(arg, 'extend'):
@@ -55,6 +70,8 @@ def min(*args):
     Arguments:
         *args -- lists of numbers or individual numbers
     """
+    if len(args) == 1 and isinstance(args[0], ChildValueList):
+        return args[0].aggregate.min()
     fullList = []
     for arg in args:
         if hasattr(arg, 'extend'):
@@ -71,6 +88,8 @@ def mean(*args):
     Arguments:
         *args -- lists of numbers or individual numbers
     """
+    if len(args) == 1 and isinstance(args[0], ChildValueList):
+        return args[0].aggregate.mean()
     fullList = []
     for arg in args:
         if hasattr(arg, 'extend'):
@@ -154,6 +173,11 @@ def replace(text, oldText, newText):
 
 
 _fieldSplitRe = re.compile(r'{\*(\*|\$|&|#|\b)([\w_\-.]+)\*}')
+_refArgName = '_refValue{0}'
+_decimalConstName = '_decimalConst{0}'
+# errors from evaluating an equation that give an error result
+_evalErrors = (ValueError, TypeError, NameError, ZeroDivisionError,
+               OverflowError, decimal.DecimalException)
 
 class MathEquation:
     """Class to parse, check, store and evaluate a Math field equation.
@@ -166,6 +190,9 @@ class MathEquation:
         """
         self.fieldRefs = []
         self.formattedEqnText = ''
+        self.evalFunc = None
+        self.decimalFunc = None
+        self.arrayEval = False
         self.parseEquation(eqnText)
 
     def equationText(self):
@@ -214,17 +241,117 @@ class MathEquation:
             zeroValue -- the value to use for blanks
         """
         zeroBlanks = eqnNode.modelRef.mathZeroBlanks
+        decimalDigits = eqnNode.modelRef.mathDecimalDigits
         inputs = [ref.referenceValue(eqnNode, zeroBlanks) for ref in
                   self.fieldRefs]
         if not zeroBlanks and None in inputs:
             return None
-        inputs = [repr(value) for value in inputs]
-        eqn = self.formattedEqnText.format(*inputs)
+        if self.evalFunc:
+            evalFunc = (self.decimalEvalFunc() if decimalDigits else
+                        self.evalFunc)
+            with decimal.localcontext() as context:
+                if decimalDigits:
+                    context.prec = decimalDigits
+                try:
+                    return evalFunc(*inputs)
+                except _evalErrors as err:
+                    raise ValueError(err)
+        eqn = self.formattedEqnText.format(*[valueText(value) for value in
+                                             inputs])
         try:
             return eval(eqn)
-        except (TypeError, ZeroDivisionError) as err:
+        except _evalErrors as err:
             raise ValueError(err)
 
+    def equationValues(self, eqnNodes, zeroValue=0, refValueCache=None):
+        """Return a list of values for the equation in each of the nodes.
+
+        The reference values are gathered for all nodes before evaluating.
+        Values read from the same field in the same node (such as parent and
+        root references) are only read once, and the cache can be shared by
+        other equations evaluated for the same nodes.
+        Uses numpy arrays for large batches of float values if the
+        equation only adds, subtracts and multiplies, otherwise evaluates
+        the compiled equation (or its decimal version) for each node.
+        List items are None if references are invalid and ValueError
+        objects for illegal math operations.
+        Arguments:
+            eqnNodes -- a list of nodes containing the equation to evaluate
+            zeroValue -- the value to use for blanks
+            refValueCache -- a dict of reference values to use and update
+        """
+        if not eqnNodes:
+            return []
+        if not self.evalFunc:
+            return [self._checkedValue(self.equationValue, node, zeroValue)
+                    for node in eqnNodes]
+        zeroBlanks = eqnNodes[0].modelRef.mathZeroBlanks
+        decimalDigits = eqnNodes[0].modelRef.mathDecimalDigits
+        if refValueCache is None:
+            refValueCache = {}
+        inputList = [self._checkedValue(self._referenceValues, node,
+                                        zeroBlanks, refValueCache)
+                     for node in eqnNodes]
+        if (numpy and self.arrayEval and not decimalDigits and
+            len(inputList) >= _minArrayLength and
+            all(type(inputs) is list and
+                all(type(value) is float for value in inputs)
+                for inputs in inputList)):
+            columns = [numpy.array(values, dtype=float) for values in
+                       zip(*inputList)]
+            return self.evalFunc(*columns).tolist()
+        evalFunc = self.decimalEvalFunc() if decimalDigits else self.evalFunc
+        results = []
+        with decimal.localcontext() as context:
+            if decimalDigits:
+                context.prec = decimalDigits
+            for inputs in inputList:
+                if isinstance(inputs, ValueError):
+                    results.append(inputs)
+                elif not zeroBlanks and None in inputs:
+                    results.append(None)
+                else:
+                    try:
+                        results.append(evalFunc(*inputs))
+                    except _evalErrors as err:
+                        results.append(ValueError(err))
+        return results
+
+    def _referenceValues(self, eqnNode, zeroBlanks, refValueCache=None):
+        """Return a list of the reference values for the given node.
+
+        Arguments:
+            eqnNode -- the node containing the equation to evaluate
+            zeroBlanks -- replace blank fields with zeros if True
+            refValueCache -- a dict of reference values to use and update
+        """
+        if refValueCache is None:
+            return [ref.referenceValue(eqnNode, zeroBlanks) for ref in
+                    self.fieldRefs]
+        values = []
+        for ref in self.fieldRefs:
+            key = (ref.tagPrefix, ref.fieldName, ref.sourceNode(eqnNode))
+            try:
+                value = refValueCache[key]
+            except KeyError:
+                value = ref.referenceValue(eqnNode, zeroBlanks)
+                refValueCache[key] = value
+            values.append(value)
+        return values
+
+    @staticmethod
+    def _checkedValue(func, *args):
+        """Return the function result or the ValueError that it raised.
+
+        Arguments:
+            func -- the function to call
+            *args -- the function arguments
+        """
+        try:
+            return func(*args)
+        except ValueError as err:
+            return err
+
     def parseEquation(self, eqnText):
         """Replace the stored equation by parsing the given text.
 
@@ -234,6 +361,78 @@ class MathEquation:
         """
         self.fieldRefs = []
         self.formattedEqnText = _fieldSplitRe.sub(self._replFunc, eqnText)
+        self.compileEquation()
+
+    def compileEquation(self):
+        """Compile the equation into a function of the reference values.
+
+        The function only has access to the allowed functions.  Sets evalFunc
+        to None if the equation can't be compiled safely, so the equation
+        text is evaluated for each node instead.
+        """
+        self.evalFunc = None
+        self.decimalFunc = None
+        self.arrayEval = False
+        if not self.formattedEqnText:
+            return
+        argNames = [_refArgName.format(i) for i in range(len(self.fieldRefs))]
+        try:
+            eqn = self.formattedEqnText.format(*argNames)
+            tree = ast.parse(eqn)
+            SafeEvalChecker().visit(tree)
+        except (IndexError, KeyError, SyntaxError, ValueError,
+                AttributeError):
+            return
+        names = [node.id for node in ast.walk(tree) if
+                 isinstance(node, ast.Name)]
+        # each reference must be a separate name (not joined to other text)
+        if (len(tree.body) != 1 or not isinstance(tree.body[0], ast.Expr) or
+            sorted(name for name in names if name in argNames) !=
+            sorted(argNames) or
+            not set(names) <= (set(argNames) | safeGlobals.keys()) -
+                               {'__builtins__'}):
+            return
+        tree = RefPowerConverter(argNames, eqn).visit(tree)
+        tree = ConstantFolder().visit(tree)
+        try:
+            self.evalFunc = compiledFunction(argNames, tree.body[0].value,
+                                             safeGlobals)
+        except (SyntaxError, ValueError, TypeError):
+            return
+        # array results match float results for these operations
+        self.arrayEval = bool(self.fieldRefs) and all(isinstance(node,
+                                                   (ast.Module, ast.Expr,
+                                                    ast.Name, ast.Load,
+                                                    ast.BinOp, ast.UnaryOp,
+                                                    ast.Add, ast.Sub, ast.Mult,
+                                                    ast.UAdd, ast.USub)) or
+                              isNumberNode(node) for node in ast.walk(tree))
+
+    def decimalEvalFunc(self):
+        """Return the compiled equation function for decimal arithmetic.
+
+        Float constants are replaced by decimals and arithmetic operators
+        convert float operands, so decimal field values aren't mixed with
+        floats.  Compiled on first use.  Returns the float function if the
+        decimal version can't be compiled.
+        """
+        if not self.decimalFunc and self.evalFunc:
+            self.decimalFunc = self.evalFunc
+            argNames = [_refArgName.format(i) for i in
+                        range(len(self.fieldRefs))]
+            converter = DecimalConverter()
+            try:
+                eqn = self.formattedEqnText.format(*argNames)
+                tree = ast.parse(eqn, mode='eval')
+                tree = RefPowerConverter(argNames, eqn).visit(tree)
+                funcGlobals = dict(decimalGlobals)
+                exprNode = converter.visit(tree.body)
+                funcGlobals.update(converter.constants)
+                self.decimalFunc = compiledFunction(argNames, exprNode,
+                                                    funcGlobals)
+            except (SyntaxError, ValueError, TypeError):
+                pass
+        return self.decimalFunc
 
     def _replFunc(self, matchObj):
         """Adds a field ref for each field match from the parser.
@@ -290,6 +489,14 @@ class EquationFieldRef:
         except KeyError:
             return zeroValue if zeroBlanks else None
 
+    def sourceNode(self, eqnNode):
+        """Return the node that the reference value is read from.
+
+        Arguments:
+            eqnNode -- the node containing the equation to evaluate
+        """
+        return eqnNode
+
     def dependentEqnNodes(self, refNode):
         """Return a list of equation node(s) that reference the given node.
 
@@ -327,6 +534,14 @@ class EquationParentRef(EquationFieldRef):
         except KeyError:
             return zeroValue if zeroBlanks else None
 
+    def sourceNode(self, eqnNode):
+        """Return the node that the reference value is read from.
+
+        Arguments:
+            eqnNode -- the node containing the equation to evaluate
+        """
+        return eqnNode.parent
+
     def dependentEqnNodes(self, refNode):
         """Return a list of equation node(s) that reference the given node.
 
@@ -361,6 +576,14 @@ class EquationRootRef(EquationFieldRef):
         except KeyError:
             return zeroValue if zeroBlanks else None
 
+    def sourceNode(self, eqnNode):
+        """Return the node that the reference value is read from.
+
+        Arguments:
+            eqnNode -- the node containing the equation to evaluate
+        """
+        return eqnNode.modelRef.root
+
     def dependentEqnNodes(self, refNode):
         """Return a list of equation node(s) that reference the given node.
 
@@ -390,18 +613,14 @@ class EquationChildRef(EquationFieldRef):
             zeroBlanks -- replace blank fields with zeroValue if True
             zeroValue -- the value to use for blanks
         """
-        result = []
-        for node in eqnNode.childList:
-            try:
-                num = (node.nodeFormat().fieldDict[self.fieldName].
-                       mathValue(node, zeroBlanks))
-                if num == None:
-                    return None
-                result.append(num)
-            except KeyError:
-                if not zeroBlanks:
-                    return None
-        if not result:
+        aggregates = eqnNode.modelRef.childAggregates.setdefault(eqnNode, {})
+        key = (self.fieldName, zeroBlanks)
+        aggregate = aggregates.get(key)
+        if not aggregate:
+            aggregate = ChildAggregate(self.fieldName, zeroBlanks)
+            aggregates[key] = aggregate
+        result = aggregate.values(eqnNode)
+        if result is not None and not result:
             result = [zeroValue]
         return result
 
@@ -417,6 +636,205 @@ class EquationChildRef(EquationFieldRef):
         return []
 
 
+# markers for child values that aren't included in the value list
+_skipValue = object()
+_blankValue = object()
+_errorValue = object()
+
+# inexact (float or decimal) sum updates before the sum is recalculated
+_sumResyncCount = 100
+
+class ChildValueList(list):
+    """Read-only list of child field values with a ref to their aggregates.
+
+    Lets the sum, min, max and mean functions use the stored aggregates
+    when given a plain child reference.  The list is shared by all equations
+    reading the reference, so only its ChildAggregate may change it, using
+    the base list methods.
+    """
+    def __init__(self, aggregate, values=()):
+        """Initialize the list.
+
+        Arguments:
+            aggregate -- the ChildAggregate that maintains this list
+            values -- the initial child values
+        """
+        super().__init__(values)
+        self.aggregate = aggregate
+
+    def readOnlyError(self, *args):
+        """Raise a TypeError for any attempt to change the list.
+
+        Arguments:
+            *args -- unused arguments of the list method
+        """
+        raise TypeError(_('child reference values can not be changed'))
+
+    __setitem__ = __delitem__ = __iadd__ = __imul__ = readOnlyError
+    append = extend = insert = pop = remove = clear = readOnlyError
+    sort = reverse = readOnlyError
+
+
+class ChildAggregate:
+    """Class to maintain a parent's child field values and their aggregates.
+
+    Stored in the model for each parent and referenced child field.  A changed
+    child updates its value and the sum, min and max in place.  Float and
+    decimal sums are updated with the difference, and are recalculated from
+    the stored values after _sumResyncCount updates to limit rounding drift.
+    A replaced min or max is recalculated when next used.  Everything is
+    rebuilt after the model's aggregate stamp changes.
+    """
+    def __init__(self, fieldName, zeroBlanks):
+        """Initialize the aggregate.
+
+        Arguments:
+            fieldName -- the referenced child field name
+            zeroBlanks -- replace blank fields with zeros if True
+        """
+        self.fieldName = fieldName
+        self.zeroBlanks = zeroBlanks
+        self.stamp = None
+        self.childValues = {}
+        self.listIndex = {}
+        self.valueList = ChildValueList(self)
+        self.blankCount = 0
+        self.errorCount = 0
+        self.sumValue = None
+        self.inexactSumCount = 0
+        self.minValue = None
+        self.maxValue = None
+
+    def childValue(self, child):
+        """Return the field value of a child or a marker if not a value.
+
+        Arguments:
+            child -- the child node
+        """
+        try:
+            field = child.nodeFormat().fieldDict[self.fieldName]
+        except KeyError:
+            return _skipValue if self.zeroBlanks else _blankValue
+        try:
+            value = field.mathValue(child, self.zeroBlanks)
+        except ValueError:
+            return _errorValue
+        return _blankValue if value is None else value
+
+    def rebuild(self, parent):
+        """Gather the values of all children and clear the aggregates.
+
+        Arguments:
+            parent -- the node with the children
+        """
+        self.childValues = {child: self.childValue(child) for child in
+                            parent.childList}
+        self.listIndex = {}
+        values = []
+        for child in parent.childList:
+            value = self.childValues[child]
+            if value not in (_skipValue, _blankValue, _errorValue):
+                self.listIndex[child] = len(values)
+                values.append(value)
+        self.valueList = ChildValueList(self, values)
+        markers = list(self.childValues.values())
+        self.blankCount = markers.count(_blankValue)
+        self.errorCount = markers.count(_errorValue)
+        self.sumValue = self.minValue = self.maxValue = None
+        self.stamp = parent.modelRef.aggregateStamp
+
+    def values(self, parent):
+        """Return the read-only list of child values, rebuilding if required.
+
+        Return None if there are blanks and zeroBlanks is false,
+        raise a ValueError if any aren't a number.
+        Arguments:
+            parent -- the node with the children
+        """
+        if self.stamp != parent.modelRef.aggregateStamp:
+            self.rebuild(parent)
+        if self.blankCount or self.errorCount:
+            # the first problem child in tree order sets the result
+            for child in parent.childList:
+                value = self.childValues[child]
+                if value is _blankValue:
+                    return None
+                if value is _errorValue:
+                    raise ValueError
+        return self.valueList
+
+    def updateChild(self, child):
+        """Update the stored values after the data in a child changes.
+
+        Arguments:
+            child -- the changed child node
+        """
+        oldValue = self.childValues.get(child)
+        if oldValue is None or self.stamp is None:
+            return
+        newValue = self.childValue(child)
+        markers = (_skipValue, _blankValue, _errorValue)
+        if oldValue in markers or newValue in markers:
+            if oldValue is not newValue:
+                self.stamp = None
+            return
+        if type(oldValue) is type(newValue) and oldValue == newValue:
+            return
+        self.childValues[child] = newValue
+        list.__setitem__(self.valueList, self.listIndex[child], newValue)
+        if self.sumValue is not None:
+            if (type(self.sumValue) is not int or type(oldValue) is not int or
+                type(newValue) is not int):
+                self.inexactSumCount += 1
+            if self.inexactSumCount < _sumResyncCount:
+                try:
+                    self.sumValue = self.sumValue - oldValue + newValue
+                except TypeError:
+                    self.sumValue = None
+            else:
+                self.sumValue = None
+        try:
+            if self.minValue is not None:
+                if newValue < self.minValue:
+                    self.minValue = newValue
+                elif newValue == self.minValue or oldValue == self.minValue:
+                    self.minValue = None
+            if self.maxValue is not None:
+                if newValue > self.maxValue:
+                    self.maxValue = newValue
+                elif newValue == self.maxValue or oldValue == self.maxValue:
+                    self.maxValue = None
+        except TypeError:
+            self.minValue = self.maxValue = None
+
+    def sum(self):
+        """Return the sum of the child values.
+        """
+        if self.sumValue is None:
+            self.sumValue = builtins.sum(self.valueList)
+            self.inexactSumCount = 0
+        return self.sumValue
+
+    def min(self):
+        """Return the minimum child value.
+        """
+        if self.minValue is None:
+            self.minValue = builtins.min(self.valueList)
+        return self.minValue
+
+    def max(self):
+        """Return the maximum child value.
+        """
+        if self.maxValue is None:
+            self.maxValue = builtins.max(self.valueList)
+        return self.maxValue
+
+    def mean(self):
+        """Return the arithmetic average of the child values.
+        """
+        return self.sum() / len(self.valueList)
+
+
 class EquationChildCountRef(EquationFieldRef):
     """Class to store and eval child count references in a Math equation.
     """
@@ -501,6 +919,135 @@ class RecursiveEqnRef:
                 (other.evalSequence, other.evalDirection))
 
 
+class RecalcQueue:
+    """Class to recalculate equation fields that depend on changed fields.
+
+    Queued equation fields are ordered by math eval level and by node depth
+    in the level's direction, so a field is only recalculated after the
+    fields it references.  Each field is recalculated once and its
+    dependents are only queued if its value changes.
+    """
+    def __init__(self, formats, profiler=None):
+        """Initialize the queue.
+
+        Arguments:
+            formats -- the tree formats with the math field references
+            profiler -- a MathProfiler to record dependent counts if given
+        """
+        self.formats = formats
+        self.profiler = profiler
+        self.queue = []
+        self.queuedFields = set()
+        self.queueCount = 0
+        self.recalcCount = 0
+
+    def addDependents(self, refNode, fieldName):
+        """Queue the equation fields that reference a changed field.
+
+        Arguments:
+            refNode -- the node with the changed field
+            fieldName -- the name of the changed field
+        """
+        for fieldRef in self.formats.mathFieldRefDict.get(fieldName, []):
+            eqnNodes = fieldRef.dependentEqnNodes(refNode)
+            if self.profiler and eqnNodes:
+                self.profiler.addDependents(refNode.formatName, fieldName,
+                                            len(eqnNodes))
+            for eqnNode in eqnNodes:
+                key = (eqnNode, fieldRef.eqnFieldName)
+                if key not in self.queuedFields:
+                    self.queuedFields.add(key)
+                    level, direction = (self.formats.mathLevelDict.
+                                        get((eqnNode.formatName,
+                                             fieldRef.eqnFieldName),
+                                            (0, optional)))
+                    depth = eqnNode.depth()
+                    if direction == upward:
+                        depth = -depth
+                    # the count keeps the sort from comparing nodes
+                    heapq.heappush(self.queue, (level, depth, self.queueCount,
+                                                eqnNode,
+                                                fieldRef.eqnFieldName))
+                    self.queueCount += 1
+
+    def recalculate(self):
+        """Recalculate the queued fields and any changed fields' dependents.
+
+        Returns a set of nodes with changed data.
+        """
+        changedNodes = set()
+        while self.queue:
+            level, depth, num, node, fieldName = heapq.heappop(self.queue)
+            self.recalcCount += 1
+            if node.recalcMathField(fieldName):
+                changedNodes.add(node)
+                self.addDependents(node, fieldName)
+        return changedNodes
+
+
+class MathProfiler:
+    """Class to record the cost of math field evaluations in a file.
+
+    Stores evaluation counts and times for each equation field and the
+    number of dependent fields found for changes in each field, keyed by
+    type name and field name.
+    """
+    def __init__(self):
+        """Initialize an empty profile.
+        """
+        self.evalCounts = {}
+        self.evalTimes = {}
+        self.dependentCounts = {}
+
+    def clear(self):
+        """Remove all recorded data.
+        """
+        self.evalCounts = {}
+        self.evalTimes = {}
+        self.dependentCounts = {}
+
+    def addEvaluations(self, typeName, fieldName, count, seconds):
+        """Record evaluations of an equation field.
+
+        Arguments:
+            typeName -- the type name of the evaluated nodes
+            fieldName -- the equation field name
+            count -- the number of nodes evaluated
+            seconds -- the total evaluation time
+        """
+        key = (typeName, fieldName)
+        self.evalCounts[key] = self.evalCounts.get(key, 0) + count
+        self.evalTimes[key] = self.evalTimes.get(key, 0.0) + seconds
+
+    def addDependents(self, typeName, fieldName, count):
+        """Record equation fields found to depend on a changed field.
+
+        Arguments:
+            typeName -- the type name of the changed node
+            fieldName -- the changed field name
+            count -- the number of dependent equation fields
+        """
+        key = (typeName, fieldName)
+        self.dependentCounts[key] = self.dependentCounts.get(key, 0) + count
+
+    def records(self, formats):
+        """Return a list of profile tuples sorted by decreasing total time.
+
+        Each tuple has the type name, field name, evaluation count, total
+        seconds, number of equation references to the field name and number
+        of dependent fields found for its changes.
+        Arguments:
+            formats -- the tree formats with the math field references
+        """
+        keys = self.evalCounts.keys() | self.dependentCounts.keys()
+        records = [(key[0], key[1], self.evalCounts.get(key, 0),
+                    self.evalTimes.get(key, 0.0),
+                    len(formats.mathFieldRefDict.get(key[1], [])),
+                    self.dependentCounts.get(key, 0)) for key in keys]
+        records.sort(key=lambda rec: (-rec[3], rec[0], rec[1]))
+        return records
+
+
 class CircularMathError(Exception):
     """Exception raised when circular references are found in math fields.
     """
@@ -517,13 +1064,284 @@ allowedFunctions = set(['abs', 'float', 'int', 'len', 'max', 'min', 'pow',
                         'join', 'upper', 'lower', 'replace'])
 
 allowedNodeTypes = set(['Module', 'Expr', 'Name', 'Load', 'IfExp', 'Compare',
-                        'Num', 'Str', 'Tuple', 'List', 'BinOp', 'UnaryOp',
+                        'Num', 'Str', 'Constant', 'Tuple', 'List',
+                        'BinOp', 'UnaryOp',
                         'Add', 'Sub', 'Mult', 'Div', 'Mod', 'Pow', 'FloorDiv',
                         'Invert', 'Not', 'UAdd', 'USub',
                         'Eq', 'NotEq', 'Lt', 'LtE', 'Gt', 'GtE', 'Is', 'IsNot',
                         'In', 'NotIn', 'BoolOp', 'And', 'Or'])
 
 
+# names available to compiled equations
+safeGlobals = {name: (globals()[name] if name in globals() else
+                      getattr(builtins, name)) for name in allowedFunctions}
+safeGlobals['__builtins__'] = {}
+
+def decimalValue(value):
+    """Return float values converted to decimals and others unchanged.
+
+    Arguments:
+        value -- the value to convert
+    """
+    if type(value) is float:
+        return decimal.Decimal(repr(value))
+    return value
+
+def decimalOperation(func, exactInts=False):
+    """Return a function that applies an operator to decimal operands.
+
+    Arguments:
+        func -- the operator function
+        exactInts -- if True, convert int operands so quotients are exact
+    """
+    def operation(first, second):
+        first = decimalValue(first)
+        second = decimalValue(second)
+        if exactInts and type(first) is int and type(second) is int:
+            first = decimal.Decimal(first)
+        return func(first, second)
+    return operation
+
+def floorMod(first, second):
+    """Return the modulo with the sign of the divisor, like float modulo.
+
+    Decimal modulo takes the sign of the dividend, so it is corrected here.
+    Arguments:
+        first -- the dividend
+        second -- the divisor
+    """
+    result = first % second
+    if result and (result < 0) != (second < 0):
+        result += second
+    return result
+
+def floorDiv(first, second):
+    """Return the quotient rounded down, like float floor division.
+
+    Decimal floor division truncates towards zero, so it is corrected here.
+    Arguments:
+        first -- the dividend
+        second -- the divisor
+    """
+    return (first - floorMod(first, second)) // second
+
+# names available to compiled equations using decimal arithmetic
+decimalGlobals = dict(safeGlobals)
+decimalGlobals.update({'_decimalAdd': decimalOperation(operator.add),
+                       '_decimalSub': decimalOperation(operator.sub),
+                       '_decimalMult': decimalOperation(operator.mul),
+                       '_decimalDiv': decimalOperation(operator.truediv,
+                                                       True),
+                       '_decimalMod': decimalOperation(floorMod),
+                       '_decimalPow': decimalOperation(operator.pow),
+                       '_decimalFloorDiv': decimalOperation(floorDiv)})
+
+
+# functions without side effects that can be folded with constant arguments
+foldFunctions = set(['abs', 'float', 'int', 'max', 'min', 'pow', 'round',
+                     'sum', 'mean', 'ceil', 'fabs', 'factorial', 'floor',
+                     'fmod', 'fsum', 'trunc', 'exp', 'log', 'log10', 'sqrt',
+                     'acos', 'asin', 'atan', 'cos', 'sin', 'tan', 'hypot',
+                     'degrees', 'radians'])
+
+class ConstantFolder(ast.NodeTransformer):
+    """Class to replace the constant parts of an equation with their values.
+
+    Folds numeric operations and function calls whose operands are all
+    numbers, including the pi and e constants.  Any operation that raises an
+    error is left to raise it when the equation is evaluated.
+    """
+    def visit_Name(self, node):
+        """Replace the pi and e constants with their values.
+
+        Arguments:
+            node -- the ast node being checked
+        """
+        if node.id in ('pi', 'e'):
+            return self.foldedNode(node)
+        return node
+
+    def visit_BinOp(self, node):
+        """Fold operations with constant operands.
+
+        Arguments:
+            node -- the ast node being checked
+        """
+        self.generic_visit(node)
+        if isNumberNode(node.left) and isNumberNode(node.right):
+            return self.foldedNode(node)
+        return node
+
+    def visit_UnaryOp(self, node):
+        """Fold operations with a constant operand.
+
+        Arguments:
+            node -- the ast node being checked
+        """
+        self.generic_visit(node)
+        if isNumberNode(node.operand):
+            return self.foldedNode(node)
+        return node
+
+    def visit_Call(self, node):
+        """Fold calls to functions without side effects with constant args.
+
+        Arguments:
+            node -- the ast node being checked
+        """
+        self.generic_visit(node)
+        if (node.func.id in foldFunctions and not node.keywords and
+            not getattr(node, 'starargs', None) and
+            not getattr(node, 'kwargs', None) and
+            all(isNumberNode(arg) for arg in node.args)):
+            return self.foldedNode(node)
+        return node
+
+    def foldedNode(self, node):
+        """Return a number node with the value of the given node.
+
+        Returns the original node if it raises an error or isn't a number.
+        Arguments:
+            node -- the ast node to evaluate
+        """
+        expr = ast.fix_missing_locations(ast.Expression(body=node))
+        try:
+            value = eval(compile(expr, '<equation>', 'eval'), safeGlobals)
+        except (ArithmeticError, ValueError, TypeError):
+            return node
+        if type(value) not in (int, float):
+            return node
+        if hasattr(ast, 'Constant'):
+            newNode = ast.Constant(value)
+        else:
+            newNode = ast.Num(value)
+        return ast.copy_location(newNode, node)
+
+
+class RefPowerConverter(ast.NodeTransformer):
+    """Class to keep the text substitution precedence of powers of references.
+
+    Equations evaluated as text have a negative reference value inserted
+    before a power operator, so the negation applies after the power (the
+    value -3 in "{*a*}**2" gives -9, but "({*a*})**2" gives 9).  Powers with
+    an unparenthesized reference as the base are converted to give the same
+    results with reference arguments.
+    """
+    def __init__(self, argNames, eqnText):
+        """Initialize the converter.
+
+        Arguments:
+            argNames -- a list of the reference argument names
+            eqnText -- the parsed equation text, used to find parentheses
+        """
+        super().__init__()
+        self.argNames = set(argNames)
+        # ast column offsets count utf-8 bytes
+        self.eqnLines = [line.encode('utf-8') for line in
+                         eqnText.split('\n')]
+
+    def visit_BinOp(self, node):
+        """Negate the power of the absolute value for negative bases.
+
+        Arguments:
+            node -- the ast node being checked
+        """
+        self.generic_visit(node)
+        if not (isinstance(node.op, ast.Pow) and
+                isinstance(node.left, ast.Name) and
+                node.left.id in self.argNames and
+                not self.isParenthesized(node.left)):
+            return node
+        name = node.left.id
+        if hasattr(ast, 'Constant'):
+            zeroNode = ast.Constant(0)
+        else:
+            zeroNode = ast.Num(0)
+        negBase = ast.UnaryOp(op=ast.USub(),
+                              operand=ast.Name(id=name, ctx=ast.Load()))
+        negPower = ast.UnaryOp(op=ast.USub(),
+                               operand=ast.BinOp(left=negBase, op=ast.Pow(),
+                                                 right=node.right))
+        isNegative = ast.Compare(left=ast.Name(id=name, ctx=ast.Load()),
+                                 ops=[ast.Lt()], comparators=[zeroNode])
+        newNode = ast.IfExp(test=isNegative, body=negPower, orelse=node)
+        return ast.copy_location(newNode, node)
+
+    def isParenthesized(self, nameNode):
+        """Return True if the name is enclosed in parentheses in the text.
+
+        Arguments:
+            nameNode -- the ast name node to check
+        """
+        line = self.eqnLines[nameNode.lineno - 1]
+        before = line[:nameNode.col_offset].rstrip()
+        after = line[nameNode.col_offset + len(nameNode.id):].lstrip()
+        return before.endswith(b'(') and after.startswith(b')')
+
+
+class DecimalConverter(ast.NodeTransformer):
+    """Class to convert an equation to use decimal arithmetic.
+
+    Replaces float constants (including pi and e) with names of decimal
+    constants and arithmetic operators with calls to decimal functions.
+    """
+    def __init__(self):
+        """Initialize the converter.
+        """
+        super().__init__()
+        self.constants = {}
+
+    def decimalName(self, value, node):
+        """Return a name node for a new decimal constant.
+
+        Arguments:
+            value -- the decimal value
+            node -- the ast node being replaced
+        """
+        name = _decimalConstName.format(len(self.constants))
+        self.constants[name] = value
+        return ast.copy_location(ast.Name(id=name, ctx=ast.Load()), node)
+
+    def visit_Constant(self, node):
+        """Replace float constants with decimals.
+
+        Arguments:
+            node -- the ast node being checked
+        """
+        value = ast.literal_eval(node)
+        if type(value) is float:
+            return self.decimalName(decimal.Decimal(repr(value)), node)
+        return node
+
+    visit_Num = visit_Constant
+
+    def visit_Name(self, node):
+        """Replace the pi and e constants with decimals.
+
+        Arguments:
+            node -- the ast node being checked
+        """
+        if node.id in ('pi', 'e'):
+            return self.decimalName(decimal.Decimal(repr(safeGlobals[node.
+                                                                     id])),
+                                    node)
+        return node
+
+    def visit_BinOp(self, node):
+        """Replace arithmetic operators with decimal function calls.
+
+        Arguments:
+            node -- the ast node being checked
+        """
+        self.generic_visit(node)
+        funcName = '_decimal{0}'.format(type(node.op).__name__)
+        if funcName not in decimalGlobals:
+            return node
+        newNode = ast.Call(func=ast.Name(id=funcName, ctx=ast.Load()),
+                           args=[node.left, node.right], keywords=[])
+        return ast.copy_location(newNode, node)
+
+
 class SafeEvalChecker(ast.NodeVisitor):
     """Class to check that only safe functions are used in an eval expression.
 
@@ -568,6 +1386,47 @@ class SafeEvalChecker(ast.NodeVisitor):
                              format(type(node).__name__))
 
 
+####  Utility Functions  ####
+
+def isNumberNode(node):
+    """Return True if the ast node is an int or float constant.
+
+    Arguments:
+        node -- the ast node to check
+    """
+    return (type(node).__name__ in ('Num', 'Constant') and
+            type(ast.literal_eval(node)) in (int, float))
+
+def valueText(value):
+    """Return the text of a reference value for evaluating equation text.
+
+    Decimal values, including those in lists of child values, are given as
+    floats.
+    Arguments:
+        value -- the reference value to convert
+    """
+    if isinstance(value, decimal.Decimal):
+        return repr(float(value))
+    if isinstance(value, list):
+        return '[{0}]'.format(', '.join(valueText(item) for item in value))
+    return repr(value)
+
+def compiledFunction(argNames, exprNode, funcGlobals):
+    """Return a function of the given arguments that evaluates an expression.
+
+    Raises SyntaxError, ValueError or TypeError if the ast can't be compiled.
+    Arguments:
+        argNames -- a list of argument names
+        exprNode -- the ast expression node to evaluate
+        funcGlobals -- a dict of the names available to the function
+    """
+    lambdaTree = ast.parse('lambda {0}: 0'.format(', '.join(argNames)),
+                           mode='eval')
+    lambdaTree.body.body = exprNode
+    ast.fix_missing_locations(lambdaTree)
+    return eval(compile(lambdaTree, '<equation>', 'eval'), funcGlobals)
+
+
 if __name__ == '__main__':
     checker = SafeEvalChecker()
     try:
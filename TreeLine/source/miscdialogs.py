@@ -20,6 +20,7 @@ import collections
 from PyQt4 import QtCore, QtGui
 import printdialogs
 import undo
+import matheval
 import options
 import globalref
 
@@ -281,6 +282,23 @@ class FilePropertiesDialog(QtGui.QDialog):
         self.zeroBlanks = QtGui.QCheckBox(_('&Treat blank fields as zeros'))
         self.zeroBlanks.setChecked(localControl.model.mathZeroBlanks)
         groupLayout.addWidget(self.zeroBlanks)
+        decimalLayout = QtGui.QHBoxLayout()
+        groupLayout.addLayout(decimalLayout)
+        self.decimalCheck = QtGui.QCheckBox(_('Use e&xact decimal '
+                                              'arithmetic'))
+        self.decimalCheck.setChecked(localControl.model.mathDecimalDigits > 0)
+        decimalLayout.addWidget(self.decimalCheck)
+        decimalLayout.addStretch(0)
+        self.digitsBox = QtGui.QSpinBox()
+        self.digitsBox.setRange(1, 999)
+        self.digitsBox.setValue(localControl.model.mathDecimalDigits or
+                                matheval.defaultDecimalDigits)
+        self.digitsBox.setEnabled(self.decimalCheck.isChecked())
+        self.decimalCheck.toggled.connect(self.digitsBox.setEnabled)
+        decimalLayout.addWidget(self.digitsBox)
+        label = QtGui.QLabel(_('&digits'))
+        label.setBuddy(self.digitsBox)
+        decimalLayout.addWidget(label)
 
         ctrlLayout = QtGui.QHBoxLayout()
         topLayout.addLayout(ctrlLayout)
@@ -295,21 +313,26 @@ class FilePropertiesDialog(QtGui.QDialog):
     def accept(self):
         """Store the results.
         """
+        decimalDigits = (self.digitsBox.value() if
+                         self.decimalCheck.isChecked() else 0)
         if (self.localControl.compressed != self.compressCheck.isChecked() or
             self.localControl.encrypted != self.encryptCheck.isChecked() or
             self.localControl.spellCheckLang != self.spellCheckEdit.text() or
             self.localControl.model.mathZeroBlanks !=
-            self.zeroBlanks.isChecked()):
+            self.zeroBlanks.isChecked() or
+            self.localControl.model.mathDecimalDigits != decimalDigits):
             undo.ParamUndo(self.localControl.model.undoList,
                            [(self.localControl, 'compressed'),
                             (self.localControl, 'encrypted'),
                             (self.localControl, 'spellCheckLang'),
-                            (self.localControl.model, 'mathZeroBlanks')])
+                            (self.localControl.model, 'mathZeroBlanks'),
+                            (self.localControl.model, 'mathDecimalDigits')])
             self.localControl.compressed = self.compressCheck.isChecked()
             self.localControl.encrypted = self.encryptCheck.isChecked()
             self.localControl.spellCheckLang = self.spellCheckEdit.text()
             self.localControl.model.mathZeroBlanks = (self.zeroBlanks.
                                                       isChecked())
+            self.localControl.model.mathDecimalDigits = decimalDigits
             super().accept()
         else:
             super().reject()
@@ -533,7 +556,7 @@ class FindFilterDialog(QtGui.QDialog):
     dialogShown = QtCore.pyqtSignal(bool)
     findDialog, filterDialog = range(2)
     fullData, titlesOnly = range(2)
-    keyWords, fullWords, fullPhrase, regExp = range(4)
+    keyWords, fullWords, fullPhrase, regExp, approximate = range(5)
     def __init__(self, dialogType, parent=None):
         """Initialize the find dialog.
 
@@ -543,6 +566,7 @@ class FindFilterDialog(QtGui.QDialog):
         """
         super().__init__(parent)
         self.dialogType = dialogType
+        self.searchText = ''
         self.setAttribute(QtCore.Qt.WA_QuitOnClose, False)
         self.setWindowFlags(QtCore.Qt.Window | QtCore.Qt.WindowStaysOnTopHint)
 
@@ -587,6 +611,9 @@ class FindFilterDialog(QtGui.QDialog):
         button = QtGui.QRadioButton(_('&Regular expression'))
         self.howButtons.addButton(button, FindFilterDialog.regExp)
         howLayout.addWidget(button)
+        button = QtGui.QRadioButton(_('Appro&ximate match'))
+        self.howButtons.addButton(button, FindFilterDialog.approximate)
+        howLayout.addWidget(button)
         self.howButtons.button(FindFilterDialog.keyWords).setChecked(True)
 
         ctrlLayout = QtGui.QHBoxLayout()
@@ -600,6 +627,10 @@ class FindFilterDialog(QtGui.QDialog):
             self.nextButton.setDefault(True)
             ctrlLayout.addWidget(self.nextButton)
             self.nextButton.clicked.connect(self.findNext)
+            self.stopButton = QtGui.QPushButton(_('Stop'))
+            ctrlLayout.addWidget(self.stopButton)
+            self.stopButton.clicked.connect(self.stopFind)
+            self.stopButton.setEnabled(False)
             self.resultLabel = QtGui.QLabel()
             topLayout.addWidget(self.resultLabel)
         else:
@@ -660,22 +691,70 @@ class FindFilterDialog(QtGui.QDialog):
                 QtGui.QMessageBox.warning(self, 'TreeLine',
                                        _('Error - invalid regular expression'))
                 return
-            result = control.findNodesByRegExp([regExp], titlesOnly, forward)
+            result = control.findNodesByRegExp([regExp], titlesOnly, forward,
+                                               resultFunc=self.showResult)
         elif self.howButtons.checkedId() == FindFilterDialog.fullWords:
             regExpList = []
-            for word in text.lower().split():
+            wordList = text.lower().split()
+            for word in wordList:
                 regExpList.append(re.compile(r'(?i)\b{}\b'.
                                              format(re.escape(word))))
-            result = control.findNodesByRegExp(regExpList, titlesOnly, forward)
+            result = control.findNodesByRegExp(regExpList, titlesOnly, forward,
+                                               wordList, self.showResult)
         elif self.howButtons.checkedId() == FindFilterDialog.keyWords:
             wordList = text.lower().split()
-            result = control.findNodesByWords(wordList, titlesOnly, forward)
+            result = control.findNodesByWords(wordList, titlesOnly, forward,
+                                              self.showResult)
+        elif self.howButtons.checkedId() == FindFilterDialog.approximate:
+            control.cancelFind()
+            result = control.findNodesByApproximate(text, titlesOnly, forward)
+            if result:
+                self.resultLabel.setText(_('Closest match {0} of {1}').
+                                         format(*result))
+                return
+            result = False
         else:         # full phrase
             wordList = [text.lower().strip()]
-            result = control.findNodesByWords(wordList, titlesOnly, forward)
-        if not result:
+            result = control.findNodesByWords(wordList, titlesOnly, forward,
+                                              self.showResult)
+        self.searchText = text
+        self.showResult(result)
+
+    def showResult(self, result):
+        """Show the result of a find operation.
+
+        Arguments:
+            result -- True if found, False if not, None if still searching
+        """
+        self.stopButton.setEnabled(result is None)
+        if result is None:
+            self.resultLabel.setText(_('Searching...'))
+        elif result:
+            self.resultLabel.setText('')
+        else:
             self.resultLabel.setText(_('Search string "{0}" not found').
-                                     format(text))
+                                     format(self.searchText))
+
+    def stopFind(self):
+        """Cancel a continuing find operation.
+        """
+        globalref.mainControl.activeControl.cancelFind()
+        self.stopButton.setEnabled(False)
+        self.resultLabel.setText(_('Search stopped'))
+
+    def keyPressEvent(self, event):
+        """Cancel a continuing find with the escape key before closing.
+
+        Arguments:
+            event -- the key press event
+        """
+        if (event.key() == QtCore.Qt.Key_Escape and
+            self.dialogType == FindFilterDialog.findDialog and
+            self.stopButton.isEnabled()):
+            self.stopFind()
+            event.accept()
+            return
+        super().keyPressEvent(event)
 
     def findPrevious(self):
         """Find the previous match.
@@ -710,6 +789,7 @@ class FindFilterDialog(QtGui.QDialog):
         """Stop filtering nodes.
         """
         window = globalref.mainControl.activeControl.activeWindow
+        window.treeFilterView.cancelFilter()
         window.treeStack.setCurrentWidget(window.treeView)
         self.updateAvail()
         globalref.mainControl.currentStatusBar().clearMessage()
@@ -720,6 +800,9 @@ class FindFilterDialog(QtGui.QDialog):
         Arguments:
             event -- the close event
         """
+        if (self.dialogType == FindFilterDialog.findDialog and
+            self.stopButton.isEnabled()):
+            self.stopFind()
         self.dialogShown.emit(False)
 
 
@@ -740,6 +823,8 @@ class FindReplaceDialog(QtGui.QDialog):
         self.setWindowTitle(_('Find and Replace'))
 
         self.matchedNode = None
+        self.searchText = ''
+
         topLayout = QtGui.QGridLayout(self)
         self.setLayout(topLayout)
 
@@ -802,6 +887,10 @@ class FindReplaceDialog(QtGui.QDialog):
         self.replaceAllButton = QtGui.QPushButton(_('Replace &All'))
         ctrlLayout.addWidget(self.replaceAllButton)
         self.replaceAllButton.clicked.connect(self.replaceAll)
+        self.stopButton = QtGui.QPushButton(_('Stop'))
+        ctrlLayout.addWidget(self.stopButton)
+        self.stopButton.clicked.connect(self.stopFind)
+        self.stopButton.setEnabled(False)
         closeButton = QtGui.QPushButton(_('&Close'))
         ctrlLayout.addWidget(closeButton)
         closeButton.clicked.connect(self.close)
@@ -904,14 +993,47 @@ class FindReplaceDialog(QtGui.QDialog):
             self.updateAvail()
             return
         control = globalref.mainControl.activeControl
-        if control.findNodesForReplace(searchText, regExpObj, typeName,
-                                       fieldName, forward):
+        self.searchText = self.textEntry.text()
+        self.showResult(control.findNodesForReplace(searchText, regExpObj,
+                                                    typeName, fieldName,
+                                                    forward, self.showResult))
+
+    def showResult(self, result):
+        """Show the result of a find operation.
+
+        Arguments:
+            result -- True if found, False if not, None if still searching
+        """
+        if result:
+            control = globalref.mainControl.activeControl
             self.matchedNode = control.currentSelectionModel().currentNode()
-            self.updateAvail()
-        else:
-            self.updateAvail()
+        self.updateAvail()
+        self.stopButton.setEnabled(result is None)
+        if result is None:
+            self.resultLabel.setText(_('Searching...'))
+        elif not result:
             self.resultLabel.setText(_('Search text "{0}" not found').
-                                     format(self.textEntry.text()))
+                                     format(self.searchText))
+
+    def stopFind(self):
+        """Cancel a continuing find operation.
+        """
+        globalref.mainControl.activeControl.cancelFind()
+        self.stopButton.setEnabled(False)
+        self.resultLabel.setText(_('Search stopped'))
+
+    def keyPressEvent(self, event):
+        """Cancel a continuing find with the escape key before closing.
+
+        Arguments:
+            event -- the key press event
+        """
+        if (event.key() == QtCore.Qt.Key_Escape and
+            self.stopButton.isEnabled()):
+            self.stopFind()
+            event.accept()
+            return
+        super().keyPressEvent(event)
 
     def findPrevious(self):
         """Find the previous match.
@@ -956,6 +1078,8 @@ class FindReplaceDialog(QtGui.QDialog):
         Arguments:
             event -- the close event
         """
+        if self.stopButton.isEnabled():
+            self.stopFind()
         self.dialogShown.emit(False)
 
 
@@ -1086,7 +1210,7 @@ class SortDialog(QtGui.QDialog):
         else:
             for node in selNodes:
                 node.sortChildrenByTitle(False, forward)
-        control.updateAll()
+        control.updateAll(clearCaches=False)
         QtGui.QApplication.restoreOverrideCursor()
 
     def sortAndClose(self):
@@ -1224,12 +1348,17 @@ class NumberingDialog(QtGui.QDialog):
             else:
                 levelLimit = sys.maxsize
             startNum = [1]
-            for node in selNodes:
-                node.updateNumbering(fieldDict, startNum, levelLimit,
-                                     includeRoot, reserveNums, restartSetting)
-                if not restartSetting:
-                    startNum[0] += 1
-            control.updateAll()
+            with control.batchEdit():
+                for node in selNodes:
+                    for changedNode in node.updateNumbering(fieldDict,
+                                                            startNum,
+                                                            levelLimit,
+                                                            includeRoot,
+                                                            reserveNums,
+                                                            restartSetting):
+                        control.updateTreeNode(changedNode)
+                    if not restartSetting:
+                        startNum[0] += 1
         QtGui.QApplication.restoreOverrideCursor()
 
     def numberAndClose(self):
@@ -1940,3 +2069,88 @@ class PluginListDialog(QtGui.QDialog):
         self.okButton = QtGui.QPushButton(_('&OK'))
         ctrlLayout.addWidget(self.okButton)
         self.okButton.clicked.connect(self.accept)
+
+
+class MathProfileDialog(QtGui.QDialog):
+    """Dialog for recording and showing the cost of math field evaluations.
+    """
+    def __init__(self, model, parent=None):
+        """Create a math profile dialog.
+
+        Arguments:
+            model -- the tree model to profile
+            parent -- the parent window
+        """
+        super().__init__(parent)
+        self.model = model
+        self.setWindowFlags(QtCore.Qt.Dialog | QtCore.Qt.WindowTitleHint |
+                            QtCore.Qt.WindowSystemMenuHint)
+        self.setWindowTitle(_('Math Field Profile'))
+
+        topLayout = QtGui.QVBoxLayout(self)
+        self.setLayout(topLayout)
+        self.recordBox = QtGui.QCheckBox(_('&Record math evaluations '
+                                           'for this file'))
+        self.recordBox.setChecked(model.mathProfiler != None)
+        self.recordBox.toggled.connect(self.setRecording)
+        topLayout.addWidget(self.recordBox)
+        self.profileView = QtGui.QTreeWidget()
+        self.profileView.setRootIsDecorated(False)
+        self.profileView.setSelectionMode(QtGui.QAbstractItemView.
+                                          NoSelection)
+        self.profileView.setHeaderLabels([_('Type'), _('Field'),
+                                          _('Evaluations'),
+                                          _('Total Time (ms)'),
+                                          _('Mean Time (ms)'),
+                                          _('References'),
+                                          _('Dependents')])
+        topLayout.addWidget(self.profileView)
+
+        ctrlLayout = QtGui.QHBoxLayout()
+        topLayout.addLayout(ctrlLayout)
+        self.resetButton = QtGui.QPushButton(_('R&eset'))
+        ctrlLayout.addWidget(self.resetButton)
+        self.resetButton.clicked.connect(self.resetProfile)
+        ctrlLayout.addStretch()
+        closeButton = QtGui.QPushButton(_('&Close'))
+        ctrlLayout.addWidget(closeButton)
+        closeButton.clicked.connect(self.accept)
+        self.updateProfile()
+
+    def updateProfile(self):
+        """Load the recorded profile into the view.
+        """
+        self.profileView.clear()
+        self.resetButton.setEnabled(self.model.mathProfiler != None)
+        if not self.model.mathProfiler:
+            return
+        for (typeName, fieldName, count, seconds, refCount,
+             dependentCount) in (self.model.mathProfiler.
+                                 records(self.model.formats)):
+            meanTime = ('{0:.3f}'.format(seconds * 1000 / count) if count
+                        else '')
+            item = QtGui.QTreeWidgetItem(self.profileView,
+                                         [typeName, fieldName, str(count),
+                                          '{0:.1f}'.format(seconds * 1000),
+                                          meanTime, str(refCount),
+                                          str(dependentCount)])
+            for column in range(2, 7):
+                item.setTextAlignment(column, QtCore.Qt.AlignRight)
+        for column in range(7):
+            self.profileView.resizeColumnToContents(column)
+
+    def setRecording(self, record):
+        """Start or stop recording for the file.
+
+        Stopping discards the recorded data.
+        Arguments:
+            record -- record evaluations if True
+        """
+        self.model.mathProfiler = matheval.MathProfiler() if record else None
+        self.updateProfile()
+
+    def resetProfile(self):
+        """Remove the recorded data and continue recording.
+        """
+        self.model.mathProfiler.clear()
+        self.updateProfile()
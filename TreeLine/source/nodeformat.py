@@ -518,6 +518,34 @@ class NodeFormat:
             return bestFields[0]
         return availFields[0]
 
+    def hasExternalTitleRefs(self):
+        """Return True if the title uses data from other nodes or formats.
+
+        Includes ancestor, child, descendant count, unique ID and file info
+        field references.
+        """
+        return any(not isinstance(part, str) and
+                   self.fieldDict.get(part.name) is not part
+                   for part in self.lineList[0])
+
+    def titleRefScope(self):
+        """Return a tuple of the ancestor levels and child use of the title.
+
+        The first item is the highest ancestor level used by the title, or
+        sys.maxsize if any ancestor level can be used.  The second item is
+        True if the title uses child data.
+        """
+        ancestorLevel = 0
+        usesChildren = False
+        for part in self.lineList[0]:
+            if isinstance(part, fieldformat.AncestorLevelField):
+                ancestorLevel = max(ancestorLevel, part.ancestorLevel)
+            elif isinstance(part, fieldformat.AnyAncestorField):
+                ancestorLevel = sys.maxsize
+            elif isinstance(part, fieldformat.ChildListField):
+                usesChildren = True
+        return (ancestorLevel, usesChildren)
+
     def numberingFieldList(self):
         """Return a list of numbering field names.
         """
@@ -580,11 +608,24 @@ class FileInfoFormat(NodeFormat):
             fileName -- the TreeLine file path
             fileInfoNode -- the node to update
         """
+        oldData = fileInfoNode.data.copy()
         try:
             status = os.stat(fileName)
         except OSError:
             fileInfoNode.data = {}
-            return
+        else:
+            self.setFileInfoData(status, fileName, fileInfoNode)
+        if fileInfoNode.data != oldData:
+            fileInfoNode.modelRef.nodeDataChanged(fileInfoNode)
+
+    def setFileInfoData(self, status, fileName, fileInfoNode):
+        """Store file status data in the file info node.
+
+        Arguments:
+            status -- the os.stat result for the file
+            fileName -- the TreeLine file path
+            fileInfoNode -- the node to update
+        """
         fileInfoNode.data[FileInfoFormat.fileFieldName] = (os.path.
                                                            basename(fileName))
         fileInfoNode.data[FileInfoFormat.pathFieldName] = (os.path.
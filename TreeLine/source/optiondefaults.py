@@ -66,6 +66,9 @@ def setGenOptionDefaults(generalOptions):
                   _('Minutes between saves\n(set to 0 to disable)'), 1)
     IntOptionItem(generalOptions, 'RecentFiles', 4, 0, 99, _('Recent Files'),
                   _('Number of recent files \nin the file menu'), 1)
+    IntOptionItem(generalOptions, 'FindTimeout', 0, 0, 9999, _('Find'),
+                  _('Seconds before stopping a find\n(set to 0 to disable)'),
+                  1)
     StringOptionItem(generalOptions, 'EditTimeFormat', 'H:mm:ss', False,
                      _('Data Editor Formats'), _('Times'), 1)
     StringOptionItem(generalOptions, 'EditTimeFormat', 'HH:mm:ss', False,
@@ -205,6 +208,7 @@ def setKeyboardOptionDefaults(keyboardOptions):
     KeyOptionItem(keyboardOptions, 'ToolsFilterText', '', 'Tools Menu')
     KeyOptionItem(keyboardOptions, 'ToolsFilterCondition', '', 'Tools Menu')
     KeyOptionItem(keyboardOptions, 'ToolsSpellCheck', '', 'Tools Menu')
+    KeyOptionItem(keyboardOptions, 'ToolsMathProfile', '', 'Tools Menu')
     KeyOptionItem(keyboardOptions, 'ToolsGenOptions', '', 'Tools Menu')
     KeyOptionItem(keyboardOptions, 'ToolsShortcuts', '', 'Tools Menu')
     KeyOptionItem(keyboardOptions, 'ToolsToolbars', '', 'Tools Menu')
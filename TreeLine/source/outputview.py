@@ -97,34 +97,25 @@ class OutputView(QtGui.QTextBrowser):
         """
         return self.textCursor().hasSelection()
 
-    def highlightSearch(self, wordList=None, regExpList=None):
+    def highlightSearch(self, highlightSpec):
         """Highlight any found search terms.
 
         Arguments:
-            wordList -- list of words to highlight
-            regExpList -- a list of regular expression objects to highlight
+            highlightSpec -- the HighlightSpec object with the search terms
         """
         backColor = self.palette().brush(QtGui.QPalette.Active,
                                          QtGui.QPalette.Highlight)
         foreColor = self.palette().brush(QtGui.QPalette.Active,
                                          QtGui.QPalette.HighlightedText)
-        if wordList is None:
-            wordList = []
-        if regExpList is None:
-            regExpList = []
-        for regExp in regExpList:
-            for match in regExp.finditer(self.toPlainText()):
-                matchText = match.group()
-                if matchText not in wordList:
-                    wordList.append(matchText)
         selections = []
-        for word in wordList:
-            while self.find(word):
-                extraSel = QtGui.QTextEdit.ExtraSelection()
-                extraSel.cursor = self.textCursor()
-                extraSel.format.setBackground(backColor)
-                extraSel.format.setForeground(foreColor)
-                selections.append(extraSel)
+        for start, end in highlightSpec.spans(self.toPlainText()):
+            extraSel = QtGui.QTextEdit.ExtraSelection()
+            extraSel.cursor = QtGui.QTextCursor(self.document())
+            extraSel.cursor.setPosition(start)
+            extraSel.cursor.setPosition(end, QtGui.QTextCursor.KeepAnchor)
+            extraSel.format.setBackground(backColor)
+            extraSel.format.setForeground(foreColor)
+            selections.append(extraSel)
         cursor = QtGui.QTextCursor(self.document())
         self.setTextCursor(cursor)  # reset main cursor/selection
         self.setExtraSelections(selections)
@@ -61,6 +61,7 @@ from PyQt4 import QtCore, QtGui
 import treeoutput
 import nodeformat
 import fieldformat
+import matheval
 import treeopener
 import dataeditview
 import exports
@@ -662,6 +663,29 @@ class PluginInterface():
         """
         self.formatChangeCallbacks.append(callbackFunc)
 
+    def setMathProfiling(self, record=True):
+        """Start or stop recording math field evaluation costs.
+
+        Applies to the current file.  Stopping discards the recorded data.
+        Arguments:
+            record -- record evaluations if True
+        """
+        model = globalref.mainControl.activeControl.model
+        model.mathProfiler = matheval.MathProfiler() if record else None
+
+    def getMathProfile(self):
+        """Return a list of recorded math evaluation cost tuples.
+
+        Each tuple has the type name, field name, evaluation count, total
+        seconds, number of equation references to the field name and number
+        of dependent fields found for its changes, sorted by decreasing time.
+        Returns an empty list if not recording.
+        """
+        model = globalref.mainControl.activeControl.model
+        if not model.mathProfiler:
+            return []
+        return model.mathProfiler.records(model.formats)
+
 
     #**************************************************************************
     #   View Interfaces:
@@ -680,11 +704,22 @@ class PluginInterface():
     def updateTreeNode(self, node):
         """Update the given node in all tree views.
 
+        Call after changing the node's data.
         Arguments:
             node -- the node to be updated
         """
+        node.modelRef.nodeDataChanged(node)
         globalref.mainControl.activeControl.updateTreeNode(node, False)
 
+    def batchEdit(self):
+        """Return a context manager that defers updates during bulk changes.
+
+        Use in a with statement around changes to many nodes.  Calls to
+        updateTreeNode and updateViews inside it are combined into one
+        update of the math fields and views at the end.
+        """
+        return globalref.mainControl.activeControl.batchEdit()
+
     def getActiveWindow(self):
         """Return the currently active main window.
 
@@ -817,8 +852,7 @@ class PluginInterface():
         rootElement.attrib.update(globalref.mainControl.printData.xmlAttr())
         if globalref.mainControl.spellCheckLang:
             rootElement.set('spellchk', globalref.mainControl.spellCheckLang)
-        if not globalref.mainControl.model.mathZeroBlanks:
-            rootElement.set('zeroblanks', 'n')
+        rootElement.attrib.update(globalref.mainControl.model.mathXmlAttr())
         elementTree = ElementTree.ElementTree(rootElement)
         try:
             # use binary for regular files to avoid newline translation
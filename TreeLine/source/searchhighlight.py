@@ -0,0 +1,112 @@
+#!/usr/bin/env python3
+
+#******************************************************************************
+# searchhighlight.py, provides a class to find search terms for highlighting
+#
+# TreeLine, an information storage program
+# Copyright (C) 2015, Douglas W. Bell
+#
+# This is free software; you can redistribute it and/or modify it under the
+# terms of the GNU General Public License, either Version 2 or any later
+# version.  This program is distributed in the hope that it will be useful,
+# but WITTHOUT ANY WARRANTY.  See the included LICENSE file for details.
+#******************************************************************************
+
+import re
+
+
+class HighlightSpec:
+    """Stores compiled search terms to find the text spans to highlight.
+
+    Built once for a search and shared by the views that highlight it.
+    """
+    def __init__(self, wordList=None, regExpList=None):
+        """Compile the search words into a single expression.
+
+        The words are merged into a prefix tree pattern that is tried
+        longest first at each position, so one scan of the text finds all
+        of the words, including overlapping ones.  The work at each position
+        depends on the longest word, not on the number of words.
+        Arguments:
+            wordList -- list of words or phrases to highlight
+            regExpList -- a list of regular expression objects to highlight
+        """
+        words = {word.lower() for word in (wordList or []) if word}
+        self.wordRegExp = None
+        if words:
+            pattern = wordPattern(words)
+            self.wordRegExp = re.compile('(?=({0}))'.format(pattern),
+                                         re.IGNORECASE)
+        self.regExpList = regExpList or []
+
+    def __bool__(self):
+        """Return True if there are any search terms.
+        """
+        return bool(self.wordRegExp or self.regExpList)
+
+    def spans(self, text):
+        """Return a sorted list of non-overlapping (start, end) match spans.
+
+        Arguments:
+            text -- the plain text to search
+        """
+        spanList = []
+        if self.wordRegExp:
+            spanList.extend(match.span(1) for match in
+                            self.wordRegExp.finditer(text))
+        for regExp in self.regExpList:
+            spanList.extend(match.span() for match in regExp.finditer(text)
+                            if match.end() > match.start())
+        if len(self.regExpList) + bool(self.wordRegExp) > 1:
+            spanList.sort()
+        mergedList = []
+        for start, end in spanList:
+            if mergedList and start <= mergedList[-1][1]:
+                if end > mergedList[-1][1]:
+                    mergedList[-1] = (mergedList[-1][0], end)
+            else:
+                mergedList.append((start, end))
+        return mergedList
+
+
+####  Utility Functions  ####
+
+def wordPattern(words):
+    """Return a regular expression pattern matching the longest of the words.
+
+    The words are stored in a prefix tree, so each alternative in the
+    pattern starts with a different character and a failed match is found
+    without trying the other words.  A word that is the start of a longer
+    one becomes an optional ending, so the longer word is tried first.
+    Arguments:
+        words -- a set of non-empty words
+    """
+    tree = {}
+    for word in words:
+        branch = tree
+        for char in word:
+            branch = branch.setdefault(char, {})
+        branch[''] = {}
+    return branchPattern(tree)
+
+def branchPattern(branch):
+    """Return the regular expression pattern for a prefix tree branch.
+
+    An empty string key marks the end of a word.  Characters without other
+    choices are added directly, so only branch points add nested groups.
+    Arguments:
+        branch -- a dictionary of the next characters and their branches
+    """
+    chars = []
+    while len(branch) == 1 and '' not in branch:
+        char, branch = next(iter(branch.items()))
+        chars.append(re.escape(char))
+    alternatives = [re.escape(char) + branchPattern(subBranch) for
+                    char, subBranch in sorted(branch.items()) if char]
+    if '' in branch and alternatives:
+        chars.append('(?:{0})?'.format('|'.join(alternatives)))
+    elif len(alternatives) == 1:
+        chars.append(alternatives[0])
+    elif alternatives:
+        chars.append('(?:{0})'.format('|'.join(alternatives)))
+    return ''.join(chars)
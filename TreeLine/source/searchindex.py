@@ -0,0 +1,518 @@
+#!/usr/bin/env python3
+
+#******************************************************************************
+# searchindex.py, provides classes to store indexes of node text and values
+#
+# TreeLine, an information storage program
+# Copyright (C) 2015, Douglas W. Bell
+#
+# This is free software; you can redistribute it and/or modify it under the
+# terms of the GNU General Public License, either Version 2 or any later
+# version.  This program is distributed in the hope that it will be useful,
+# but WITTHOUT ANY WARRANTY.  See the included LICENSE file for details.
+#******************************************************************************
+
+import re
+import bisect
+import heapq
+
+_wordRe = re.compile(r'\w+')
+_minWordSimilarity = 0.3
+_dataWordWeight = 0.8     # lowers the score of data matches vs. title matches
+
+
+class SearchIndex:
+    """Class to store and retrieve the nodes that contain given words.
+
+    Used to limit word and full word searches to candidate nodes, which are
+    then verified with the normal node search methods.  Also provides a
+    trigram index of the indexed words for approximate searches.
+    The index is built when first queried and updated for changed nodes.
+    """
+    def __init__(self, modelRef):
+        """Initialize the index.
+
+        The titleTokenDict and dataTokenDict store sets of nodes by lowercase
+        word, from the node titles and the stored field data, respectively.
+        The nodeTokenDict stores a tuple of a data fingerprint and the title
+        and data word sets by node.
+        The trigramDict stores sets of indexed words by trigram, it is only
+        built for the first approximate search.
+        Arguments:
+            modelRef -- a ref to the tree model
+        """
+        self.modelRef = modelRef
+        self.titleTokenDict = {}
+        self.dataTokenDict = {}
+        self.nodeTokenDict = {}
+        self.trigramDict = None
+        self.treePosRef = None
+        self.checkAllNodes = False
+
+    def clear(self):
+        """Remove all index entries, the index is rebuilt when next used.
+        """
+        self.titleTokenDict = {}
+        self.dataTokenDict = {}
+        self.nodeTokenDict = {}
+        self.trigramDict = None
+        self.treePosRef = None
+        self.checkAllNodes = False
+
+    def markAllChanged(self):
+        """Set all nodes to be checked for changes when the index is next used.
+
+        Called after changes to many nodes.
+        """
+        self.checkAllNodes = True
+
+    def addNode(self, node):
+        """Add index entries for the given node.
+
+        Arguments:
+            node -- the node to index
+        """
+        text, titleLen, lowerText, lowerTitleLen = node.searchStrings()
+        titleTokens = frozenset(_wordRe.findall(lowerText, 0, lowerTitleLen))
+        dataTokens = frozenset(_wordRe.findall(lowerText, lowerTitleLen))
+        if self.trigramDict is not None:
+            for token in titleTokens | dataTokens:
+                if (token not in self.titleTokenDict and
+                    token not in self.dataTokenDict):
+                    self.addTrigrams(token)
+        for token in titleTokens:
+            self.titleTokenDict.setdefault(token, set()).add(node)
+        for token in dataTokens:
+            self.dataTokenDict.setdefault(token, set()).add(node)
+        self.nodeTokenDict[node] = (nodeFingerprint(node), titleTokens,
+                                    dataTokens)
+
+    def removeNode(self, node):
+        """Remove the index entries for the given node.
+
+        Arguments:
+            node -- the node to remove
+        """
+        fingerprint, titleTokens, dataTokens = self.nodeTokenDict.pop(node)
+        for tokens, tokenDict in ((titleTokens, self.titleTokenDict),
+                                  (dataTokens, self.dataTokenDict)):
+            for token in tokens:
+                nodes = tokenDict[token]
+                nodes.discard(node)
+                if not nodes:
+                    del tokenDict[token]
+                    if (self.trigramDict is not None and
+                        token not in self.titleTokenDict and
+                        token not in self.dataTokenDict):
+                        self.removeTrigrams(token)
+
+    def addTrigrams(self, token):
+        """Add a newly indexed word to the trigram index.
+
+        Arguments:
+            token -- the word to add
+        """
+        for trigram in wordTrigrams(token):
+            self.trigramDict.setdefault(trigram, set()).add(token)
+
+    def removeTrigrams(self, token):
+        """Remove a word that is no longer indexed from the trigram index.
+
+        Arguments:
+            token -- the word to remove
+        """
+        for trigram in wordTrigrams(token):
+            tokens = self.trigramDict[trigram]
+            tokens.discard(token)
+            if not tokens:
+                del self.trigramDict[trigram]
+
+    def updateNode(self, node):
+        """Update the index entries for a node after a data change.
+
+        Does nothing if the node is not indexed yet.
+        Arguments:
+            node -- the changed node
+        """
+        if node in self.nodeTokenDict:
+            self.removeNode(node)
+            self.addNode(node)
+
+    def updateIndex(self):
+        """Bring the index up to date with the model before a query.
+
+        Adds and removes nodes if the tree structure changed and re-indexes
+        changed nodes if a check is pending.
+        """
+        self.modelRef.treePosition(self.modelRef.root)
+        treePosDict = self.modelRef.treePosDict
+        if treePosDict is not self.treePosRef:
+            for node in self.nodeTokenDict.keys() - treePosDict.keys():
+                self.removeNode(node)
+            for node in treePosDict.keys() - self.nodeTokenDict.keys():
+                self.addNode(node)
+            self.treePosRef = treePosDict
+        if self.checkAllNodes:
+            externalTypes = self.modelRef.externalTitleTypes()
+            for node, tokenInfo in list(self.nodeTokenDict.items()):
+                if (node.formatName in externalTypes or
+                    nodeFingerprint(node) != tokenInfo[0]):
+                    self.removeNode(node)
+                    self.addNode(node)
+            self.checkAllNodes = False
+
+    def tokenNodes(self, word, titlesOnly=False, fullWord=False):
+        """Return a set of nodes with an indexed word containing the word.
+
+        Arguments:
+            word -- the lowercase word to find
+            titlesOnly -- search only in the title words if True
+            fullWord -- only match indexed words equal to the word if True
+        """
+        tokenDicts = [self.titleTokenDict]
+        if not titlesOnly:
+            tokenDicts.append(self.dataTokenDict)
+        nodes = set()
+        for tokenDict in tokenDicts:
+            if fullWord:
+                nodes.update(tokenDict.get(word, ()))
+            else:
+                for token, tokenNodes in tokenDict.items():
+                    if word in token:
+                        nodes.update(tokenNodes)
+        return nodes
+
+    def wordCandidates(self, wordList, titlesOnly=False, fullWords=False):
+        """Return a set of nodes that may match all of the search words.
+
+        The nodes must still be verified with a node search method.
+        Returns None if the words can not be used to limit the search.
+        Arguments:
+            wordList -- a list of lowercase words or phrases to find
+            titlesOnly -- search only in the title text if True
+            fullWords -- the words must match full words if True
+        """
+        self.updateIndex()
+        candidates = None
+        for word in wordList:
+            parts = _wordRe.findall(word)
+            for part in parts:
+                fullWord = fullWords and part == word
+                nodes = self.tokenNodes(part, titlesOnly, fullWord)
+                candidates = (nodes if candidates is None else
+                              candidates & nodes)
+                if not candidates:
+                    return candidates
+        return candidates
+
+    def similarWords(self, word):
+        """Return a dict of similarity scores by indexed word for a word.
+
+        Uses the Dice coefficient of the word trigrams, only includes words
+        with at least the minimum similarity.
+        Arguments:
+            word -- the lowercase word to match
+        """
+        if self.trigramDict is None:
+            self.trigramDict = {}
+            for token in (self.titleTokenDict.keys() |
+                          self.dataTokenDict.keys()):
+                self.addTrigrams(token)
+        trigrams = wordTrigrams(word)
+        sharedCounts = {}
+        for trigram in trigrams:
+            for token in self.trigramDict.get(trigram, ()):
+                sharedCounts[token] = sharedCounts.get(token, 0) + 1
+        similarDict = {}
+        for token, sharedCount in sharedCounts.items():
+            similarity = (2 * sharedCount /
+                          (len(trigrams) + len(wordTrigrams(token))))
+            if similarity >= _minWordSimilarity:
+                similarDict[token] = similarity
+        return similarDict
+
+    def approximateMatches(self, text, titlesOnly=False, maxResults=50):
+        """Return a list of the nodes closest to the text, best match first.
+
+        Each search word is scored against the most similar word in a node
+        and the node score is the average for all search words.  Matches in
+        data are scored a bit lower than matches in titles.
+        Arguments:
+            text -- the search text, may be misspelled
+            titlesOnly -- search only in the title words if True
+            maxResults -- the maximum number of nodes to return
+        """
+        self.updateIndex()
+        wordList = _wordRe.findall(text.lower())
+        if not wordList:
+            return []
+        nodeScores = {}
+        for word in wordList:
+            wordScores = {}
+            for token, similarity in self.similarWords(word).items():
+                tokenScores = [(self.titleTokenDict, similarity)]
+                if not titlesOnly:
+                    tokenScores.append((self.dataTokenDict,
+                                        similarity * _dataWordWeight))
+                for tokenDict, score in tokenScores:
+                    for node in tokenDict.get(token, ()):
+                        if score > wordScores.get(node, 0):
+                            wordScores[node] = score
+            for node, score in wordScores.items():
+                nodeScores[node] = nodeScores.get(node, 0) + score
+        treePosition = self.modelRef.treePosition
+        return heapq.nsmallest(maxResults, nodeScores,
+                               key=lambda node: (-nodeScores[node],
+                                                 treePosition(node)))
+
+
+class FieldIndex:
+    """Class to store and retrieve nodes by field compare values.
+
+    Used to limit conditional searches to candidate nodes.  Value indexes
+    are only built for the node format and field pairs that are queried,
+    and are updated for changed nodes.
+    """
+    def __init__(self, modelRef):
+        """Initialize the index.
+
+        The nodeStateDict stores a tuple of a data fingerprint and the format
+        name by node.  The formatNodeDict stores sets of nodes by format name
+        and the formatFieldDict stores dicts of FieldValueIndex objects by
+        field name, by format name.
+        Arguments:
+            modelRef -- a ref to the tree model
+        """
+        self.modelRef = modelRef
+        self.nodeStateDict = {}
+        self.formatNodeDict = {}
+        self.formatFieldDict = {}
+        self.treePosRef = None
+        self.formatsRef = None
+        self.checkAllNodes = False
+
+    def clear(self):
+        """Remove all index entries, the index is rebuilt when next used.
+        """
+        self.nodeStateDict = {}
+        self.formatNodeDict = {}
+        self.formatFieldDict = {}
+        self.treePosRef = None
+        self.formatsRef = None
+        self.checkAllNodes = False
+
+    def markAllChanged(self):
+        """Set all nodes to be checked for changes when the index is next used.
+
+        Called after changes to many nodes.
+        """
+        self.checkAllNodes = True
+
+    def addNode(self, node):
+        """Add index entries for the given node.
+
+        Arguments:
+            node -- the node to index
+        """
+        formatName = node.formatName
+        self.nodeStateDict[node] = (nodeFingerprint(node), formatName)
+        self.formatNodeDict.setdefault(formatName, set()).add(node)
+        for valueIndex in self.formatFieldDict.get(formatName, {}).values():
+            valueIndex.addNode(node)
+
+    def removeNode(self, node):
+        """Remove the index entries for the given node.
+
+        Arguments:
+            node -- the node to remove
+        """
+        fingerprint, formatName = self.nodeStateDict.pop(node)
+        self.formatNodeDict[formatName].discard(node)
+        for valueIndex in self.formatFieldDict.get(formatName, {}).values():
+            valueIndex.removeNode(node)
+
+    def updateNode(self, node):
+        """Update the index entries for a node after a data change.
+
+        Does nothing if the node is not indexed yet.
+        Arguments:
+            node -- the changed node
+        """
+        if node in self.nodeStateDict:
+            self.removeNode(node)
+            self.addNode(node)
+
+    def updateIndex(self):
+        """Bring the index up to date with the model before a query.
+
+        Starts over if the formats were replaced, adds and removes nodes if
+        the tree structure changed and re-indexes changed nodes if a check is
+        pending.
+        """
+        if self.modelRef.formats is not self.formatsRef:
+            self.clear()
+            self.formatsRef = self.modelRef.formats
+        self.modelRef.treePosition(self.modelRef.root)
+        treePosDict = self.modelRef.treePosDict
+        if treePosDict is not self.treePosRef:
+            for node in self.nodeStateDict.keys() - treePosDict.keys():
+                self.removeNode(node)
+            for node in treePosDict.keys() - self.nodeStateDict.keys():
+                self.addNode(node)
+            self.treePosRef = treePosDict
+        if self.checkAllNodes:
+            for node, nodeState in list(self.nodeStateDict.items()):
+                if (node.formatName != nodeState[1] or
+                    nodeFingerprint(node) != nodeState[0]):
+                    self.removeNode(node)
+                    self.addNode(node)
+            self.checkAllNodes = False
+
+    def valueIndex(self, nodeFormat, fieldName):
+        """Return the value index for a format's field, building it if needed.
+
+        Arguments:
+            nodeFormat -- the node format to index
+            fieldName -- the name of the field to index
+        """
+        fieldDict = self.formatFieldDict.setdefault(nodeFormat.name, {})
+        try:
+            return fieldDict[fieldName]
+        except KeyError:
+            valueIndex = FieldValueIndex(nodeFormat.fieldDict[fieldName])
+            for node in self.formatNodeDict.get(nodeFormat.name, ()):
+                valueIndex.addNode(node)
+            fieldDict[fieldName] = valueIndex
+            return valueIndex
+
+    def matchingNodes(self, nodeFormat, conditionLine):
+        """Return a set of nodes of the format that match a condition line.
+
+        Arguments:
+            nodeFormat -- the node format with the condition's field
+            conditionLine -- the ConditionLine object to match
+        """
+        self.updateIndex()
+        valueIndex = self.valueIndex(nodeFormat, conditionLine.fieldName)
+        return valueIndex.matchingNodes(conditionLine)
+
+
+class FieldValueIndex:
+    """Stores the nodes of a single node format by the value of one field.
+    """
+    def __init__(self, field):
+        """Initialize the value index.
+
+        The valueDict stores sets of nodes by hashable compare value and the
+        nodeValueDict stores the value key by node.  The sorted value keys
+        are only found when needed for a range query.
+        Arguments:
+            field -- the field format object to index
+        """
+        self.field = field
+        self.valueDict = {}
+        self.nodeValueDict = {}
+        self.origValueDict = {}
+        self.sortedKeys = None
+
+    def addNode(self, node):
+        """Add the given node's field value to the index.
+
+        Arguments:
+            node -- the node to add
+        """
+        value = self.field.compareValue(node)
+        key = hashableValue(value)
+        nodes = self.valueDict.get(key)
+        if nodes is None:
+            nodes = self.valueDict[key] = set()
+            self.origValueDict[key] = value
+            self.sortedKeys = None
+        nodes.add(node)
+        self.nodeValueDict[node] = key
+
+    def removeNode(self, node):
+        """Remove the given node from the index.
+
+        Arguments:
+            node -- the node to remove
+        """
+        key = self.nodeValueDict.pop(node)
+        nodes = self.valueDict[key]
+        nodes.discard(node)
+        if not nodes:
+            del self.valueDict[key]
+            del self.origValueDict[key]
+            self.sortedKeys = None
+
+    def matchingNodes(self, conditionLine):
+        """Return a set of nodes that match the given condition line.
+
+        Equality uses a direct lookup and ordering operators use a range of
+        the sorted values.  Other operators test each distinct value once.
+        Arguments:
+            conditionLine -- the ConditionLine object to match
+        """
+        oper = conditionLine.oper
+        value = hashableValue(self.field.
+                              adjustedCompareValue(conditionLine.value))
+        if oper == '==':
+            return set(self.valueDict.get(value, ()))
+        if oper in ('<', '<=', '>', '>='):
+            try:
+                if self.sortedKeys is None:
+                    self.sortedKeys = sorted(self.valueDict.keys())
+                keys = self.sortedKeys
+                if oper == '<':
+                    keys = keys[:bisect.bisect_left(keys, value)]
+                elif oper == '<=':
+                    keys = keys[:bisect.bisect_right(keys, value)]
+                elif oper == '>':
+                    keys = keys[bisect.bisect_right(keys, value):]
+                else:
+                    keys = keys[bisect.bisect_left(keys, value):]
+                nodes = set()
+                for key in keys:
+                    nodes.update(self.valueDict[key])
+                return nodes
+            except TypeError:    # values that can't be ordered
+                self.sortedKeys = None
+        test = conditionLine.valueTest(self.field)
+        nodes = set()
+        for key, keyNodes in self.valueDict.items():
+            if test(self.origValueDict[key]):
+                nodes.update(keyNodes)
+        return nodes
+
+
+####  Utility Functions  ####
+
+def nodeFingerprint(node):
+    """Return a value that changes with the node's format or data.
+
+    Arguments:
+        node -- the node to check
+    """
+    return hash((id(node.nodeFormat()), node.uniqueId,
+                 tuple(node.data.items())))
+
+
+def wordTrigrams(word):
+    """Return a set of the three character sequences in a padded word.
+
+    Arguments:
+        word -- the lowercase word to split
+    """
+    paddedWord = '  {0} '.format(word)
+    return {paddedWord[i:i + 3] for i in range(len(paddedWord) - 2)}
+
+
+def hashableValue(value):
+    """Return the value with lists converted to tuples for use as a key.
+
+    Arguments:
+        value -- the field compare value
+    """
+    if isinstance(value, list):
+        return tuple(value)
+    return value
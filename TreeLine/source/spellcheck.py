@@ -271,6 +271,7 @@ class SpellCheckOperation:
                      split('\n'))
         textLines[self.lineNum] = newTextLine
         self.currentNode.data[self.currentField] = '\n'.join(textLines)
+        self.currentNode.modelRef.nodeDataChanged(self.currentNode)
         self.controlRef.updateTreeNode(self.currentNode)
 
     def textLineGenerator(self, branches):
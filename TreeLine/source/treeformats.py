@@ -47,6 +47,8 @@ class TreeFormats(dict):
         # list of math eval levels, each is a dict by type name with lists of
         # equation fields
         self.mathLevelList = []
+        # tuples of math eval level and direction by (type name, field name)
+        self.mathLevelDict = {}
         # for saving all-type find/filter conditionals
         self.savedConditionText = {}
         self.configModified = False
@@ -119,6 +121,8 @@ class TreeFormats(dict):
         """Update refs used to cycle thru math field evaluations.
         """
         self.mathFieldRefDict = {}
+        self.mathLevelList = []
+        self.mathLevelDict = {}
         allRecursiveRefs = []
         recursiveRefDict = {}
         matheval.RecursiveEqnRef.recursiveRefDict = recursiveRefDict
@@ -154,6 +158,11 @@ class TreeFormats(dict):
                 self.mathLevelList.append({})
             self.mathLevelList[-1].setdefault(currRef.eqnTypeName,
                                               []).append(currRef)
+        for level, eqnRefDict in enumerate(self.mathLevelList):
+            for typeName, eqnRefs in eqnRefDict.items():
+                for eqnRef in eqnRefs:
+                    self.mathLevelDict[(typeName, eqnRef.eqnField.name)] = (
+                        level, eqnRef.evalDirection)
 
     def loadAttr(self, attrs):
         """Restore attributes from the stored file.
@@ -200,6 +209,15 @@ class TreeFormats(dict):
                 result[typeFormat.name] = numberingFields
         return result
 
+    def externalTitleTypes(self):
+        """Return a dict of title reference scopes for types using other data.
+
+        Keys are type names with titles that use other node data, values are
+        tuples of the highest ancestor level used and child data use.
+        """
+        return {typeFormat.name: typeFormat.titleRefScope() for typeFormat in
+                self.values() if typeFormat.hasExternalTitleRefs()}
+
     def commonFields(self, nodes):
         """Return a list of field names common to all given node formats.
 
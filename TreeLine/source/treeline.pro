@@ -23,6 +23,8 @@ SOURCES =      conditional.py \
                printdata.py \
                printdialogs.py \
                recentfiles.py \
+               searchhighlight.py \
+               searchindex.py \
                spellcheck.py \
                titlelistview.py \
                treeformats.py \
@@ -15,6 +15,9 @@
 import os.path
 import io
 import sys
+import bisect
+import time
+import contextlib
 import gzip
 import bz2 
 import zlib
@@ -32,8 +35,11 @@ import undo
 import p3
 import exports
 import spellcheck
+import searchhighlight
 import globalref
 
+_findBatchTime = 0.2   # max. seconds to search before returning to events
+
 
 class TreeLocalControl(QtCore.QObject):
     """Class to handle controls local to a model/view combination.
@@ -70,9 +76,7 @@ class TreeLocalControl(QtCore.QObject):
             self.model = opener.readFile(filePath)
             self.printData.restoreXmlAttrs(opener.rootAttr)
             self.spellCheckLang = opener.rootAttr.get('spellchk', '')
-            self.model.mathZeroBlanks = (opener.rootAttr.
-                                         get('zeroblanks', 'y').
-                                         startswith('y'))
+            self.model.restoreMathXmlAttrs(opener.rootAttr)
             if opener.duplicateIdList:
                 msg = _('Warning: duplicate Unique IDs found.\n')
                 if len(opener.duplicateIdList) > 10:
@@ -97,6 +101,13 @@ class TreeLocalControl(QtCore.QObject):
         self.windowList         = []
         self.activeWindow       = None
         self.findReplaceNodeRef = (None, 0)
+        self.findGen = None
+        self.findResultFunc = None
+        self.findStartTime = 0
+        self.findNodeCount = 0
+        self.findTimer = QtCore.QTimer(self)
+        self.findTimer.setSingleShot(True)
+        self.findTimer.timeout.connect(self.continueFind)
         QtGui.QApplication.clipboard().dataChanged.connect(self.
                                                            updatePasteAvail)
         self.updatePasteAvail()
@@ -113,22 +124,32 @@ class TreeLocalControl(QtCore.QObject):
     def updateTreeNode(self, node, setModified=True):
         """Update the given node in all tree views.
 
+        The data change must already be recorded with the model's
+        nodeDataChanged, as done by the node's data setting methods.
         Arguments:
             node -- the node to be updated
             setModified -- if True, set the modified flag for this file
         """
+        if self.model.batchEditLevel:
+            self.model.batchEditNodes.add(node)
+            self.model.batchSetModified |= setModified
+            return
         if node.setConditionalType():
             self.activeWindow.updateRightViews(outputOnly=True)
-        if node.updateNodeMathFields():
+        mathNodes = self.model.updateMathFields([node])
+        if mathNodes:
             self.activeWindow.updateRightViews(outputOnly=True)
             if globalref.genOptions.getValue('ShowMath'):
                 self.activeWindow.refreshDataEditViews()
+        # math updates may also change other nodes
+        changedNodes = [node] + [mathNode for mathNode in mathNodes if
+                                 mathNode is not node]
         for window in self.windowList:
             window.updateTreeNode(node)
             if window != self.activeWindow:
                 window.updateRightViews()
             if window.isFiltering():
-                window.treeFilterView.updateItem(node)
+                window.treeFilterView.updateNodes(changedNodes)
         pluginInterface = globalref.mainControl.pluginInterface
         if pluginInterface:
             pluginInterface.execCallback(pluginInterface.dataChangeCallbacks,
@@ -142,7 +163,13 @@ class TreeLocalControl(QtCore.QObject):
         Arguments:
             setModified -- if True, set the modified flag for this file
         """
+        if self.model.batchEditLevel:
+            self.model.batchFullUpdate = True
+            self.model.batchSetModified |= setModified
+            return
         QtGui.QApplication.setOverrideCursor(QtCore.Qt.WaitCursor)
+        self.cancelFind()
+        self.model.structureChanged()
         typeChanges = self.model.root.setDescendantConditionalTypes()
         self.updateAllMathFields()
         for window in self.windowList:
@@ -166,15 +193,28 @@ class TreeLocalControl(QtCore.QObject):
         if setModified:
             self.setModified()
 
-    def updateAll(self, setModified=True):
+    def updateAll(self, setModified=True, changedNodes=None,
+                  clearCaches=True):
         """Update the full tree, right-hand views and set the modified flag.
 
         Arguments:
             setModified -- if True, set the modified flag for this file
+            changedNodes -- if given, only data in these nodes was changed
+            clearCaches -- if False, all data changes were already recorded
+                           with the model's nodeDataChanged
         """
+        if self.model.batchEditLevel:
+            self.model.batchFullUpdate = True
+            self.model.batchClearCaches |= clearCaches
+            self.model.batchSetModified |= setModified
+            return
         QtGui.QApplication.setOverrideCursor(QtCore.Qt.WaitCursor)
+        self.cancelFind()
+        self.model.structureChanged()
+        if clearCaches:
+            self.model.clearNodeCaches()
         self.model.root.setDescendantConditionalTypes()
-        self.updateAllMathFields()
+        mathNodes = self.updateAllMathFields()
         if (globalref.mainControl.findConditionDialog and
             globalref.mainControl.findConditionDialog.isVisible()):
             globalref.mainControl.findConditionDialog.loadTypeNames()
@@ -184,16 +224,81 @@ class TreeLocalControl(QtCore.QObject):
         if (globalref.mainControl.filterConditionDialog and
             globalref.mainControl.filterConditionDialog.isVisible()):
             globalref.mainControl.filterConditionDialog.loadTypeNames()
+        if changedNodes is not None:
+            # math updates may also change other nodes
+            changedNodes = list(set(changedNodes) | mathNodes)
         for window in self.windowList:
             window.updateTree()
             if window.isFiltering():
-                window.treeFilterView.updateContents()
+                if changedNodes is not None:
+                    window.treeFilterView.updateNodes(changedNodes)
+                else:
+                    window.treeFilterView.updateContents()
             window.updateRightViews()
         self.updateCommandsAvail()
         if setModified:
             self.setModified()
         QtGui.QApplication.restoreOverrideCursor()
 
+    @contextlib.contextmanager
+    def batchEdit(self):
+        """Return a context that defers node and view updates until its end.
+
+        Node updates inside the context only refresh cached search data.
+        At the end, conditional types, math fields and views are updated
+        once for all of the updated nodes, or the full tree is updated if
+        that was requested inside the context.  Contexts may be nested.
+        If an exception leaves the outermost context, the deferred updates
+        are discarded.
+        """
+        self.model.batchEditLevel += 1
+        completed = False
+        try:
+            yield
+            completed = True
+        finally:
+            self.model.batchEditLevel -= 1
+            if not self.model.batchEditLevel:
+                if completed:
+                    self.finishBatchEdit()
+                else:
+                    self.model.batchEditNodes = set()
+                    self.model.batchFullUpdate = False
+                    self.model.batchClearCaches = False
+                    self.model.batchSetModified = False
+
+    def finishBatchEdit(self):
+        """Run the node and view updates deferred by a batch edit.
+        """
+        nodes = self.model.batchEditNodes
+        setModified = self.model.batchSetModified
+        self.model.batchEditNodes = set()
+        self.model.batchSetModified = False
+        if self.model.batchFullUpdate:
+            clearCaches = self.model.batchClearCaches
+            self.model.batchFullUpdate = False
+            self.model.batchClearCaches = False
+            self.updateAll(setModified, clearCaches=clearCaches)
+        elif nodes:
+            QtGui.QApplication.setOverrideCursor(QtCore.Qt.WaitCursor)
+            self.cancelFind()
+            for node in nodes:
+                node.setConditionalType()
+            changedNodes = list(nodes | self.model.updateMathFields(nodes))
+            for window in self.windowList:
+                window.updateTree()
+                window.updateRightViews()
+                if window.isFiltering():
+                    window.treeFilterView.updateNodes(changedNodes)
+            if setModified:
+                self.setModified()
+            QtGui.QApplication.restoreOverrideCursor()
+        pluginInterface = globalref.mainControl.pluginInterface
+        if pluginInterface:
+            for node in nodes:
+                pluginInterface.execCallback(pluginInterface.
+                                             dataChangeCallbacks, node)
+
     def updateCommandsAvail(self):
         """Set commands available based on node selections.
         """
@@ -264,21 +369,56 @@ class TreeLocalControl(QtCore.QObject):
 
     def updateAllMathFields(self):
         """Recalculate all math fields in the entire tree.
+
+        Each level is evaluated in batches of nodes with the same type and
+        depth.  Nodes at one depth don't reference each other, so the batches
+        are run deepest first for upward levels and top first otherwise.
+        Only changed results are stored.
+        Return a set of nodes with changed data.
         """
+        changedNodes = set()
+        if not self.model.formats.mathLevelList:
+            return changedNodes
+        self.model.aggregateStamp += 1
+        depthList = []
+        nodes = [self.model.root]
+        while nodes:
+            formatNodeDict = {}
+            for node in nodes:
+                formatNodeDict.setdefault(node.formatName, []).append(node)
+            depthList.append(formatNodeDict)
+            nodes = [child for node in nodes for child in node.childList]
         for eqnRefDict in self.model.formats.mathLevelList:
             if list(eqnRefDict.values())[0][0].evalDirection != (matheval.
                                                                  upward):
-                for node in self.model.root.descendantGen():
-                    for eqnRef in eqnRefDict.get(node.formatName, []):
-                        node.data[eqnRef.eqnField.name] = (eqnRef.eqnField.
-                                                           equationValue(node))
+                depthOrder = depthList
             else:
-                node = self.model.root.lastDescendant()
-                while node:
-                    for eqnRef in eqnRefDict.get(node.formatName, []):
-                        node.data[eqnRef.eqnField.name] = (eqnRef.eqnField.
-                                                           equationValue(node))
-                    node = node.prevTreeNode()
+                depthOrder = reversed(depthList)
+            for formatNodeDict in depthOrder:
+                for typeName, eqnRefs in eqnRefDict.items():
+                    nodes = formatNodeDict.get(typeName)
+                    if nodes:
+                        # reference values read once for the type's fields
+                        refValueCache = {}
+                        for eqnRef in eqnRefs:
+                            field = eqnRef.eqnField
+                            batchChanged = False
+                            for node, text in zip(nodes,
+                                                  field.equationValues(nodes,
+                                                               refValueCache)):
+                                if node.data.get(field.name, '') != text:
+                                    node.data[field.name] = text
+                                    changedNodes.add(node)
+                                    batchChanged = True
+                            if batchChanged:
+                                # child aggregates don't track these changes
+                                self.model.aggregateStamp += 1
+                                refValueCache = {key: value for key, value in
+                                                 refValueCache.items() if
+                                                 key[1] != field.name}
+        for node in changedNodes:
+            self.model.nodeDataChanged(node)
+        return changedNodes
 
     def currentSelectionModel(self):
         """Return the current tree's selection model.
@@ -663,6 +803,11 @@ class TreeLocalControl(QtCore.QObject):
         toolsSpellCheckAct.triggered.connect(self.toolsSpellCheck)
         localActions['ToolsSpellCheck'] = toolsSpellCheckAct
 
+        toolsMathProfileAct = QtGui.QAction(_('&Math Profile...'), self,
+                   statusTip=_('Record and show math field evaluation costs'))
+        toolsMathProfileAct.triggered.connect(self.toolsMathProfile)
+        localActions['ToolsMathProfile'] = toolsMathProfileAct
+
         winNewAct = QtGui.QAction(_('&New Window'), self,
                             statusTip=_('Open a new window for the same file'))
         winNewAct.triggered.connect(self.windowNew)
@@ -695,8 +840,7 @@ class TreeLocalControl(QtCore.QObject):
         rootElement.attrib.update(self.printData.xmlAttr())
         if self.spellCheckLang:
             rootElement.set('spellchk', self.spellCheckLang)
-        if not self.model.mathZeroBlanks:
-            rootElement.set('zeroblanks', 'n')
+        rootElement.attrib.update(self.model.mathXmlAttr())
         elementTree = ElementTree.ElementTree(rootElement)
         try:
             # use binary for regular files to avoid newline translation
@@ -816,23 +960,25 @@ class TreeLocalControl(QtCore.QObject):
         """Show dialog to set file parameters like compression and encryption.
         """
         origZeroBlanks = self.model.mathZeroBlanks
+        origDecimalDigits = self.model.mathDecimalDigits
         dialog = miscdialogs.FilePropertiesDialog(self, self.activeWindow)
         if dialog.exec_() == QtGui.QDialog.Accepted:
             self.setModified()
-            if self.model.mathZeroBlanks != origZeroBlanks:
+            if (self.model.mathZeroBlanks != origZeroBlanks or
+                self.model.mathDecimalDigits != origDecimalDigits):
                 self.updateAll(False)
 
     def editUndo(self):
         """Undo the previous action and update the views.
         """
-        self.model.undoList.undo()
-        self.updateAll(False)
+        undoItem = self.model.undoList.undo()
+        self.updateAll(False, undoItem.changedDataNodes(), False)
 
     def editRedo(self):
         """Redo the previous undo and update the views.
         """
-        self.model.redoList.undo()
-        self.updateAll(False)
+        redoItem = self.model.redoList.undo()
+        self.updateAll(False, redoItem.changedDataNodes(), False)
 
     def editCut(self):
         """Cut the branch or text to the clipboard.
@@ -879,7 +1025,7 @@ class TreeLocalControl(QtCore.QObject):
                 pasteMimeData(QtGui.QApplication.clipboard().mimeData())):
                 for node in self.currentSelectionModel().selectedNodes():
                     node.expandInView()
-                self.updateAll()
+                self.updateAll(clearCaches=False)
         else:
             widget = QtGui.QApplication.focusWidget()
             try:
@@ -912,10 +1058,10 @@ class TreeLocalControl(QtCore.QObject):
         if globalref.genOptions.getValue('RenameNewNodes'):
             self.currentSelectionModel().selectNodes(newNodes, False)
             if len(newNodes) == 1:
-                self.updateAll()
+                self.updateAll(clearCaches=False)
                 self.activeWindow.treeView.edit(newNodes[0].index())
                 return
-        self.updateAll()
+        self.updateAll(clearCaches=False)
 
     def nodeInAfter(self):
         """Insert new sibling after selection.
@@ -930,10 +1076,10 @@ class TreeLocalControl(QtCore.QObject):
         if globalref.genOptions.getValue('RenameNewNodes'):
             self.currentSelectionModel().selectNodes(newNodes, False)
             if len(newNodes) == 1:
-                self.updateAll()
+                self.updateAll(clearCaches=False)
                 self.activeWindow.treeView.edit(newNodes[0].index())
                 return
-        self.updateAll()
+        self.updateAll(clearCaches=False)
 
     def nodeAddChild(self):
         """Add new child to selected parent.
@@ -948,10 +1094,10 @@ class TreeLocalControl(QtCore.QObject):
         if globalref.genOptions.getValue('RenameNewNodes'):
             self.currentSelectionModel().selectNodes(newNodes, False)
             if len(newNodes) == 1:
-                self.updateAll()
+                self.updateAll(clearCaches=False)
                 self.activeWindow.treeView.edit(newNodes[0].index())
                 return
-        self.updateAll()
+        self.updateAll(clearCaches=False)
 
     def nodeDelete(self):
         """Delete the selected nodes.
@@ -969,7 +1115,7 @@ class TreeLocalControl(QtCore.QObject):
         for node in selNodes:
             node.delete()
         self.currentSelectionModel().selectNode(nextSel[-1], False)
-        self.updateAll()
+        self.updateAll(clearCaches=False)
 
     def nodeIndent(self):
         """Indent the selected nodes.
@@ -983,7 +1129,7 @@ class TreeLocalControl(QtCore.QObject):
             node.indent()
             node.parent.expandInView()
         self.currentSelectionModel().selectNodes(selNodes, False)
-        self.updateAll()
+        self.updateAll(clearCaches=False)
 
     def nodeUnindent(self):
         """Unindent the selected nodes.
@@ -996,7 +1142,7 @@ class TreeLocalControl(QtCore.QObject):
         for node in reversed(selNodes):
             node.unindent()
         self.currentSelectionModel().selectNodes(selNodes, False)
-        self.updateAll()
+        self.updateAll(clearCaches=False)
 
     def nodeMoveUp(self):
         """Move the selected nodes upward in the sibling list.
@@ -1006,11 +1152,12 @@ class TreeLocalControl(QtCore.QObject):
         undo.ChildListUndo(self.model.undoList,
                            [node.parent for node in selNodes])
         for node in selNodes:
-            pos = node.parent.childList.index(node)
+            pos = node.row()
             del node.parent.childList[pos]
             node.parent.childList.insert(pos - 1, node)
+        self.model.structureChanged()
         self.currentSelectionModel().selectNodes(selNodes, False)
-        self.updateAll()
+        self.updateAll(clearCaches=False)
 
     def nodeMoveDown(self):
         """Move the selected nodes downward in the sibling list.
@@ -1020,11 +1167,12 @@ class TreeLocalControl(QtCore.QObject):
         undo.ChildListUndo(self.model.undoList,
                            [node.parent for node in selNodes])
         for node in reversed(selNodes):
-            pos = node.parent.childList.index(node)
+            pos = node.row()
             del node.parent.childList[pos]
             node.parent.childList.insert(pos + 1, node)
+        self.model.structureChanged()
         self.currentSelectionModel().selectNodes(selNodes, False)
-        self.updateAll()
+        self.updateAll(clearCaches=False)
 
     def nodeMoveFirst(self):
         """Move the selected nodes to be the first children.
@@ -1036,8 +1184,9 @@ class TreeLocalControl(QtCore.QObject):
         for node in reversed(selNodes):
             node.parent.childList.remove(node)
             node.parent.childList.insert(0, node)
+        self.model.structureChanged()
         self.currentSelectionModel().selectNodes(selNodes, False)
-        self.updateAll()
+        self.updateAll(clearCaches=False)
 
     def nodeMoveLast(self):
         """Move the selected nodes to be the last children.
@@ -1049,8 +1198,9 @@ class TreeLocalControl(QtCore.QObject):
         for node in selNodes:
             node.parent.childList.remove(node)
             node.parent.childList.append(node)
+        self.model.structureChanged()
         self.currentSelectionModel().selectNodes(selNodes, False)
-        self.updateAll()
+        self.updateAll(clearCaches=False)
 
     def dataSetType(self, action):
         """Change the type of selected nodes based on a menu selection.
@@ -1061,12 +1211,13 @@ class TreeLocalControl(QtCore.QObject):
         newType = action.toolTip()   # gives menu name without the accelerator
         nodes = [node for node in self.currentSelectionModel().selectedNodes()
                  if node.formatName != newType]
-        if nodes:
-            undo.TypeUndo(self.model.undoList, nodes)
-            for node in nodes:
-                node.changeDataType(newType)
-                self.updateTreeNode(node)
-        self.updateAll()
+        with self.batchEdit():
+            if nodes:
+                undo.TypeUndo(self.model.undoList, nodes)
+                for node in nodes:
+                    node.changeDataType(newType)
+                    self.updateTreeNode(node)
+            self.updateAll(clearCaches=False)
 
     def loadTypeSubMenu(self):
         """Update type select submenu with type names and check marks.
@@ -1244,20 +1395,36 @@ class TreeLocalControl(QtCore.QObject):
         self.updateAll()
         QtGui.QApplication.restoreOverrideCursor()
 
-    def findNodesByWords(self, wordList, titlesOnly=False, forward=True):
-        """Search for and select nodes that match the word list criteria.
+    def searchOrderGen(self, forward=True, filterOrder=False,
+                       candidates=None):
+        """Return a generator of nodes to search after the current node.
 
-        Called from the text find dialog.
-        Returns True if found, otherwise False.
+        Wraps around the ends and stops before returning to the current node.
         Arguments:
-            wordList -- a list of words or phrases to find
-            titleOnly -- search only in the title text if True
             forward -- next if True, previous if False
+            filterOrder -- step through the filter view list if filtering
+            candidates -- if not None, only return these nodes in tree order
         """
         currentNode = self.currentSelectionModel().currentNode()
+        filtering = filterOrder and self.activeWindow.isFiltering()
+        if candidates is not None and not filtering:
+            nodes = sorted(candidates, key=self.model.treePosition)
+            positions = [self.model.treePosition(node) for node in nodes]
+            currentPos = self.model.treePosition(currentNode)
+            if forward:
+                splitPos = bisect.bisect_right(positions, currentPos)
+                nodes = nodes[splitPos:] + nodes[:splitPos]
+            else:
+                splitPos = bisect.bisect_left(positions, currentPos)
+                nodes = nodes[splitPos:] + nodes[:splitPos]
+                nodes.reverse()
+            for node in nodes:
+                if node is not currentNode:
+                    yield node
+            return
         node = currentNode
         while True:
-            if self.activeWindow.isFiltering():
+            if filtering:
                 node = self.activeWindow.treeFilterView.nextPrevNode(node,
                                                                      forward)
             else:
@@ -1266,46 +1433,202 @@ class TreeLocalControl(QtCore.QObject):
                 else:
                     node = node.prevTreeNode(True)
             if node is currentNode:
-                return False
-            if node.wordSearch(wordList, titlesOnly):
-                self.currentSelectionModel().selectNode(node, True, True)
-                rightView = self.activeWindow.rightParentView()
-                if rightView:
-                    rightView.highlightSearch(wordList=wordList)
+                return
+            yield node
+
+    def runFind(self, findGen, resultFunc=None):
+        """Start a find operation that checks nodes in time slices.
+
+        Continues from a timer if no match is found in the first slice, so
+        the GUI stays responsive and the find can be cancelled.
+        Returns True if found, False if not found or None if the find is
+        continuing.
+        Arguments:
+            findGen -- a generator yielding True after selecting a match and
+                       False for each non-matching node
+            resultFunc -- called with True or False when a continued find ends
+        """
+        self.cancelFind()
+        self.findGen = findGen
+        self.findResultFunc = resultFunc
+        self.findStartTime = time.perf_counter()
+        self.findNodeCount = 0
+        return self.findNextBatch()
+
+    def findNextBatch(self):
+        """Check nodes for the current find operation for one time slice.
+
+        Returns True if found, False if not found or None if the find is
+        continuing.
+        """
+        if not self.findGen:
+            return False
+        endTime = time.perf_counter() + _findBatchTime
+        for found in self.findGen:
+            if found:
+                self.endFind()
                 return True
+            self.findNodeCount += 1
+            if time.perf_counter() > endTime:
+                timeout = globalref.genOptions.getValue('FindTimeout')
+                if timeout and endTime - self.findStartTime > timeout:
+                    self.endFind(_('Find stopped after {0} seconds').
+                                 format(timeout))
+                    return False
+                percent = (100 * self.findNodeCount //
+                           max(len(self.model.nodeIdDict), 1))
+                message = (_('Searching, checked {0}% of nodes '
+                             '(press Esc to cancel)').format(min(percent, 99)))
+                globalref.mainControl.currentStatusBar().showMessage(message)
+                self.findTimer.start(0)
+                return None
+        self.endFind()
+        return False
+
+    def continueFind(self):
+        """Continue the current find operation from the timer.
 
-    def findNodesByRegExp(self, regExpList, titlesOnly=False, forward=True):
+        Passes the result to the result function when the find ends.
+        """
+        resultFunc = self.findResultFunc
+        result = self.findNextBatch()
+        if result is not None and resultFunc:
+            resultFunc(result)
+
+    def endFind(self, message=''):
+        """Clear the current find operation and the status message.
+
+        Arguments:
+            message -- an optional status message to show
+        """
+        self.findTimer.stop()
+        self.findGen = None
+        self.findResultFunc = None
+        if message:
+            globalref.mainControl.currentStatusBar().showMessage(message)
+        else:
+            globalref.mainControl.currentStatusBar().clearMessage()
+
+    def cancelFind(self):
+        """Stop a continuing find operation.
+
+        The result function is not called.
+        Returns True if a find was cancelled.
+        """
+        if self.findGen:
+            self.endFind(_('Find cancelled'))
+            return True
+        return False
+
+    def findNodesByWords(self, wordList, titlesOnly=False, forward=True,
+                         resultFunc=None):
+        """Search for and select nodes that match the word list criteria.
+
+        Called from the text find dialog.
+        Returns True if found, False if not found or None if the search is
+        continuing in the background.
+        Arguments:
+            wordList -- a list of words or phrases to find
+            titleOnly -- search only in the title text if True
+            forward -- next if True, previous if False
+            resultFunc -- called with the result of a continued search
+        """
+        candidates = self.model.searchIndex.wordCandidates(wordList,
+                                                           titlesOnly)
+        highlightSpec = searchhighlight.HighlightSpec(wordList=wordList)
+        def findGen():
+            for node in self.searchOrderGen(forward, True, candidates):
+                if node.wordSearch(wordList, titlesOnly):
+                    self.currentSelectionModel().selectNode(node, True, True)
+                    rightView = self.activeWindow.rightParentView()
+                    if rightView:
+                        rightView.highlightSearch(highlightSpec)
+                    yield True
+                    return
+                yield False
+        return self.runFind(findGen(), resultFunc)
+
+    def findNodesByRegExp(self, regExpList, titlesOnly=False, forward=True,
+                          fullWordList=None, resultFunc=None):
         """Search for and select nodes that match the regular exp criteria.
 
         Called from the text find dialog.
-        Returns True if found, otherwise False.
+        Returns True if found, False if not found or None if the search is
+        continuing in the background.
         Arguments:
             regExpList -- a list of regular expression objects
             titleOnly -- search only in the title text if True
             forward -- next if True, previous if False
+            fullWordList -- full words matched by the regExpList, if known
+            resultFunc -- called with the result of a continued search
         """
+        candidates = None
+        if fullWordList:
+            candidates = self.model.searchIndex.wordCandidates(fullWordList,
+                                                               titlesOnly,
+                                                               True)
+        highlightSpec = searchhighlight.HighlightSpec(regExpList=regExpList)
+        def findGen():
+            for node in self.searchOrderGen(forward, False, candidates):
+                if node.regExpSearch(regExpList, titlesOnly):
+                    self.currentSelectionModel().selectNode(node, True, True)
+                    rightView = self.activeWindow.rightParentView()
+                    if rightView:
+                        rightView.highlightSearch(highlightSpec)
+                    yield True
+                    return
+                yield False
+        return self.runFind(findGen(), resultFunc)
+
+    def findNodesByApproximate(self, text, titlesOnly=False, forward=True):
+        """Select the next or previous of the closest approximate matches.
+
+        Steps through the matches ranked from best to worst, starting over
+        from the best if the current node is not a match.
+        Called from the find dialog.
+        Returns a tuple of the match rank and the match count if found,
+        otherwise None.
+        Arguments:
+            text -- the search text, may be misspelled
+            titlesOnly -- search only in the title words if True
+            forward -- next if True, previous if False
+        """
+        nodes = self.model.searchIndex.approximateMatches(text, titlesOnly)
+        if not nodes:
+            return None
         currentNode = self.currentSelectionModel().currentNode()
-        node = currentNode
-        while True:
-            if forward:
-                node = node.nextTreeNode(True)
-            else:
-                node = node.prevTreeNode(True)
-            if node is currentNode:
-                return False
-            if node.regExpSearch(regExpList, titlesOnly):
-                self.currentSelectionModel().selectNode(node, True, True)
-                rightView = self.activeWindow.rightParentView()
-                if rightView:
-                    rightView.highlightSearch(regExpList=regExpList)
-                return True
+        try:
+            pos = nodes.index(currentNode) + (1 if forward else -1)
+        except ValueError:
+            pos = 0
+        pos %= len(nodes)
+        self.currentSelectionModel().selectNode(nodes[pos], True, True)
+        return (pos + 1, len(nodes))
 
     def findNodesForReplace(self, searchText='', regExpObj=None, typeName='',
-                            fieldName='', forward=True):
+                            fieldName='', forward=True, resultFunc=None):
         """Search for & select nodes that match the criteria prior to replace.
 
         Called from the find replace dialog.
-        Returns True if found, otherwise False.
+        Returns True if found, False if not found or None if the search is
+        continuing in the background.
+        Arguments:
+            searchText -- the text to find in a non-regexp search
+            regExpObj -- the regular expression to find if searchText is blank
+            typeName -- if given, verify that this node matches this type
+            fieldName -- if given, only find matches under this type name
+            forward -- next if True, previous if False
+            resultFunc -- called with the result of a continued search
+        """
+        return self.runFind(self.replaceFindGen(searchText, regExpObj,
+                                                typeName, fieldName, forward),
+                            resultFunc)
+
+    def replaceFindGen(self, searchText, regExpObj, typeName, fieldName,
+                       forward):
+        """Return a find generator that selects the next match for replace.
+
+        Yields True after selecting a match and False for each other node.
         Arguments:
             searchText -- the text to find in a non-regexp search
             regExpObj -- the regular expression to find if searchText is blank
@@ -1342,7 +1665,9 @@ class TreeLocalControl(QtCore.QObject):
                     dataView.highlightMatch(searchText, regExpObj, fieldNum,
                                             fieldPos - 1)
                 self.findReplaceNodeRef = (node, numMatches)
-                return True
+                yield True
+                return
+            yield False
             if self.activeWindow.isFiltering():
                 node = self.activeWindow.treeFilterView.nextPrevNode(node,
                                                                      forward)
@@ -1353,7 +1678,7 @@ class TreeLocalControl(QtCore.QObject):
                     node = node.prevTreeNode(True)
             if node is currentNode and currentNumMatches == 0:
                 self.findReplaceNodeRef = (None, 0)
-                return False
+                return
             numMatches = 0 if forward else -1
 
     def replaceInCurrentNode(self, searchText='', regExpObj=None, typeName='',
@@ -1405,18 +1730,25 @@ class TreeLocalControl(QtCore.QObject):
             replaceText -- if not None, replace a match with this string
         """
         QtGui.QApplication.setOverrideCursor(QtCore.Qt.WaitCursor)
-        dataUndo = undo.BranchUndo(self.model.undoList, self.model.root)
         totalMatches = 0
+        changes = []
         for node in self.model.root.descendantGen():
-            field, matchQty, num = node.searchReplace(searchText, regExpObj,
-                                                      0, typeName, fieldName,
-                                                      replaceText, True)
-            totalMatches += matchQty
+            matchQty, fieldTexts = node.replacedFieldTexts(searchText,
+                                                           regExpObj,
+                                                           typeName,
+                                                           fieldName,
+                                                           replaceText)
+            if matchQty:
+                totalMatches += matchQty
+                changes.append((node, fieldTexts))
         self.findReplaceNodeRef = (None, 0)
         if totalMatches > 0:
-            self.updateAll(True)
-        else:
-            self.model.undoList.removeLastUndo(dataUndo)
+            undo.DataUndo(self.model.undoList,
+                          [node for node, fieldTexts in changes])
+            with self.batchEdit():
+                for node, fieldTexts in changes:
+                    node.setDataTexts(fieldTexts)
+                    self.updateTreeNode(node)
         QtGui.QApplication.restoreOverrideCursor()
         return totalMatches
 
@@ -1429,18 +1761,12 @@ class TreeLocalControl(QtCore.QObject):
             conditional -- the Conditional object to be evaluated
             forward -- next if True, previous if False
         """
-        currentNode = self.currentSelectionModel().currentNode()
-        node = currentNode
-        while True:
-            if forward:
-                node = node.nextTreeNode(True)
-            else:
-                node = node.prevTreeNode(True)
-            if node is currentNode:
-                return False
+        candidates = conditional.candidateNodes(self.model)
+        for node in self.searchOrderGen(forward, candidates=candidates):
             if conditional.evaluate(node):
                 self.currentSelectionModel().selectNode(node, True, True)
                 return True
+        return False
 
     def toolsSpellCheck(self):
         """Spell check the tree text data.
@@ -1451,6 +1777,12 @@ class TreeLocalControl(QtCore.QObject):
             return
         spellCheckOp.spellCheck()
 
+    def toolsMathProfile(self):
+        """Show the dialog to record and report math field evaluation costs.
+        """
+        dialog = miscdialogs.MathProfileDialog(self.model, self.activeWindow)
+        dialog.exec_()
+
     def windowNew(self):
         """Open a new window for this file.
         """
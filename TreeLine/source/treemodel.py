@@ -14,6 +14,7 @@
 
 import copy
 import io
+import operator
 from xml.etree import ElementTree
 from PyQt4 import QtCore, QtGui
 import treeformats
@@ -22,9 +23,12 @@ import treenode
 import treeopener
 import undo
 import linkref
+import searchindex
+import matheval
 import globalref
 
 defaultRootName = _('Main')
+_minIndexedNodes = 100   # min. list size to build the position index for
 
 
 class TreeModel(QtCore.QAbstractItemModel):
@@ -49,8 +53,33 @@ class TreeModel(QtCore.QAbstractItemModel):
         self.undoList = None
         self.redoList = None
         self.nodeIdDict = {}
+        self.treePosDict = None
+        # incremented to invalidate all cached node titles and search text
+        self.cacheStamp = 0
+        # title reference scopes by type name, stored for the formats ref
+        self.titleRefDict = {}
+        self.titleRefFormats = None
+        # incremented to rebuild all stored math child aggregates
+        self.aggregateStamp = 0
+        # math child aggregates by parent node, then by field ref key,
+        # stored here since few nodes have equations with child references
+        self.childAggregates = {}
         self.linkRefCollect = linkref.LinkRefCollection()
+        self.searchIndex = searchindex.SearchIndex(self)
+        self.fieldIndex = searchindex.FieldIndex(self)
         self.mathZeroBlanks = True
+        # significant digits for decimal math, zero for float math
+        self.mathDecimalDigits = 0
+        # number of math fields recalculated for the last node edit
+        self.mathRecalcCount = 0
+        # set to a matheval.MathProfiler to record math evaluation costs
+        self.mathProfiler = None
+        # node updates deferred by a batch edit in the local control
+        self.batchEditLevel = 0
+        self.batchEditNodes = set()
+        self.batchFullUpdate = False
+        self.batchClearCaches = False
+        self.batchSetModified = False
         if newFile:
             self.formats = treeformats.TreeFormats(True)
             self.root = treenode.TreeNode(None, treeformats.defaultTypeName,
@@ -161,14 +190,8 @@ class TreeModel(QtCore.QAbstractItemModel):
             indexList -- a list of node indexes to convert
         """
         allNodes = [index.internalPointer() for index in indexList]
-        nodes = []
         # accept only nodes on top of unique branches
-        for node in allNodes:
-            parent = node.parent
-            while parent and parent not in allNodes:
-                parent = parent.parent
-            if not parent:
-                nodes.append(node)
+        nodes = self.uniqueBranches(allNodes)
         TreeModel.storedDragNodes = nodes
         TreeModel.storedDragModel = self
         dummyFormat = None
@@ -250,6 +273,7 @@ class TreeModel(QtCore.QAbstractItemModel):
             newNodes = [newModel.root]
         for format in newModel.formats.values():
             self.formats.addTypeIfMissing(format)
+        self.titleRefFormats = None   # added types may use title refs
         for node in newNodes:
             if position >= 0:
                 parent.childList.insert(position, node)
@@ -260,9 +284,194 @@ class TreeModel(QtCore.QAbstractItemModel):
             for child in node.descendantGen():
                 child.modelRef = self
                 child.setUniqueId(True)
+        self.structureChanged()
         self.formats.removeDummyRootType()
         return True
 
+    def structureChanged(self):
+        """Clear the stored tree position index after a structure change.
+
+        The index is rebuilt as required by the next position query.
+        Stored math child aggregates are also rebuilt when next used, as are
+        cached titles that use parent or child data.
+        """
+        self.treePosDict = None
+        self.aggregateStamp += 1
+        self.childAggregates = {}
+        if self.externalTitleTypes():
+            self.cacheStamp += 1
+            self.searchIndex.markAllChanged()
+
+    def updateTreePositions(self):
+        """Rebuild the tree position index.
+
+        Stores tuples of each node's tree order position number and the
+        position of the last node in its branch, so all descendants of a
+        node have position numbers within that interval.
+        """
+        nodes = list(self.root.descendantGen())
+        posDict = {node: pos for pos, node in enumerate(nodes)}
+        lastPosList = list(range(len(nodes)))
+        for pos in range(len(nodes) - 1, -1, -1):
+            childList = nodes[pos].childList
+            if childList:
+                lastPosList[pos] = lastPosList[posDict[childList[-1]]]
+        self.treePosDict = {node: (pos, lastPosList[pos]) for pos, node in
+                            enumerate(nodes)}
+
+    def treeRange(self, node):
+        """Return a tuple of the first and last tree positions of a branch.
+
+        The index is rebuilt if structureChanged() was called since the last
+        query.  Node methods that add, remove or move nodes call it.
+        Raises KeyError if the node is not in the tree.
+        Arguments:
+            node -- the top node of the branch
+        """
+        if self.treePosDict is None:
+            self.updateTreePositions()
+        return self.treePosDict[node]
+
+    def treePosition(self, node):
+        """Return the tree order position number of the given node.
+
+        Comparing these numbers gives the relative tree position of nodes.
+        Raises KeyError if the node is not in the tree.
+        Arguments:
+            node -- the node to find
+        """
+        return self.treeRange(node)[0]
+
+    def sortedNodes(self, nodes):
+        """Return a list of the given nodes sorted in tree order.
+
+        Small lists are sorted by their row paths if the tree position index
+        needs to be rebuilt.
+        Arguments:
+            nodes -- the nodes to sort
+        """
+        if self.treePosDict is None and len(nodes) < _minIndexedNodes:
+            return sorted(nodes, key=operator.methodcaller('treePosSortKey'))
+        return sorted(nodes, key=self.treePosition)
+
+    def uniqueBranches(self, nodes):
+        """Return a list of the given nodes that are not under other nodes.
+
+        Eliminates nodes that are descendants of other nodes in the list,
+        keeping the original order.  Uses the tree position index for larger
+        lists, and for nodes that are no longer in the tree, checks their
+        ancestors instead.
+        Arguments:
+            nodes -- the list of nodes to filter
+        """
+        if self.treePosDict is None and len(nodes) < _minIndexedNodes:
+            nodeSet = set(nodes)
+            return [node for node in nodes if not hasAncestorIn(node,
+                                                                nodeSet)]
+        if self.treePosDict is None:
+            self.updateTreePositions()
+        treePosDict = self.treePosDict
+        rangeDict = {node: treePosDict[node] for node in set(nodes) if
+                     node in treePosDict}
+        topPositions = set()
+        branchEnd = -1
+        for firstPos, lastPos in sorted(rangeDict.values()):
+            if firstPos > branchEnd:
+                topPositions.add(firstPos)
+                branchEnd = lastPos
+        nodeSet = set(nodes)
+        return [node for node in nodes if
+                (rangeDict[node][0] in topPositions if node in rangeDict else
+                 not hasAncestorIn(node, nodeSet))]
+
+    def nodeDataChanged(self, node):
+        """Update cached title, search and math info after a data change.
+
+        Cached titles of related nodes that use this node's data are cleared.
+        Arguments:
+            node -- the changed node
+        """
+        node.titleCache = None
+        node.searchTextCache = None
+        aggregates = self.childAggregates.get(node.parent)
+        if aggregates:
+            for aggregate in aggregates.values():
+                aggregate.updateChild(node)
+        titleRefDict = self.externalTitleTypes()
+        if titleRefDict:
+            if node is self.fileInfoNode:
+                # file info fields can be used by titles of any node
+                self.cacheStamp += 1
+                self.searchIndex.markAllChanged()
+            for refNode in titleRefNodes(node, titleRefDict):
+                refNode.titleCache = None
+                refNode.searchTextCache = None
+                self.searchIndex.updateNode(refNode)
+        self.searchIndex.updateNode(node)
+        self.fieldIndex.updateNode(node)
+
+    def externalTitleTypes(self):
+        """Return a dict of title reference scopes for types using other data.
+
+        The dict is only recalculated after a format change.
+        """
+        if self.formats is not self.titleRefFormats:
+            self.titleRefDict = self.formats.externalTitleTypes()
+            self.titleRefFormats = self.formats
+        return self.titleRefDict
+
+    def updateMathFields(self, nodes):
+        """Recalculate math fields that depend on any of the given nodes.
+
+        Each dependent field is recalculated once, in evaluation order.
+        Stores the number of recalculated fields.
+        Return a set of nodes with changed data.
+        Arguments:
+            nodes -- the nodes with changed data
+        """
+        recalcQueue = matheval.RecalcQueue(self.formats, self.mathProfiler)
+        for node in nodes:
+            for field in node.nodeFormat().fields():
+                recalcQueue.addDependents(node, field.name)
+        changedNodes = recalcQueue.recalculate()
+        self.mathRecalcCount = recalcQueue.recalcCount
+        return changedNodes
+
+    def mathXmlAttr(self):
+        """Return a dictionary of non-default math settings for storage.
+        """
+        attrs = {}
+        if not self.mathZeroBlanks:
+            attrs['zeroblanks'] = 'n'
+        if self.mathDecimalDigits:
+            attrs['mathdigits'] = repr(self.mathDecimalDigits)
+        return attrs
+
+    def restoreMathXmlAttrs(self, attrs):
+        """Restore saved math settings from a dictionary.
+
+        Invalid digit settings use float math.
+        Arguments:
+            attrs -- a dictionary of stored non-default settings
+        """
+        self.mathZeroBlanks = attrs.get('zeroblanks', 'y').startswith('y')
+        try:
+            self.mathDecimalDigits = max(int(attrs.get('mathdigits', '0')), 0)
+        except ValueError:
+            self.mathDecimalDigits = 0
+
+    def clearNodeCaches(self):
+        """Invalidate cached titles and search info for all nodes.
+
+        Called after format changes or changes to many nodes.
+        """
+        self.cacheStamp += 1
+        self.aggregateStamp += 1
+        self.childAggregates = {}
+        self.titleRefFormats = None
+        self.searchIndex.markAllChanged()
+        self.fieldIndex.markAllChanged()
+
     def getConfigDialogFormats(self, forceReset=False):
         """Return duplicate formats for use in the config dialog.
 
@@ -284,6 +493,7 @@ class TreeModel(QtCore.QAbstractItemModel):
                             self.configDialogFormats)
         self.formats = self.configDialogFormats
         self.getConfigDialogFormats(True)
+        self.clearNodeCaches()
         if self.formats.typeRenameDict or self.formats.fieldRenameDict:
             for node in self.root.descendantGen():
                 node.formatName = (self.formats.typeRenameDict.
@@ -309,3 +519,47 @@ class TreeModel(QtCore.QAbstractItemModel):
                     node.data.pop(fieldName, None)
             self.formats.emptiedMathDict = {}
         self.allModified.emit()
+
+
+####  Utility Functions  ####
+
+def hasAncestorIn(node, nodeSet):
+    """Return True if any ancestor of the node is in the given set.
+
+    Arguments:
+        node -- the node to check
+        nodeSet -- a set of possible ancestor nodes
+    """
+    parent = node.parent
+    while parent:
+        if parent in nodeSet:
+            return True
+        parent = parent.parent
+    return False
+
+
+def titleRefNodes(node, titleRefDict):
+    """Return a list of related nodes with titles that can use node's data.
+
+    Includes the parent if its title uses child data and descendants with
+    titles that use ancestor data from the node's level.
+    Arguments:
+        node -- the node with changed data
+        titleRefDict -- title reference scopes by type name
+    """
+    refNodes = []
+    parent = node.parent
+    if parent and titleRefDict.get(parent.formatName, (0, False))[1]:
+        refNodes.append(parent)
+    maxLevel = max(scope[0] for scope in titleRefDict.values())
+    level = 1
+    children = node.childList
+    while children and level <= maxLevel:
+        for child in children:
+            scope = titleRefDict.get(child.formatName)
+            if scope and scope[0] >= level:
+                refNodes.append(child)
+        children = [grandchild for child in children for grandchild in
+                    child.childList]
+        level += 1
+    return refNodes
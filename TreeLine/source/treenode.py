@@ -36,7 +36,6 @@ _replaceBackrefRe = (re.compile(r'\\(\d+)'), re.compile(r'\\g<(\d+)>'))
 _htmlLinkRe = re.compile(r'<a .*?href="(.+?)".*?>')
 _imgLinkRe = re.compile(r'<img .*?src="(.+?)".*?>')
 _exportHtmlLevel = 0     # temporary storage
-_origBackrefMatch = None
 _maxIdLength = 50
 
 
@@ -45,7 +44,12 @@ class TreeNode:
     
     Stores links to the parent and lists of children and a format name string.
     Provides methods to get info on the structure and the data.
+    Uses slots to reduce per-node memory use in large trees.
     """
+    __slots__ = ('parent', 'formatName', 'modelRef', 'uniqueId', 'data',
+                 'childList', 'rowCache', 'titleCache', 'searchTextCache',
+                 'valueCache')
+
     def __init__(self, parent, formatName, modelRef, attrs=None):
         """Initialize a tree node.
 
@@ -63,6 +67,25 @@ class TreeNode:
         self.uniqueId = attrs.get('uniqueid', '')
         self.data = {}
         self.childList = []
+        self.rowCache = 0
+        self.titleCache = None
+        self.searchTextCache = None
+        self.valueCache = None
+
+    def __copy__(self):
+        """Return a shallow copy of this node without its cached values.
+
+        The copy shares the data and child list with this node, but the
+        caches are reset so the two nodes don't update each other's caches.
+        """
+        newNode = TreeNode.__new__(TreeNode)
+        for name in TreeNode.__slots__:
+            setattr(newNode, name, getattr(self, name))
+        newNode.rowCache = 0
+        newNode.titleCache = None
+        newNode.searchTextCache = None
+        newNode.valueCache = None
+        return newNode
 
     def index(self):
         """Returns the index of this node in the model.
@@ -71,9 +94,22 @@ class TreeNode:
 
     def row(self):
         """Return the rank of this node in its parent's child list.
+
+        Uses the cached position if still valid, otherwise renumbers all
+        siblings so that following calls are fast.
+        Raises ValueError if not found in the parent's child list.
         """
         if self.parent:
-            return self.parent.childList.index(self)
+            siblings = self.parent.childList
+            pos = self.rowCache
+            if pos < len(siblings) and siblings[pos] is self:
+                return pos
+            for pos, sibling in enumerate(siblings):
+                sibling.rowCache = pos
+            pos = self.rowCache
+            if pos < len(siblings) and siblings[pos] is self:
+                return pos
+            raise ValueError('node not in parent child list')
         return 0
 
     def numChildren(self):
@@ -144,7 +180,7 @@ class TreeNode:
         """Return the nearest previous sibling or None.
         """
         if self.parent:
-            pos = self.parent.childList.index(self)
+            pos = self.row()
             if pos > 0:
                 return self.parent.childList[pos - 1]
         return None
@@ -153,7 +189,7 @@ class TreeNode:
         """Return the nearest next sibling or None.
         """
         if self.parent:
-            pos = self.parent.childList.index(self) + 1
+            pos = self.row() + 1
             if pos < len(self.parent.childList):
                 return self.parent.childList[pos]
         return None
@@ -303,6 +339,7 @@ class TreeNode:
         """Return a sort key used to sort the selection by tree position.
 
         The key is a list of descendant row numbers.
+        The model's treePosition() is faster for nodes in the same model.
         """
         nums = [self.row()]
         parent = self.parent
@@ -324,8 +361,16 @@ class TreeNode:
 
     def title(self):
         """Return title info for use in a tree view.
+
+        The title is cached until the node data or the model's cache stamp
+        changes.
         """
-        return self.nodeFormat().formatTitle(self)
+        cache = self.titleCache
+        if cache and cache[0] == self.modelRef.cacheStamp:
+            return cache[1]
+        title = self.nodeFormat().formatTitle(self)
+        self.titleCache = (self.modelRef.cacheStamp, title)
+        return title
 
     def setTitle(self, title, updateUniqueId=True):
         """Set this node's title based on a provided string.
@@ -344,6 +389,7 @@ class TreeNode:
             if updateUniqueId and (not self.uniqueId or
                                    idData != self.data.get(idFieldName, '')):
                 self.updateUniqueId()
+            self.modelRef.nodeDataChanged(self)
             return True
         return False
 
@@ -449,6 +495,7 @@ class TreeNode:
         if not typeFormat.formatTitle(self):
             typeFormat.extractTitleData(origTitle, self.data)
         self.updateUniqueId()
+        self.modelRef.nodeDataChanged(self)
 
     def setConditionalType(self):
         """Set self to type based on auto conditional settings.
@@ -507,9 +554,11 @@ class TreeNode:
             self.data[field.name] = field.storedText(editorText)
         except ValueError:
             self.data[field.name] = editorText
+            self.modelRef.nodeDataChanged(self)
             raise ValueError
         if field == self.nodeFormat().idField:
             self.updateUniqueId()
+        self.modelRef.nodeDataChanged(self)
 
     def addNewChild(self, posRefNode=None, insertBefore=True,
                     newTitle=_('New')):
@@ -532,10 +581,11 @@ class TreeNode:
         newNode = TreeNode(self, newTypeName, self.modelRef)
         pos = len(self.childList)
         if posRefNode:
-            pos = self.childList.index(posRefNode)
+            pos = posRefNode.row()
             if not insertBefore:
                 pos += 1
         self.childList.insert(pos, newNode)
+        self.modelRef.structureChanged()
         newNode.setInitDefaultData()
         if newTitle and not newNode.title():
             newNode.setTitle(newTitle, False)
@@ -586,10 +636,12 @@ class TreeNode:
                 node.removeUniqueId()
                 self.modelRef.linkRefCollect.removeNodeLinks(node)
         self.childList = newChildList
+        self.modelRef.structureChanged()
 
     def delete(self):
         """Remove this node from tree structure and from unique ID database.
         """
+        self.modelRef.structureChanged()
         if self.parent:
             self.parent.childList.remove(self)
             self.parent = None
@@ -608,6 +660,7 @@ class TreeNode:
         self.parent.childList.remove(self)
         newParent.childList.append(self)
         self.parent = newParent
+        self.modelRef.structureChanged()
         oldParent.restoreExpandViewStatus(expandDict)
 
     def unindent(self):
@@ -618,11 +671,33 @@ class TreeNode:
             return
         expandDict = sibling.parent.saveExpandViewStatus()
         self.parent.childList.remove(self)
-        pos = sibling.parent.childList.index(sibling) + 1
+        pos = sibling.row() + 1
         sibling.parent.childList.insert(pos, self)
         self.parent = sibling.parent
+        self.modelRef.structureChanged()
         sibling.parent.restoreExpandViewStatus(expandDict)
 
+    def searchStrings(self):
+        """Return a tuple of text strings used for searches in this node.
+
+        Returns the title and data text, the title length, the lowercase
+        text and the lowercase title length.  The text is cached until the
+        node data or the model's cache stamp changes.
+        """
+        cache = self.searchTextCache
+        if cache and cache[0] == self.modelRef.cacheStamp:
+            return cache[1:]
+        title = self.title()
+        lowerTitle = title.lower()
+        # join with null char so phrase matches don't cross borders
+        dataStr = '\0'.join(self.data.values())
+        cache = (self.modelRef.cacheStamp,
+                 '{0}\0{1}'.format(title, dataStr), len(title),
+                 '{0}\0{1}'.format(lowerTitle, dataStr.lower()),
+                 len(lowerTitle))
+        self.searchTextCache = cache
+        return cache[1:]
+
     def wordSearch(self, wordList, titleOnly=False):
         """Return True if all words in wordlist are found in this node's data.
 
@@ -630,13 +705,10 @@ class TreeNode:
             wordList -- a list of words or phrases to find
             titleOnly -- search only in the title text if True
         """
-        dataStr = self.title().lower()
-        if not titleOnly:
-            # join with null char so phrase matches don't cross borders
-            dataStr = '{0}\0{1}'.format(dataStr,
-                                        '\0'.join(self.data.values()).lower())
+        text, titleLen, lowerText, lowerTitleLen = self.searchStrings()
+        endPos = lowerTitleLen if titleOnly else len(lowerText)
         for word in wordList:
-            if word not in dataStr:
+            if lowerText.find(word, 0, endPos) < 0:
                 return False
         return True
 
@@ -647,12 +719,10 @@ class TreeNode:
             regExpList -- a list of regular expression objects to find
             titleOnly -- search only in the title text if True
         """
-        dataStr = self.title()
-        if not titleOnly:
-            # join with null char so phrase matches don't cross borders
-            dataStr = '{0}\0{1}'.format(dataStr, '\0'.join(self.data.values()))
+        text, titleLen, lowerText, lowerTitleLen = self.searchStrings()
+        endPos = titleLen if titleOnly else len(text)
         for regExpObj in regExpList:
-            if not regExpObj.search(dataStr):
+            if not regExpObj.search(text, 0, endPos):
                 return False
         return True
 
@@ -705,11 +775,7 @@ class TreeNode:
                     if replaceText is not None:
                         replace = replaceText
                         if not searchText:
-                            global _origBackrefMatch
-                            _origBackrefMatch = match
-                            for backrefRe in _replaceBackrefRe:
-                                replace = backrefRe.sub(self.replaceBackref,
-                                                        replace)
+                            replace = expandBackrefs(replaceText, match)
                         fieldText = (fieldText[:pos] + replace +
                                      fieldText[pos + matchLen:])
                         try:
@@ -723,15 +789,62 @@ class TreeNode:
             findCount = prevFieldFindCount = 0
         return (matchedFieldname, findCount, prevFieldFindCount)
 
-    @staticmethod
-    def replaceBackref(match):
-        """Return the re match group from _origBackrefMatch for replacement.
+    def replacedFieldTexts(self, searchText='', regExpObj=None, typeName='',
+                           fieldName='', replaceText=''):
+        """Return the match count and new field texts with all replacements.
 
-        Used for reg exp backreference replacement.
+        Plain search text is matched the same way as in searchReplace.
+        Does not change the node, the new texts are applied with setDataTexts.
+        Returns a tuple of the number of matches and a dict of the changed
+        editor texts by field.
+        Arguments:
+            searchText -- the lowercase text to find in a non-regexp search
+            regExpObj -- the regular expression to find if searchText is blank
+            typeName -- if given, verify that this node matches this type
+            fieldName -- if given, only find matches under this field name
+            replaceText -- the replacement string, with backreferences for
+                           a regular expression
+        """
+        if typeName and typeName != self.formatName:
+            return (0, {})
+        nodeFormat = self.nodeFormat()
+        fields = ([nodeFormat.fieldDict[fieldName]] if fieldName
+                  else nodeFormat.fields())
+        matchCount = 0
+        fieldTexts = {}
+        for field in fields:
+            fieldText = field.editorText(self)
+            if not fieldText:
+                continue
+            if searchText:
+                newText, count = replacedText(fieldText, searchText,
+                                              replaceText)
+            else:
+                newText, count = regExpObj.subn(lambda match:
+                                                expandBackrefs(replaceText,
+                                                               match),
+                                                fieldText)
+            if count:
+                matchCount += count
+                fieldTexts[field] = newText
+        return (matchCount, fieldTexts)
+
+    def setDataTexts(self, fieldTexts):
+        """Set the data entries for several fields from editor texts.
+
+        Invalid texts are set to the raw text, as in setData, but no error is
+        raised.  The unique ID and change notification are only updated once.
         Arguments:
-            match -- the backref match in the replacement string
+            fieldTexts -- a dict of editor texts by field
         """
-        return _origBackrefMatch.group(int(match.group(1)))
+        for field, editorText in fieldTexts.items():
+            try:
+                self.data[field.name] = field.storedText(editorText)
+            except ValueError:
+                self.data[field.name] = editorText
+        if self.nodeFormat().idField in fieldTexts:
+            self.updateUniqueId()
+        self.modelRef.nodeDataChanged(self)
 
     def fieldSortKey(self, level=0):
         """Return a key used to sort by key fields.
@@ -772,6 +885,7 @@ class TreeNode:
             self.childList.sort(key = operator.methodcaller('fieldSortKey',
                                                             level - 1),
                                 reverse = not directions[level - 1])
+        self.modelRef.structureChanged()
         if recursive:
             for child in self.childList:
                 child.sortChildrenByField(True, forward)
@@ -790,6 +904,7 @@ class TreeNode:
         """
         self.childList.sort(key = operator.methodcaller('titleSortKey'),
                             reverse = not forward)
+        self.modelRef.structureChanged()
         if recursive:
             for child in self.childList:
                 child.sortChildrenByTitle(True, forward)
@@ -809,6 +924,7 @@ class TreeNode:
                 child = TreeNode(self, self.formatName, self.modelRef)
                 child.setTitle(text)
                 self.childList.append(child)
+                self.modelRef.structureChanged()
                 if not child.loadChildLevels(textLevelList, level):
                     return False
             else:
@@ -818,42 +934,45 @@ class TreeNode:
     def updateNodeMathFields(self):
         """Recalculate math fields that depend on this node and so on.
 
+        Each dependent field is recalculated once, in evaluation order.
+        Stores the number of recalculated fields in the model.
         Return True if any data was changed.
         """
-        changed = False
-        for field in self.nodeFormat().fields():
-            for fieldRef in (self.modelRef.formats.mathFieldRefDict.
-                             get(field.name, [])):
-                for node in fieldRef.dependentEqnNodes(self):
-                    if node.recalcMathField(fieldRef.eqnFieldName):
-                        changed = True
-        return changed
+        return len(self.modelRef.updateMathFields([self])) > 0
 
     def recalcMathField(self, eqnFieldName):
-        """Recalculate a math field, if changed, recalc depending math fields.
+        """Recalculate a single math field in this node.
 
-        Return True if any data was changed.
+        Fields that depend on it are not updated.
+        Return True if the data was changed.
         Arguments:
             eqnFieldName -- the equation field in this node to update
         """
-        changed = False
         oldValue = self.data.get(eqnFieldName, '')
         newValue = (self.nodeFormat().fieldDict[eqnFieldName].
                     equationValue(self))
         if newValue != oldValue:
             self.data[eqnFieldName] = newValue
-            changed = True
-            for fieldRef in (self.modelRef.formats.mathFieldRefDict.
-                             get(eqnFieldName, [])):
-                for node in fieldRef.dependentEqnNodes(self):
-                    node.recalcMathField(fieldRef.eqnFieldName)
-        return changed
+            self.modelRef.nodeDataChanged(self)
+            return True
+        return False
+
+    def depth(self):
+        """Return the number of ancestors of this node.
+        """
+        depth = 0
+        node = self.parent
+        while node:
+            depth += 1
+            node = node.parent
+        return depth
 
     def updateNumbering(self, fieldDict, currentSequence, levelLimit,
                         includeRoot=True, reserveNums=True,
                         restartSetting=False):
         """Add auto incremented numbering to fields by type in the dict.
 
+        Return a list of the nodes with changed numbering.
         Arguments:
             fieldDict -- numbering field name lists stored by type name
             currentSequence -- a list of int for the current numbering sequence
@@ -862,21 +981,32 @@ class TreeNode:
             reserveNums -- if true, increment number even without num field
             restartSetting -- if true, restart numbering after a no-field gap
         """
+        changedNodes = []
         childSequence = currentSequence[:]
         if includeRoot:
+            numText = '.'.join((repr(num) for num in currentSequence))
+            changed = False
             for fieldName in fieldDict.get(self.formatName, []):
-                self.data[fieldName] = '.'.join((repr(num) for num in
-                                                 currentSequence))
+                if self.data.get(fieldName, '') != numText:
+                    self.data[fieldName] = numText
+                    changed = True
+            if changed:
+                self.modelRef.nodeDataChanged(self)
+                changedNodes.append(self)
             if self.formatName in fieldDict or reserveNums:
                 childSequence += [1]
         if levelLimit > 0:
             for child in self.childList:
-                child.updateNumbering(fieldDict, childSequence, levelLimit - 1,
-                                      True, reserveNums, restartSetting)
+                changedNodes.extend(child.updateNumbering(fieldDict,
+                                                          childSequence,
+                                                          levelLimit - 1,
+                                                          True, reserveNums,
+                                                          restartSetting))
                 if child.formatName in fieldDict or reserveNums:
                     childSequence[-1] += 1
                 if restartSetting and child.formatName not in fieldDict:
                     childSequence[-1] = 1
+        return changedNodes
 
     def flatChildCategory(self, origFormats):
         """Collapse descendant nodes by merging fields.
@@ -899,6 +1029,7 @@ class TreeNode:
                 oldParent.removeUniqueId()
                 oldParent = oldParent.parent
             node.parent = self
+        self.modelRef.structureChanged()
 
     def addChildCategory(self, catList):
         """Insert category nodes above children.
@@ -940,6 +1071,7 @@ class TreeNode:
             newParent.childList.append(child)
             child.parent = newParent
         self.childList = newParents
+        self.modelRef.structureChanged()
 
     def findEqualFields(self, fieldNames, nodes):
         """Return first node in nodes with same data in fieldNames as self.
@@ -969,6 +1101,7 @@ class TreeNode:
                                                            uniqueId)
             node.childList = []
             node.parent = self
+        self.modelRef.structureChanged()
 
     def arrangeByLink(self, linkField):
         """Place descendant nodes under parents found in link fields.
@@ -991,6 +1124,7 @@ class TreeNode:
                 parentNode = self
             node.parent = parentNode
             parentNode.childList.append(node)
+        self.modelRef.structureChanged()
 
     def exportTitleText(self, level=0, openOnly=False):
         """Return a list of tabbed title lines for this node and descendants.
@@ -1325,6 +1459,45 @@ class TreeNode:
 
 ####  Utility Functions  ####
 
+def expandBackrefs(replaceText, match):
+    """Return the replacement text with backreferences set from the match.
+
+    Handles "\\1" and "\\g<1>" style numeric backreferences.
+    Arguments:
+        replaceText -- the replacement string with backreferences
+        match -- the regular expression match object
+    """
+    for backrefRe in _replaceBackrefRe:
+        replaceText = backrefRe.sub(lambda backref:
+                                    match.group(int(backref.group(1))),
+                                    replaceText)
+    return replaceText
+
+
+def replacedText(text, searchText, replaceText):
+    """Return the text with all search text matches replaced and the count.
+
+    Uses the same case-insensitive matching as the find commands.
+    Arguments:
+        text -- the text to search
+        searchText -- the lowercase text to find
+        replaceText -- the replacement string
+    """
+    lowerText = text.lower()
+    parts = []
+    count = 0
+    pos = 0
+    while pos < len(text):
+        matchPos = lowerText.find(searchText, pos)
+        if matchPos < 0:
+            break
+        parts.extend((text[pos:matchPos], replaceText))
+        count += 1
+        pos = matchPos + len(searchText)
+    parts.append(text[pos:])
+    return (''.join(parts), count)
+
+
 def adjustId(uniqueId):
     """Adjust unique ID string by shortening and replacing illegal characters.
 
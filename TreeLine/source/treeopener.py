@@ -74,14 +74,16 @@ class TreeOpener:
             element -- an ElementTree node
             parent  -- the parent TreeNode (None for the root node only)
         """
+        # intern names since they are repeated in every node of the type
+        formatName = sys.intern(element.tag)
         try:
-            typeFormat = self.model.formats[element.tag]
+            typeFormat = self.model.formats[formatName]
         except KeyError:
-            typeFormat = nodeformat.NodeFormat(element.tag, self.model.formats,
+            typeFormat = nodeformat.NodeFormat(formatName, self.model.formats,
                                                element.attrib)
-            self.model.formats[element.tag] = typeFormat
+            self.model.formats[formatName] = typeFormat
         if element.get('item') == 'y':
-            node = treenode.TreeNode(parent, element.tag, self.model,
+            node = treenode.TreeNode(parent, formatName, self.model,
                                      element.attrib)
             if parent:
                 parent.childList.append(node)
@@ -94,7 +96,7 @@ class TreeOpener:
                 self.loadNode(child, node)
             else:
                 if node and child.text:
-                    node.data[child.tag] = child.text
+                    node.data[sys.intern(child.tag)] = child.text
                     if child.get('linkcount'):
                         self.model.linkRefCollect.searchForLinks(node,
                                                                  child.tag)
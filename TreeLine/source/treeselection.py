@@ -12,7 +12,6 @@
 # but WITTHOUT ANY WARRANTY.  See the included LICENSE file for details.
 #******************************************************************************
 
-import operator
 from PyQt4 import QtCore, QtGui
 import treenodelist
 
@@ -54,15 +53,8 @@ class TreeSelection(QtGui.QItemSelectionModel):
 
         Eliminate nodes that are already descendants of other selected nodes.
         """
-        result = treenodelist.TreeNodeList()
-        selectedNodes = self.selectedNodes()
-        for node in selectedNodes:
-            parent = node.parent
-            while parent and parent not in selectedNodes:
-                parent = parent.parent
-            if not parent:
-                result.append(node)
-        return result
+        return treenodelist.TreeNodeList(self.model().
+                                         uniqueBranches(self.selectedNodes()))
 
     def selectNode(self, node, signalUpdate=True, expandParents=False):
         """Clear the current selection and select the given node.
@@ -139,8 +131,7 @@ class TreeSelection(QtGui.QItemSelectionModel):
     def sortSelection(self):
         """Sorts the selection by tree position.
         """
-        self.selectNodes(sorted(self.selectedNodes(),
-                                key=operator.methodcaller('treePosSortKey')),
+        self.selectNodes(self.model().sortedNodes(self.selectedNodes()),
                          False)
 
     def addToHistory(self, nodes):
@@ -12,12 +12,16 @@
 # but WITTHOUT ANY WARRANTY.  See the included LICENSE file for details.
 #******************************************************************************
 
+import re
+import time
 from PyQt4 import QtCore, QtGui
 import treenode
 import treeselection
 import miscdialogs
 import globalref
 
+_filterBatchTime = 0.2   # max. seconds to filter before showing results
+
 
 class TreeView(QtGui.QTreeView):
     """Class override for the indented tree view.
@@ -332,6 +336,13 @@ class TreeFilterView(QtGui.QListWidget):
         self.filterWhat = miscdialogs.FindFilterDialog.fullData
         self.filterHow = miscdialogs.FindFilterDialog.keyWords
         self.filterStr = ''
+        self.filterMatchFunc = None
+        self.filterNodeGen = None
+        # the last node checked by an unfinished filter, None when finished
+        self.filterEndNode = None
+        self.filterTimer = QtCore.QTimer(self)
+        self.filterTimer.setSingleShot(True)
+        self.filterTimer.timeout.connect(self.filterNextBatch)
         self.setSelectionMode(QtGui.QAbstractItemView.ExtendedSelection)
         self.setItemDelegate(TreeEditDelegate(self))
         if globalref.genOptions.getValue('ClickRename'):
@@ -354,66 +365,213 @@ class TreeFilterView(QtGui.QListWidget):
                 self.blockSignals(False)
                 return
 
+    def updateNodes(self, nodes):
+        """Re-test changed nodes with the filter and update the list in place.
+
+        Matching nodes are updated or inserted in tree order and nodes that
+        no longer match are removed.  After a cancelled filter, nodes past
+        the last checked node are not inserted.  Does a full update if the
+        filter is still running or if titles may use data from other nodes.
+        Arguments:
+            nodes -- the changed nodes
+        """
+        if (self.filterNodeGen or not self.filterMatchFunc or
+            (not self.conditionalFilter and
+             self.model.externalTitleTypes())):
+            self.updateContents()
+            return
+        self.model.treePosition(self.model.root)
+        treePosDict = self.model.treePosDict
+        endPos = None
+        if self.filterEndNode:
+            # nothing is inserted if the last checked node was removed
+            endPos = treePosDict.get(self.filterEndNode, (-1,))[0]
+        selectedNodes = set(self.selectionModel.selectedNodes())
+        self.blockSignals(True)
+        for node in nodes:
+            if node not in treePosDict:
+                continue
+            row, found = self.nodeRow(node)
+            if self.filterMatchFunc(node):
+                if found:
+                    self.item(row).update()
+                elif endPos is None or treePosDict[node][0] <= endPos:
+                    item = TreeFilterViewItem(node)
+                    self.insertItem(row, item)
+                    if node in selectedNodes:
+                        item.setSelected(True)
+            elif found:
+                self.takeItem(row)
+        self.blockSignals(False)
+
+    def nodeRow(self, node):
+        """Return a tuple of the list row for a node and True if it is found.
+
+        The row is the insert position if the node is not in the list.
+        Uses a binary search, since the items are kept in tree order.
+        Arguments:
+            node -- the node to find
+        """
+        nodePos = self.model.treePosition(node)
+        low = 0
+        high = self.count()
+        while low < high:
+            mid = (low + high) // 2
+            if self.model.treePosition(self.item(mid).node) < nodePos:
+                low = mid + 1
+            else:
+                high = mid
+        return (low, low < self.count() and self.item(low).node is node)
+
     def updateContents(self):
         """Update filtered contents from current model and filter criteria.
         """
         if self.conditionalFilter:
             self.conditionalUpdate()
             return
-        QtGui.QApplication.setOverrideCursor(QtCore.Qt.WaitCursor)
+        titlesOnly = self.filterWhat == miscdialogs.FindFilterDialog.titlesOnly
+        if self.filterHow == miscdialogs.FindFilterDialog.approximate:
+            # ranked matches can't be re-tested one node at a time
+            self.filterMatchFunc = None
+            self.startFilter(self.model.searchIndex.
+                             approximateMatches(self.filterStr, titlesOnly))
+            return
+        wordList = []
         if self.filterHow == miscdialogs.FindFilterDialog.regExp:
             criteria = [re.compile(self.filterStr)]
             useRegExpFilter = True
         elif self.filterHow == miscdialogs.FindFilterDialog.fullWords:
             criteria = []
-            for word in self.filterStr.lower().split():
+            wordList = self.filterStr.lower().split()
+            for word in wordList:
                 criteria.append(re.compile(r'(?i)\b{}\b'.
                                            format(re.escape(word))))
             useRegExpFilter = True
         elif self.filterHow == miscdialogs.FindFilterDialog.keyWords:
-            criteria = self.filterStr.lower().split()
+            criteria = wordList = self.filterStr.lower().split()
             useRegExpFilter = False
         else:         # full phrase
-            criteria = [self.filterStr.lower().strip()]
+            criteria = wordList = [self.filterStr.lower().strip()]
             useRegExpFilter = False
-        titlesOnly = self.filterWhat == miscdialogs.FindFilterDialog.titlesOnly
-        self.blockSignals(True)
-        self.clear()
+        candidates = None
+        if wordList:
+            candidates = self.model.searchIndex.wordCandidates(wordList,
+                                                               titlesOnly,
+                                                               useRegExpFilter)
+        if candidates is None:
+            nodes = self.model.root.descendantGen()
+        else:
+            nodes = sorted(candidates, key=self.model.treePosition)
         if useRegExpFilter:
-            for node in self.model.root.descendantGen():
-                if node.regExpSearch(criteria, titlesOnly):
-                    item = TreeFilterViewItem(node, self)
+            self.filterMatchFunc = lambda node: node.regExpSearch(criteria,
+                                                                  titlesOnly)
         else:
-            for node in self.model.root.descendantGen():
-                if node.wordSearch(criteria, titlesOnly):
-                    item = TreeFilterViewItem(node, self)
-        self.blockSignals(False)
-        self.selectItems(self.selectionModel.selectedNodes(), True)
-        if self.count() and not self.selectedItems():
-            self.item(0).setSelected(True)
-        message = _('Filtering by "{0}", found {1} nodes').format(self.
-                                                                  filterStr,
-                                                                  self.count())
-        globalref.mainControl.currentStatusBar().showMessage(message)
-        QtGui.QApplication.restoreOverrideCursor()
+            self.filterMatchFunc = lambda node: node.wordSearch(criteria,
+                                                                titlesOnly)
+        self.startFilter(nodes)
 
     def conditionalUpdate(self):
         """Update filtered contents from model and conditional criteria.
         """
-        QtGui.QApplication.setOverrideCursor(QtCore.Qt.WaitCursor)
+        candidates = self.conditionalFilter.candidateNodes(self.model)
+        if candidates is None:
+            nodes = self.model.root.descendantGen()
+        else:
+            nodes = sorted(candidates, key=self.model.treePosition)
+        self.filterMatchFunc = self.conditionalFilter.evaluate
+        self.startFilter(nodes)
+
+    def startFilter(self, nodes):
+        """Clear the contents and start adding matched nodes.
+
+        Results are added in batches so the first ones are shown quickly
+        and long filter operations can be cancelled.
+        Arguments:
+            nodes -- the nodes to check in tree order, all match if there is
+                     no filterMatchFunc
+        """
+        self.filterTimer.stop()
         self.blockSignals(True)
         self.clear()
-        for node in self.model.root.descendantGen():
-            if self.conditionalFilter.evaluate(node):
-                item = TreeFilterViewItem(node, self)
         self.blockSignals(False)
+        self.filterNodeGen = iter(nodes)
+        self.filterEndNode = None
+        self.filterNextBatch()
+
+    def filterNextBatch(self):
+        """Add the next batch of matched nodes to the list.
+
+        Continues from a timer until all nodes are checked.
+        """
+        if not self.filterNodeGen:
+            return
+        QtGui.QApplication.setOverrideCursor(QtCore.Qt.WaitCursor)
+        endTime = time.perf_counter() + _filterBatchTime
+        matchFunc = self.filterMatchFunc
+        finished = True
+        self.blockSignals(True)
+        for node in self.filterNodeGen:
+            if not matchFunc or matchFunc(node):
+                TreeFilterViewItem(node, self)
+            if time.perf_counter() > endTime:
+                self.filterEndNode = node
+                finished = False
+                break
+        self.blockSignals(False)
+        if finished:
+            self.filterNodeGen = None
+            self.filterEndNode = None
+            self.finishFilter()
+        else:
+            message = (_('Filtering, found {0} nodes so far '
+                         '(press Esc to cancel)').format(self.count()))
+            globalref.mainControl.currentStatusBar().showMessage(message)
+            self.filterTimer.start(0)
+        QtGui.QApplication.restoreOverrideCursor()
+
+    def finishFilter(self, cancelled=False):
+        """Update the selection and the status message after filtering.
+
+        Arguments:
+            cancelled -- True if the filter operation was stopped early
+        """
         self.selectItems(self.selectionModel.selectedNodes(), True)
         if self.count() and not self.selectedItems():
             self.item(0).setSelected(True)
-        message = _('Conditional filtering, found {0} nodes').format(self.
+        if cancelled:
+            message = _('Filtering cancelled, found {0} nodes').format(self.
+                                                                      count())
+        elif self.conditionalFilter:
+            message = _('Conditional filtering, found {0} nodes').format(self.
                                                                      count())
+        else:
+            message = _('Filtering by "{0}", found {1} nodes').format(self.
+                                                                  filterStr,
+                                                                  self.count())
         globalref.mainControl.currentStatusBar().showMessage(message)
-        QtGui.QApplication.restoreOverrideCursor()
+
+    def cancelFilter(self):
+        """Stop an unfinished filter operation, keeping the found nodes.
+
+        Later updates only add matches up to the last checked node, so the
+        list stays limited to the part of the tree that was filtered.
+        """
+        if self.filterNodeGen:
+            self.filterTimer.stop()
+            self.filterNodeGen = None
+            self.finishFilter(True)
+
+    def keyPressEvent(self, event):
+        """Cancel an unfinished filter operation with the escape key.
+
+        Arguments:
+            event -- the key press event
+        """
+        if event.key() == QtCore.Qt.Key_Escape and self.filterNodeGen:
+            self.cancelFilter()
+            event.accept()
+            return
+        super().keyPressEvent(event)
 
     def selectItems(self, nodes, signalModel=False):
         """Select items matching given nodes if in filtered view.
@@ -486,6 +486,7 @@ class TreeWindow(QtGui.QMainWindow):
         toolsMenu.addAction(self.allActions['ToolsFilterCondition'])
         toolsMenu.addSeparator()
         toolsMenu.addAction(self.allActions['ToolsSpellCheck'])
+        toolsMenu.addAction(self.allActions['ToolsMathProfile'])
         toolsMenu.addSeparator()
         toolsMenu.addAction(self.allActions['ToolsGenOptions'])
         toolsMenu.addSeparator()
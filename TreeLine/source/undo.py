@@ -71,13 +71,16 @@ class UndoRedoList(list):
 
         Remove the last undo item from the list.
         Restore the previous selection and saved doc modified state.
+        Return the undo item that was restored.
         """
         item = self.pop()
         item.undo(self.altListRef)
+        self.localControlRef.model.structureChanged()
         self.localControlRef.currentSelectionModel().\
                              selectNodes(item.selectedNodes, False)
         self.localControlRef.setModified(item.modified)
         self.action.setEnabled(len(self) > 0)
+        return item
 
 
 class UndoBase:
@@ -95,6 +98,13 @@ class UndoBase:
                               selectedNodes())
         self.modified = localControlRef.modified
 
+    def changedDataNodes(self):
+        """Return a list of nodes if only their data is changed by this undo.
+
+        Returns None if the tree structure or other items may change.
+        """
+        return None
+
 
 class DataUndo(UndoBase):
     """Info for undo/redo of tree node data changes.
@@ -134,6 +144,12 @@ class DataUndo(UndoBase):
         for node, data, fieldRef in self.dataList:
             node.data = data
             node.updateUniqueId()
+            node.modelRef.nodeDataChanged(node)
+
+    def changedDataNodes(self):
+        """Return a list of the nodes with data changed by this undo.
+        """
+        return [data[0] for data in self.dataList]
 
 
 class ChildListUndo(UndoBase):
@@ -212,6 +228,7 @@ class TypeUndo(UndoBase):
             node.formatName = formatName
             node.data = data
             node.updateUniqueId()
+            node.modelRef.nodeDataChanged(node)
 
 
 class FormatUndo(UndoBase):
@@ -309,6 +326,7 @@ class BranchUndo(UndoBase):
                 for grandchild in child.descendantGen():
                     node.modelRef.nodeIdDict[grandchild.uniqueId] = grandchild
             node.updateUniqueId()
+            node.modelRef.nodeDataChanged(node)
 
 
 class BranchFormatUndo(UndoBase):
@@ -347,6 +365,7 @@ class BranchFormatUndo(UndoBase):
                              self.modelRef.formats, False)
         self.modelRef.formats = self.treeFormats
         self.modelRef.getConfigDialogFormats(True)
+        self.modelRef.clearNodeCaches()
         dialog = globalref.mainControl.configDialog
         if dialog and dialog.isVisible():
             dialog.reset()
@@ -361,6 +380,7 @@ class BranchFormatUndo(UndoBase):
                 for grandchild in child.descendantGen():
                     node.modelRef.nodeIdDict[grandchild.uniqueId] = grandchild
             node.updateUniqueId()
+            node.modelRef.nodeDataChanged(node)
 
 
 class ParamUndo(UndoBase):
@@ -0,0 +1,121 @@
+#!/usr/bin/env python3
+
+#******************************************************************************
+# test_conditional.py, unit tests for compiled condition tests
+#
+# TreeLine, an information storage program
+# Copyright (C) 2015, Douglas W. Bell
+#
+# This is free software; you can redistribute it and/or modify it under the
+# terms of the GNU General Public License, either Version 2 or any later
+# version.  This program is distributed in the hope that it will be useful,
+# but WITTHOUT ANY WARRANTY.  See the included LICENSE file for details.
+#******************************************************************************
+
+import unittest
+import testsetup
+
+
+@unittest.skipUnless(testsetup.qtAvailable, 'requires PyQt4')
+class ValueTestFunctionTest(unittest.TestCase):
+    """Tests for the value comparison functions.
+    """
+    def setUp(self):
+        import conditional
+        self.valueTestFunction = conditional.valueTestFunction
+
+    def testCompare(self):
+        self.assertTrue(self.valueTestFunction('<', 5.0)(3.0))
+        self.assertFalse(self.valueTestFunction('>=', 5.0)(3.0))
+        self.assertTrue(self.valueTestFunction('!=', 'a')('b'))
+
+    def testMixedTypes(self):
+        for oper in ('<', '<=', '>', '>='):
+            self.assertFalse(self.valueTestFunction(oper, 5.0)('abc'))
+        self.assertFalse(self.valueTestFunction('==', 5.0)('abc'))
+        self.assertTrue(self.valueTestFunction('!=', 5.0)('abc'))
+
+    def testStringTests(self):
+        self.assertTrue(self.valueTestFunction('starts with', 'ab')('abc'))
+        self.assertTrue(self.valueTestFunction('ends with', 3)(123))
+        self.assertTrue(self.valueTestFunction('contains', 'b')('abc'))
+        self.assertTrue(self.valueTestFunction('True', 'x')(None))
+
+
+_dateTreeText = """<?xml version="1.0" encoding="utf-8" ?>
+<ROOT item="y" tlversion="2.0.2" uniqueid="root" line0="{*Name*}">
+<Name type="Text">Root</Name>
+<ITEM item="y" uniqueid="a" line0="{*Name*}"><Name type="Text">A</Name>
+<Day type="Date">2015-03-09</Day><At type="Time">09:05:00</At></ITEM>
+<ITEM item="y" uniqueid="b"><Name>B</Name>
+<Day>2014-12-31</Day><At>18:30:00</At></ITEM>
+<ITEM item="y" uniqueid="c"><Name>C</Name></ITEM>
+</ROOT>
+"""
+
+
+@unittest.skipUnless(testsetup.qtAvailable, 'requires PyQt4')
+class DateTimeConditionTest(unittest.TestCase):
+    """Tests for date and time compare values and conditions.
+    """
+    def setUp(self):
+        from PyQt4 import QtCore
+        import globalref
+        import conditional
+        self.conditional = conditional
+        self.model, rootAttr = testsetup.loadModel(_dateTreeText)
+        self.nodes = self.model.nodeIdDict
+        dateFormat = globalref.genOptions.getValue('EditDateFormat')
+        self.dateText = QtCore.QDate(2015, 1, 1).toString(dateFormat)
+        timeFormat = globalref.genOptions.getValue('EditTimeFormat')
+        self.timeText = QtCore.QTime(12, 0).toString(timeFormat)
+
+    def matches(self, conditionStr):
+        condition = self.conditional.Conditional(conditionStr)
+        return {node.uniqueId for node in self.model.root.childList if
+                condition.evaluate(node)}
+
+    def testCompareValues(self):
+        field = self.nodes['a'].nodeFormat().fieldDict['Day']
+        values = [field.compareValue(self.nodes[name]) for name in 'cba']
+        self.assertEqual(values, sorted(values))
+        self.assertIsInstance(values[2], int)
+        self.assertEqual(field.compareText(values[2]), '2015-03-09')
+        self.assertEqual(field.compareText(values[0]), '')
+        self.assertLess(field.sortKey(self.nodes['b']),
+                        field.sortKey(self.nodes['a']))
+
+    def testConditions(self):
+        self.assertEqual(self.matches('Day > "{0}"'.format(self.dateText)),
+                         {'a'})
+        self.assertEqual(self.matches('Day == ""'), {'c'})
+        self.assertEqual(self.matches('Day starts with "2014"'), {'b'})
+        self.assertEqual(self.matches('At contains "05"'), {'a'})
+        self.assertEqual(self.matches('At < "{0}"'.format(self.timeText)),
+                         {'a', 'c'})
+
+    def testIsoConditionValues(self):
+        self.assertEqual(self.matches('Day == "2015-03-09"'), {'a'})
+        self.assertEqual(self.matches('Day > "2015-01-01"'), {'a'})
+        self.assertEqual(self.matches('At == "18:30:00"'), {'b'})
+        self.assertEqual(self.matches('At <= "09:05:00"'), {'a', 'c'})
+        self.assertEqual(self.matches('Day < "abc"'), {'a', 'b', 'c'})
+
+    def testValueAdjustedOnce(self):
+        field = self.nodes['a'].nodeFormat().fieldDict['Day']
+        adjustedValues = []
+        def adjustedCompareValue(value):
+            adjustedValues.append(value)
+            return type(field).adjustedCompareValue(field, value)
+        field.adjustedCompareValue = adjustedCompareValue
+        try:
+            condition = ('Day > "{0}" or Day contains "12"'.
+                         format(self.dateText))
+            self.assertEqual(self.matches(condition), {'a', 'b'})
+        finally:
+            del field.adjustedCompareValue
+        self.assertEqual(adjustedValues, [self.dateText, '12'])
+
+
+if __name__ == '__main__':
+    unittest.main()
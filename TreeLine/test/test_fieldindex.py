@@ -0,0 +1,114 @@
+#!/usr/bin/env python3
+
+#******************************************************************************
+# test_fieldindex.py, unit tests for the field value index
+#
+# TreeLine, an information storage program
+# Copyright (C) 2015, Douglas W. Bell
+#
+# This is free software; you can redistribute it and/or modify it under the
+# terms of the GNU General Public License, either Version 2 or any later
+# version.  This program is distributed in the hope that it will be useful,
+# but WITTHOUT ANY WARRANTY.  See the included LICENSE file for details.
+#******************************************************************************
+
+import unittest
+import testsetup
+import searchindex
+
+
+class FakeConditionLine:
+    """Minimal condition line with a value test for the other operators.
+    """
+    def __init__(self, fieldName, oper, value):
+        self.fieldName = fieldName
+        self.oper = oper
+        self.value = value
+
+    def valueTest(self, field):
+        value = field.adjustedCompareValue(self.value)
+        if self.oper == 'starts with':
+            return lambda dataValue: str(dataValue).startswith(value)
+        if self.oper == '>=':
+            def test(dataValue):
+                try:
+                    return dataValue >= value
+                except TypeError:
+                    return False
+            return test
+        return lambda dataValue: str(value) in str(dataValue)
+
+
+class FieldIndexTest(unittest.TestCase):
+    """Tests for candidate nodes from field value indexes.
+    """
+    def setUp(self):
+        FakeField = testsetup.FakeField
+        FakeNode = testsetup.FakeNode
+        self.format = testsetup.FakeFormat('ITEM', [FakeField('Status'),
+                                                    FakeField('Amount', True)])
+        otherFormat = testsetup.FakeFormat('OTHER', [FakeField('Status')])
+        self.nodes = [FakeNode('root', otherFormat, Status='root'),
+                      FakeNode('a', self.format, Status='Open', Amount='5'),
+                      FakeNode('b', self.format, Status='Closed',
+                               Amount='12'),
+                      FakeNode('c', self.format, Status='open', Amount='2'),
+                      FakeNode('d', otherFormat, Status='open')]
+        self.model = testsetup.FakeModel(self.nodes)
+        self.index = searchindex.FieldIndex(self.model)
+
+    def matches(self, fieldName, oper, value):
+        return self.index.matchingNodes(self.format,
+                                        FakeConditionLine(fieldName, oper,
+                                                          value))
+
+    def testEquality(self):
+        root, a, b, c, d = self.nodes
+        self.assertEqual(self.matches('Status', '==', 'OPEN'), {a, c})
+        self.assertEqual(self.matches('Amount', '==', '12'), {b})
+        self.assertEqual(self.matches('Amount', '==', '7'), set())
+
+    def testRanges(self):
+        root, a, b, c, d = self.nodes
+        self.assertEqual(self.matches('Amount', '<', '5'), {c})
+        self.assertEqual(self.matches('Amount', '<=', '5'), {a, c})
+        self.assertEqual(self.matches('Amount', '>', '5'), {b})
+        self.assertEqual(self.matches('Amount', '>=', '5'), {a, b})
+
+    def testTextOperators(self):
+        root, a, b, c, d = self.nodes
+        self.assertEqual(self.matches('Status', 'starts with', 'clo'), {b})
+        self.assertEqual(self.matches('Status', 'contains', 'pe'), {a, c})
+
+    def testUnorderedValues(self):
+        root, a, b, c, d = self.nodes
+        a.data['Amount'] = 'n/a'
+        self.index.updateNode(a)
+        self.assertEqual(self.matches('Amount', '>=', '2'), {b, c})
+        self.assertIsNone(self.index.formatFieldDict['ITEM']['Amount'].
+                          sortedKeys)
+
+    def testUpdates(self):
+        root, a, b, c, d = self.nodes
+        self.assertEqual(self.matches('Status', '==', 'open'), {a, c})
+        c.data['Status'] = 'Closed'
+        self.index.updateNode(c)
+        self.assertEqual(self.matches('Status', '==', 'open'), {a})
+        a.data['Status'] = 'Closed'
+        self.index.markAllChanged()
+        self.assertEqual(self.matches('Status', '==', 'closed'), {a, b, c})
+        self.model.nodes.remove(b)
+        self.model.treePosDict = None
+        self.assertEqual(self.matches('Status', '==', 'closed'), {a, c})
+
+    def testFormatsReplaced(self):
+        root, a, b, c, d = self.nodes
+        self.assertEqual(self.matches('Amount', '>', '3'), {a, b})
+        self.model.formats = object()
+        self.assertEqual(self.matches('Amount', '>', '3'), {a, b})
+        self.assertEqual(set(self.index.formatFieldDict['ITEM']),
+                         {'Amount'})
+
+
+if __name__ == '__main__':
+    unittest.main()
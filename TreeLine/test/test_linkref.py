@@ -0,0 +1,39 @@
+#!/usr/bin/env python3
+
+#******************************************************************************
+# test_linkref.py, unit tests for the internal link reference collection
+#
+# TreeLine, an information storage program
+# Copyright (C) 2015, Douglas W. Bell
+#
+# This is free software; you can redistribute it and/or modify it under the
+# terms of the GNU General Public License, either Version 2 or any later
+# version.  This program is distributed in the hope that it will be useful,
+# but WITTHOUT ANY WARRANTY.  See the included LICENSE file for details.
+#******************************************************************************
+
+import unittest
+import testsetup
+import linkref
+
+
+class LinkRefTest(unittest.TestCase):
+    """Tests for renaming link targets.
+    """
+    def testRenameTarget(self):
+        model = testsetup.FakeModel()
+        node = testsetup.FakeNode(modelRef=model,
+                                  Text='see <a href="#old">here</a>')
+        otherNode = testsetup.FakeNode(modelRef=model, Text='no links')
+        collection = linkref.LinkRefCollection()
+        collection.searchForLinks(node, 'Text')
+        collection.searchForLinks(otherNode, 'Text')
+        collection.renameTarget('old', 'new')
+        self.assertEqual(node.data['Text'], 'see <a href="#new">here</a>')
+        self.assertEqual(model.changedNodes, [node])
+        self.assertEqual(collection.linkCount(node, 'Text'), 1)
+        self.assertNotIn('old', collection.targetIdDict)
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,380 @@
+#!/usr/bin/env python3
+
+#******************************************************************************
+# test_matheval.py, unit tests for compiled math equations
+#
+# TreeLine, an information storage program
+# Copyright (C) 2015, Douglas W. Bell
+#
+# This is free software; you can redistribute it and/or modify it under the
+# terms of the GNU General Public License, either Version 2 or any later
+# version.  This program is distributed in the hope that it will be useful,
+# but WITTHOUT ANY WARRANTY.  See the included LICENSE file for details.
+#******************************************************************************
+
+import ast
+import math
+import decimal
+import unittest
+from unittest import mock
+import testsetup
+import matheval
+
+
+class CompiledEquationTest(unittest.TestCase):
+    """Tests for equations compiled into functions of the reference values.
+    """
+    def textValue(self, equation, *values):
+        """Return the result of the equation evaluated as substituted text.
+        """
+        return eval(equation.formattedEqnText.format(*[repr(value) for value
+                                                       in values]),
+                    matheval.safeGlobals)
+
+    def testPowerPrecedence(self):
+        for eqnText in ('{*A*}**2', '({*A*})**2', '( {*A*} ) ** 2',
+                        '2**{*A*}', '2**{*A*}**2', '-{*A*}**3',
+                        '({*A*})**{*B*}', '{*A*}**{*B*}', '{*B*}**{*A*}',
+                        'len("\u00e9") * {*A*}**2'):
+            equation = matheval.MathEquation(eqnText)
+            self.assertIsNotNone(equation.evalFunc, eqnText)
+            for values in ((-3, 2), (3, -2), (-2.5, 3)):
+                values = values[:len(equation.fieldRefs)]
+                self.assertEqual(equation.evalFunc(*values),
+                                 self.textValue(equation, *values),
+                                 (eqnText, values))
+        equation = matheval.MathEquation('{*A*}**2')
+        self.assertEqual(equation.evalFunc(-3), -9)
+        self.assertEqual(equation.decimalEvalFunc()(decimal.Decimal(-3)), -9)
+        equation = matheval.MathEquation('({*A*})**2')
+        self.assertEqual(equation.evalFunc(-3), 9)
+        self.assertEqual(equation.decimalEvalFunc()(decimal.Decimal(-3)), 9)
+
+    def testBuiltinsNameNotCompiled(self):
+        equation = matheval.MathEquation('{*A*} + __builtins__')
+        self.assertIsNone(equation.evalFunc)
+        equation = matheval.MathEquation('{*A*} + pi')
+        self.assertIsNotNone(equation.evalFunc)
+
+
+class ConstantFolderTest(unittest.TestCase):
+    """Tests for folding the constant parts of equations.
+    """
+    def folded(self, expr):
+        """Return the folded ast expression node for the expression text.
+        """
+        tree = matheval.ConstantFolder().visit(ast.parse(expr, mode='eval'))
+        return tree.body
+
+    def testFoldConstants(self):
+        node = self.folded('2 * pi + sqrt(16) - -1')
+        self.assertTrue(matheval.isNumberNode(node))
+        self.assertEqual(ast.literal_eval(node), 2 * math.pi + 5)
+        node = self.folded('x * (2 + 3)')
+        self.assertIsInstance(node, ast.BinOp)
+        self.assertEqual(ast.literal_eval(node.right), 5)
+
+    def testUnfoldedParts(self):
+        for expr in ('1 / 0', 'sqrt(-1)', 'x + 1', 'sqrt(x)',
+                     'upper("a")', 'max(1, x)'):
+            node = self.folded(expr)
+            self.assertFalse(matheval.isNumberNode(node), expr)
+        node = self.folded('1 / 0')
+        self.assertRaises(ZeroDivisionError, eval,
+                          compile(ast.Expression(body=node), '<test>',
+                                  'eval'))
+
+    def testCompiledResults(self):
+        equation = matheval.MathEquation('{*A*} * (1 + 2) + round(pi, 2)')
+        self.assertIsNotNone(equation.evalFunc)
+        self.assertEqual(equation.evalFunc(2), 6 + 3.14)
+
+
+class FakeFieldRef:
+    """Minimal field reference with fixed dependent equation nodes.
+    """
+    def __init__(self, eqnFieldName, dependentDict):
+        self.eqnFieldName = eqnFieldName
+        self.dependentDict = dependentDict
+
+    def dependentEqnNodes(self, refNode):
+        return self.dependentDict.get(refNode, [])
+
+
+class FakeFormats:
+    """Minimal tree formats with math reference and level dicts.
+    """
+    def __init__(self):
+        self.mathFieldRefDict = {}
+        self.mathLevelDict = {}
+
+
+class FakeRecalcNode:
+    """Minimal node that records its field recalculations.
+    """
+    def __init__(self, name, depth, recalcLog, changed=True):
+        self.formatName = 'ITEM'
+        self.name = name
+        self.nodeDepth = depth
+        self.recalcLog = recalcLog
+        self.changed = changed
+
+    def depth(self):
+        return self.nodeDepth
+
+    def recalcMathField(self, fieldName):
+        self.recalcLog.append((self.name, fieldName))
+        return self.changed
+
+
+class RecalcQueueTest(unittest.TestCase):
+    """Tests for the order and count of dependent field recalculations.
+    """
+    def setUp(self):
+        self.log = []
+        self.formats = FakeFormats()
+
+    def testSharedDependentOnce(self):
+        source = FakeRecalcNode('source', 0, self.log)
+        first = FakeRecalcNode('first', 1, self.log)
+        second = FakeRecalcNode('second', 1, self.log)
+        last = FakeRecalcNode('last', 0, self.log)
+        self.formats.mathFieldRefDict = {
+            'X': [FakeFieldRef('Y', {source: [first, second]})],
+            'Y': [FakeFieldRef('Z', {first: [last], second: [last]})]}
+        self.formats.mathLevelDict = {('ITEM', 'Y'): (0, matheval.optional),
+                                      ('ITEM', 'Z'): (1, matheval.optional)}
+        queue = matheval.RecalcQueue(self.formats)
+        queue.addDependents(source, 'X')
+        self.assertEqual(queue.recalculate(), {first, second, last})
+        self.assertEqual(self.log, [('first', 'Y'), ('second', 'Y'),
+                                    ('last', 'Z')])
+        self.assertEqual(queue.recalcCount, 3)
+
+    def testUnchangedStops(self):
+        source = FakeRecalcNode('source', 0, self.log)
+        middle = FakeRecalcNode('middle', 0, self.log, False)
+        last = FakeRecalcNode('last', 0, self.log)
+        self.formats.mathFieldRefDict = {
+            'X': [FakeFieldRef('Y', {source: [middle]})],
+            'Y': [FakeFieldRef('Z', {middle: [last]})]}
+        queue = matheval.RecalcQueue(self.formats)
+        queue.addDependents(source, 'X')
+        self.assertEqual(queue.recalculate(), set())
+        self.assertEqual(self.log, [('middle', 'Y')])
+
+    def testUpwardDeepestFirst(self):
+        leaf = FakeRecalcNode('leaf', 3, self.log)
+        nodes = [FakeRecalcNode('depth{0}'.format(depth), depth, self.log) for
+                 depth in range(3)]
+        self.formats.mathFieldRefDict = {
+            'X': [FakeFieldRef('S', {leaf: nodes})]}
+        self.formats.mathLevelDict = {('ITEM', 'S'): (0, matheval.upward)}
+        queue = matheval.RecalcQueue(self.formats)
+        queue.addDependents(leaf, 'X')
+        queue.recalculate()
+        self.assertEqual(self.log, [('depth2', 'S'), ('depth1', 'S'),
+                                    ('depth0', 'S')])
+
+
+class MathProfilerTest(unittest.TestCase):
+    """Tests for recording math evaluation costs.
+    """
+    def setUp(self):
+        self.log = []
+        self.formats = FakeFormats()
+        self.source = FakeRecalcNode('source', 0, self.log)
+        self.dependents = [FakeRecalcNode('dep{0}'.format(num), 0, self.log)
+                           for num in range(3)]
+        self.formats.mathFieldRefDict = {
+            'X': [FakeFieldRef('Y', {self.source: self.dependents})],
+            'Y': [FakeFieldRef('Z', {}), FakeFieldRef('W', {})]}
+
+    def testRecords(self):
+        profiler = matheval.MathProfiler()
+        self.assertEqual(profiler.records(self.formats), [])
+        profiler.addEvaluations('ITEM', 'Y', 10, 0.5)
+        profiler.addEvaluations('ITEM', 'Z', 2, 1.0)
+        profiler.addEvaluations('ITEM', 'Y', 1, 0.25)
+        profiler.addDependents('ITEM', 'X', 3)
+        self.assertEqual(profiler.records(self.formats),
+                         [('ITEM', 'Z', 2, 1.0, 0, 0),
+                          ('ITEM', 'Y', 11, 0.75, 2, 0),
+                          ('ITEM', 'X', 0, 0.0, 1, 3)])
+        profiler.clear()
+        self.assertEqual(profiler.records(self.formats), [])
+
+    def testRecalcOnOff(self):
+        profiler = matheval.MathProfiler()
+        for queueProfiler in (None, profiler):
+            queue = matheval.RecalcQueue(self.formats, queueProfiler)
+            queue.addDependents(self.source, 'X')
+            self.assertEqual(queue.recalculate(), set(self.dependents))
+        self.assertEqual(len(self.log), 6)
+        self.assertEqual(profiler.dependentCounts, {('ITEM', 'X'): 3})
+
+
+_childFormat = testsetup.FakeFormat('ITEM', [testsetup.FakeField('A')])
+
+def parentNode(texts):
+    """Return a parent node with children that have the given A field texts.
+    """
+    parent = testsetup.FakeNode(modelRef=testsetup.FakeModel())
+    parent.childList = [testsetup.FakeNode(nodeFormat=_childFormat, A=text)
+                        for text in texts]
+    return parent
+
+
+class ChildAggregateTest(unittest.TestCase):
+    """Tests for stored child values and their aggregates.
+    """
+    def setUp(self):
+        self.parent = parentNode(['3', '1', '4'])
+        self.aggregate = matheval.ChildAggregate('A', True)
+
+    def testReadOnlyValues(self):
+        values = self.aggregate.values(self.parent)
+        self.assertEqual(values, [3, 1, 4])
+        self.assertRaises(TypeError, values.append, 5)
+        self.assertRaises(TypeError, values.__setitem__, 0, 5)
+        self.assertRaises(TypeError, values.sort)
+        self.assertEqual(values + [5], [3, 1, 4, 5])
+        self.assertEqual(matheval.sum(values, 2), 10)
+
+    def testUpdateChild(self):
+        values = self.aggregate.values(self.parent)
+        self.assertEqual((matheval.sum(values), matheval.min(values),
+                          matheval.max(values)), (8, 1, 4))
+        child = self.parent.childList[1]
+        child.data['A'] = '6'
+        self.aggregate.updateChild(child)
+        self.assertIs(self.aggregate.values(self.parent), values)
+        self.assertEqual(values, [3, 6, 4])
+        self.assertEqual((matheval.sum(values), matheval.min(values),
+                          matheval.max(values), matheval.mean(values)),
+                         (13, 3, 6, 13 / 3))
+
+    def testFloatSumDelta(self):
+        parent = parentNode(['0.5', '1.25', '2'])
+        values = self.aggregate.values(parent)
+        self.assertEqual(matheval.sum(values), 3.75)
+        checkedChildren = []
+        childValue = self.aggregate.childValue
+        def countedChildValue(child):
+            checkedChildren.append(child)
+            return childValue(child)
+        self.aggregate.childValue = countedChildValue
+        child = parent.childList[1]
+        child.data['A'] = '3.5'
+        with mock.patch('builtins.sum') as rescan:
+            self.aggregate.updateChild(child)
+            self.assertEqual(matheval.sum(values), 6.0)
+            self.assertEqual(matheval.mean(values), 2.0)
+            self.assertFalse(rescan.called)
+        self.assertEqual(checkedChildren, [child])
+
+    def testSumResync(self):
+        parent = parentNode(['0.1', '0.2', '0.3'])
+        values = self.aggregate.values(parent)
+        matheval.sum(values)
+        child = parent.childList[0]
+        for i in range(1, matheval._sumResyncCount + 1):
+            child.data['A'] = '0.{0}'.format(i % 9 + 1)
+            self.aggregate.updateChild(child)
+        self.assertEqual(matheval.sum(values), sum(values))
+
+    def testBlankAndRebuild(self):
+        aggregate = matheval.ChildAggregate('A', False)
+        self.parent.childList[2].data['A'] = ''
+        self.assertIsNone(aggregate.values(self.parent))
+        self.parent.childList.pop()
+        self.parent.modelRef.aggregateStamp += 1
+        self.assertEqual(aggregate.values(self.parent), [3, 1])
+
+
+class FakeValueRef:
+    """Minimal equation reference with a fixed value.
+    """
+    def __init__(self, value):
+        self.value = value
+        self.tagPrefix = ''
+        self.fieldName = 'A'
+
+    def referenceValue(self, eqnNode, zeroBlanks=True):
+        return self.value
+
+    def sourceNode(self, eqnNode):
+        return eqnNode
+
+
+def eqnNode(decimalDigits):
+    """Return an equation node with a model ref holding the math settings.
+    """
+    node = testsetup.FakeNode(modelRef=testsetup.FakeModel())
+    node.modelRef.mathDecimalDigits = decimalDigits
+    return node
+
+
+class DecimalEquationTest(unittest.TestCase):
+    """Tests for evaluating equations with decimal arithmetic.
+    """
+    def equation(self, eqnText, *values):
+        """Return an equation with fixed reference values.
+        """
+        equation = matheval.MathEquation(eqnText)
+        equation.fieldRefs = [FakeValueRef(value) for value in values]
+        return equation
+
+    def testDecimalResults(self):
+        node = eqnNode(28)
+        equation = self.equation('{*A*} + 0.2', decimal.Decimal('0.1'))
+        result = equation.equationValue(node)
+        self.assertIsInstance(result, decimal.Decimal)
+        self.assertEqual(result, decimal.Decimal('0.3'))
+        self.assertEqual(equation.equationValues([node, node]),
+                         [decimal.Decimal('0.3')] * 2)
+        equation = self.equation('{*A*} / 3', decimal.Decimal(1))
+        self.assertEqual(len(str(equation.equationValue(node))), 30)
+        self.assertNotEqual(equation.equationValue(eqnNode(0)), 0.3)
+
+    def testDecimalErrors(self):
+        node = eqnNode(28)
+        for eqnText in ('{*A*} / 0', '{*A*} % 0', 'sqrt({*A*} - 2)'):
+            equation = self.equation(eqnText, decimal.Decimal(1))
+            self.assertRaises(ValueError, equation.equationValue, node)
+            self.assertIsInstance(equation.equationValues([node])[0],
+                                  ValueError)
+
+    def testNegativeOperands(self):
+        node = eqnNode(28)
+        for eqnText, result in (('{*A*} // 2', -4), ('{*A*} % 4', 1),
+                                ('{*A*} % -4', -3), ('-{*A*} // -2', -4),
+                                ('{*A*} // -2', 3), ('{*A*} % 7', 0),
+                                ('{*A*} // 2.5', -3), ('{*A*} % 2.5', 0.5)):
+            for value in (-7, decimal.Decimal(-7)):
+                equation = self.equation(eqnText, value)
+                self.assertEqual(equation.equationValue(node), result)
+            equation = self.equation(eqnText, -7.0)
+            self.assertEqual(equation.equationValue(eqnNode(0)), result)
+
+    def testOverflow(self):
+        equation = self.equation('{*A*} ** 1000', 10.0)
+        self.assertRaises(ValueError, equation.equationValue, eqnNode(0))
+        self.assertIsInstance(equation.equationValues([eqnNode(0)])[0],
+                              ValueError)
+
+    def testTextFallback(self):
+        node = eqnNode(28)
+        aggregate = matheval.ChildAggregate('A', True)
+        values = matheval.ChildValueList(aggregate, [decimal.Decimal('1.5'),
+                                                     decimal.Decimal(2)])
+        equation = self.equation('sum({*&A*})', values)
+        equation.evalFunc = None
+        self.assertEqual(equation.equationValue(node), 3.5)
+        equation = self.equation('{*A*} + undefinedName', decimal.Decimal(1))
+        self.assertIsNone(equation.evalFunc)
+        self.assertRaises(ValueError, equation.equationValue, node)
+
+
+if __name__ == '__main__':
+    unittest.main()
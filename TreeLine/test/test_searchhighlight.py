@@ -0,0 +1,82 @@
+#!/usr/bin/env python3
+
+#******************************************************************************
+# test_searchhighlight.py, unit tests for the search highlight spans
+#
+# TreeLine, an information storage program
+# Copyright (C) 2015, Douglas W. Bell
+#
+# This is free software; you can redistribute it and/or modify it under the
+# terms of the GNU General Public License, either Version 2 or any later
+# version.  This program is distributed in the hope that it will be useful,
+# but WITTHOUT ANY WARRANTY.  See the included LICENSE file for details.
+#******************************************************************************
+
+import re
+import unittest
+import testsetup
+import searchhighlight
+
+
+class HighlightSpecTest(unittest.TestCase):
+    """Tests for finding the text spans to highlight.
+    """
+    def testEmpty(self):
+        spec = searchhighlight.HighlightSpec()
+        self.assertFalse(spec)
+        self.assertEqual(spec.spans('any text'), [])
+        self.assertFalse(searchhighlight.HighlightSpec([''], []))
+
+    def testWords(self):
+        spec = searchhighlight.HighlightSpec(['Cat', 'dog'])
+        self.assertTrue(spec)
+        self.assertEqual(spec.spans('a CAT and a dog, cat'),
+                         [(2, 5), (12, 15), (17, 20)])
+
+    def testOverlappingWords(self):
+        spec = searchhighlight.HighlightSpec(['abc', 'cde', 'b'])
+        self.assertEqual(spec.spans('xabcdex'), [(1, 6)])
+        spec = searchhighlight.HighlightSpec(['aa'])
+        self.assertEqual(spec.spans('aaa'), [(0, 3)])
+
+    def testPrefixWords(self):
+        spec = searchhighlight.HighlightSpec(['ca', 'cat', 'catalog', 'a.'])
+        self.assertEqual(spec.spans('catalog cat. ca ax a.'),
+                         [(0, 7), (8, 11), (13, 15), (19, 21)])
+        self.assertEqual(searchhighlight.wordPattern(['cat', 'car', 'ca']),
+                         'ca(?:r|t)?')
+
+    def testManyWords(self):
+        words = ['{0}{1}'.format(chr(ord('a') + num % 7), num) for num in
+                 range(300)]
+        text = ' '.join(words[::3]) + ' G29 b2x a1'
+        mergedList = []
+        for start in range(len(text)):
+            ends = [start + len(word) for word in words if
+                    text.lower().startswith(word, start)]
+            if not ends:
+                continue
+            if mergedList and start <= mergedList[-1][1]:
+                end = max(mergedList[-1][1], max(ends))
+                mergedList[-1] = (mergedList[-1][0], end)
+            else:
+                mergedList.append((start, max(ends)))
+        spec = searchhighlight.HighlightSpec(words)
+        self.assertEqual(spec.spans(text), mergedList)
+
+    def testRegExps(self):
+        spec = searchhighlight.HighlightSpec(regExpList=[re.compile(r'\d+'),
+                                                         re.compile(r'x*')])
+        self.assertEqual(spec.spans('a12b3'), [(1, 3), (4, 5)])
+
+    def testMultiLineRegExp(self):
+        spec = searchhighlight.HighlightSpec(regExpList=[re.compile(r'b\nc')])
+        self.assertEqual(spec.spans('ab\ncd'), [(1, 4)])
+
+    def testMixedTerms(self):
+        spec = searchhighlight.HighlightSpec(['bc'], [re.compile(r'c.e')])
+        self.assertEqual(spec.spans('abcdefg bc'), [(1, 5), (8, 10)])
+
+
+if __name__ == '__main__':
+    unittest.main()
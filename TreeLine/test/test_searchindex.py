@@ -0,0 +1,80 @@
+#!/usr/bin/env python3
+
+#******************************************************************************
+# test_searchindex.py, unit tests for the word search index
+#
+# TreeLine, an information storage program
+# Copyright (C) 2015, Douglas W. Bell
+#
+# This is free software; you can redistribute it and/or modify it under the
+# terms of the GNU General Public License, either Version 2 or any later
+# version.  This program is distributed in the hope that it will be useful,
+# but WITTHOUT ANY WARRANTY.  See the included LICENSE file for details.
+#******************************************************************************
+
+import unittest
+import testsetup
+import searchindex
+
+
+class SearchIndexTest(unittest.TestCase):
+    """Tests for word candidates and approximate matches.
+    """
+    def setUp(self):
+        FakeNode = testsetup.FakeNode
+        self.nodes = [FakeNode('root', Name='Root'),
+                      FakeNode('a', Name='Apple pie',
+                               Notes='baked fruit dessert'),
+                      FakeNode('b', Name='Banana bread',
+                               Notes='baked with apple'),
+                      FakeNode('c', Name='Cherry', Notes='fresh fruit')]
+        self.model = testsetup.FakeModel(self.nodes)
+        self.index = searchindex.SearchIndex(self.model)
+
+    def testWordCandidates(self):
+        root, apple, banana, cherry = self.nodes
+        self.assertEqual(self.index.wordCandidates(['apple']),
+                         {apple, banana})
+        self.assertEqual(self.index.wordCandidates(['apple'], True), {apple})
+        self.assertEqual(self.index.wordCandidates(['fruit', 'baked']),
+                         {apple})
+        self.assertEqual(self.index.wordCandidates(['ruit']), {apple, cherry})
+        self.assertEqual(self.index.wordCandidates(['ruit'], fullWords=True),
+                         set())
+        self.assertEqual(self.index.wordCandidates(['apple pie'], True,
+                                                   True), {apple})
+
+    def testUpdateNode(self):
+        root, apple, banana, cherry = self.nodes
+        self.index.wordCandidates(['apple'])
+        banana.data['Notes'] = 'plain'
+        self.index.updateNode(banana)
+        self.assertEqual(self.index.wordCandidates(['apple']), {apple})
+        self.assertEqual(self.index.wordCandidates(['plain']), {banana})
+
+    def testMarkAllChanged(self):
+        root, apple, banana, cherry = self.nodes
+        self.index.wordCandidates(['cherry'])
+        cherry.data['Name'] = 'Grape'
+        self.index.markAllChanged()
+        self.assertEqual(self.index.wordCandidates(['cherry']), set())
+        self.assertEqual(self.index.wordCandidates(['grape']), {cherry})
+
+    def testStructureChange(self):
+        root, apple, banana, cherry = self.nodes
+        self.index.wordCandidates(['apple'])
+        self.model.nodes.remove(banana)
+        self.model.treePosDict = None
+        self.assertEqual(self.index.wordCandidates(['apple']), {apple})
+        self.assertNotIn(banana, self.index.nodeTokenDict)
+
+    def testApproximateMatches(self):
+        root, apple, banana, cherry = self.nodes
+        self.assertEqual(self.index.approximateMatches('aple pei')[0], apple)
+        self.assertEqual(self.index.approximateMatches('cherri', True),
+                         [cherry])
+        self.assertEqual(self.index.approximateMatches('!!'), [])
+
+
+if __name__ == '__main__':
+    unittest.main()
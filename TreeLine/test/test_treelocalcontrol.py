@@ -0,0 +1,209 @@
+#!/usr/bin/env python3
+
+#******************************************************************************
+# test_treelocalcontrol.py, unit tests for local control find and math updates
+#
+# TreeLine, an information storage program
+# Copyright (C) 2015, Douglas W. Bell
+#
+# This is free software; you can redistribute it and/or modify it under the
+# terms of the GNU General Public License, either Version 2 or any later
+# version.  This program is distributed in the hope that it will be useful,
+# but WITTHOUT ANY WARRANTY.  See the included LICENSE file for details.
+#******************************************************************************
+
+import types
+import unittest
+from unittest import mock
+import testsetup
+
+
+def findControl():
+    """Return an object using the local control's find methods.
+
+    Has a fake timer and model, so the find can be stepped directly.
+    """
+    import treelocalcontrol
+    control = types.SimpleNamespace(findGen=None, findResultFunc=None,
+                                    findStartTime=0, findNodeCount=0,
+                                    findTimer=mock.Mock())
+    control.model = testsetup.FakeModel()
+    control.model.nodeIdDict = dict.fromkeys(range(10))
+    for name in ('runFind', 'findNextBatch', 'continueFind', 'endFind',
+                 'cancelFind'):
+        method = getattr(treelocalcontrol.TreeLocalControl, name)
+        setattr(control, name, types.MethodType(method, control))
+    return control
+
+
+@unittest.skipUnless(testsetup.qtAvailable, 'requires PyQt4')
+class TimeSlicedFindTest(unittest.TestCase):
+    """Tests for continuing, cancelling and timing out find operations.
+    """
+    def setUp(self):
+        import globalref
+        import treelocalcontrol
+        testsetup.initOptions()
+        self.globalref = globalref
+        self.statusBar = mock.Mock()
+        mainControl = mock.Mock()
+        mainControl.currentStatusBar.return_value = self.statusBar
+        # each slice checks a single node
+        patches = [mock.patch.object(globalref, 'mainControl', mainControl),
+                   mock.patch.object(treelocalcontrol, '_findBatchTime', -1)]
+        for patch in patches:
+            patch.start()
+            self.addCleanup(patch.stop)
+        self.control = findControl()
+        self.results = []
+        self.checked = []
+
+    def findGen(self, results):
+        """Return a find generator yielding the given node results.
+        """
+        for result in results:
+            self.checked.append(result)
+            yield result
+
+    def testFirstSlice(self):
+        self.assertTrue(self.control.runFind(self.findGen([True]),
+                                             self.results.append))
+        self.assertIsNone(self.control.findGen)
+        self.assertEqual(self.results, [])
+
+    def testContinuedFind(self):
+        control = self.control
+        self.assertIsNone(control.runFind(self.findGen([False, False, True]),
+                                          self.results.append))
+        self.assertTrue(control.findTimer.start.called)
+        control.continueFind()
+        self.assertEqual(self.results, [])
+        control.continueFind()
+        self.assertEqual(self.results, [True])
+        self.assertIsNone(control.findGen)
+        self.assertEqual(len(self.checked), 3)
+
+    def testNotFound(self):
+        control = self.control
+        self.assertIsNone(control.runFind(self.findGen([False, False]),
+                                          self.results.append))
+        control.continueFind()
+        control.continueFind()
+        self.assertEqual(self.results, [False])
+        self.assertTrue(self.statusBar.clearMessage.called)
+
+    def testCancel(self):
+        control = self.control
+        self.assertIsNone(control.runFind(self.findGen([False] * 5 + [True]),
+                                          self.results.append))
+        self.assertTrue(control.cancelFind())
+        self.assertFalse(control.cancelFind())
+        self.assertTrue(control.findTimer.stop.called)
+        self.statusBar.showMessage.assert_called_with('Find cancelled')
+        control.continueFind()
+        self.assertEqual(self.results, [])
+        self.assertEqual(len(self.checked), 1)
+
+    def testNewFindCancelsOld(self):
+        control = self.control
+        control.runFind(self.findGen([False, True]), self.results.append)
+        self.assertTrue(control.runFind(self.findGen([True]),
+                                        self.results.append))
+        self.assertEqual(self.results, [])
+        self.assertEqual(self.checked, [False, True])
+
+    def testTimeout(self):
+        control = self.control
+        self.globalref.genOptions.changeValue('FindTimeout', 5)
+        self.addCleanup(self.globalref.genOptions.changeValue,
+                        'FindTimeout', 0)
+        self.assertIsNone(control.runFind(self.findGen([False] * 5 + [True]),
+                                          self.results.append))
+        control.continueFind()
+        self.assertEqual(self.results, [])
+        control.findStartTime -= 10
+        control.continueFind()
+        self.assertEqual(self.results, [False])
+        self.assertIsNone(control.findGen)
+        self.statusBar.showMessage.assert_called_with('Find stopped after '
+                                                      '5 seconds')
+        self.assertEqual(len(self.checked), 3)
+
+
+_mathTreeText = """<?xml version="1.0" encoding="utf-8" ?>
+<ITEM item="y" tlversion="2.0.2" uniqueid="root" line0="{*Name*}">
+<Name type="Text">Root</Name>
+<Amount type="Number" format="#.##">1</Amount>
+<Total type="Math" eqn="{*Amount*} + sum({*&amp;Total*})" format="#.####"/>
+<Share type="Math" eqn="{*Total*} / {*$Total*}" format="#.####"/>
+<Level type="Math" eqn="{**Level*} + 1" format="#"/>
+<Count type="Math" eqn="{*#Name*} * {*Level*}" format="#"/>
+<ITEM item="y" uniqueid="a"><Name>A</Name><Amount>2.5</Amount>
+<ITEM item="y" uniqueid="a1"><Name>A1</Name><Amount>0.1</Amount></ITEM>
+<ITEM item="y" uniqueid="a2"><Name>A2</Name><Amount>0.2</Amount>
+<ITEM item="y" uniqueid="a21"><Name>A21</Name><Amount>7</Amount></ITEM>
+</ITEM>
+</ITEM>
+<ITEM item="y" uniqueid="b"><Name>B</Name><Amount>3</Amount></ITEM>
+</ITEM>
+"""
+
+
+@unittest.skipUnless(testsetup.qtAvailable, 'requires PyQt4')
+class UpdateAllMathTest(unittest.TestCase):
+    """Tests comparing batched full math updates with per-node updates.
+    """
+    def mathData(self, decimalDigits, batched, profiler=None):
+        """Return the math field data of all nodes after a full update.
+
+        Per-node updates recalculate every field until nothing changes.
+        Arguments:
+            decimalDigits -- the model's decimal math setting
+            batched -- use the local control's batched update if True
+            profiler -- a MathProfiler to set in the model if given
+        """
+        import treelocalcontrol
+        model, rootAttr = testsetup.loadModel(_mathTreeText)
+        model.mathDecimalDigits = decimalDigits
+        model.mathProfiler = profiler
+        nodes = list(model.root.descendantGen())
+        if batched:
+            control = types.SimpleNamespace(model=model)
+            changedNodes = (treelocalcontrol.TreeLocalControl.
+                            updateAllMathFields(control))
+            self.assertEqual(changedNodes, set(nodes))
+        else:
+            fieldNames = ['Total', 'Share', 'Level', 'Count']
+            for i in range(10):
+                if not any([node.recalcMathField(name) for node in nodes
+                            for name in fieldNames]):
+                    break
+        self.formats = model.formats
+        return {node.uniqueId: node.data for node in nodes}
+
+    def testSameResults(self):
+        for decimalDigits in (0, 20):
+            perNodeData = self.mathData(decimalDigits, False)
+            self.assertEqual(self.mathData(decimalDigits, True), perNodeData)
+        self.assertEqual(perNodeData['root']['Total'], '13.8')
+        self.assertEqual(perNodeData['a2']['Count'], '3')
+
+    def testProfilerOnOff(self):
+        import matheval
+        profiler = matheval.MathProfiler()
+        self.assertEqual(self.mathData(0, True, profiler),
+                         self.mathData(0, True))
+        records = {(typeName, fieldName): evalCount for
+                   (typeName, fieldName, evalCount, seconds, refCount,
+                    dependentCount) in profiler.records(self.formats)}
+        self.assertEqual(records, {('ITEM', name): 6 for name in
+                                   ('Total', 'Share', 'Level', 'Count')})
+        profiler.clear()
+        perNodeData = self.mathData(0, False, profiler)
+        self.assertEqual(perNodeData, self.mathData(0, False))
+        self.assertTrue(all(count >= 6 for count in
+                            profiler.evalCounts.values()))
+
+
+if __name__ == '__main__':
+    unittest.main()
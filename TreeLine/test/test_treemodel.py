@@ -0,0 +1,281 @@
+#!/usr/bin/env python3
+
+#******************************************************************************
+# test_treemodel.py, unit tests for the tree model's position index
+#
+# TreeLine, an information storage program
+# Copyright (C) 2015, Douglas W. Bell
+#
+# This is free software; you can redistribute it and/or modify it under the
+# terms of the GNU General Public License, either Version 2 or any later
+# version.  This program is distributed in the hope that it will be useful,
+# but WITTHOUT ANY WARRANTY.  See the included LICENSE file for details.
+#******************************************************************************
+
+import unittest
+import testsetup
+
+_treeText = """<?xml version="1.0" encoding="utf-8" ?>
+<ROOT item="y" tlversion="2.0.2" uniqueid="root" line0="{*Name*}">
+<Name type="Text">Root</Name>
+<ITEM item="y" uniqueid="a" line0="{*Name*}"><Name type="Text">A</Name>
+<ITEM item="y" uniqueid="a1"><Name>A1</Name></ITEM>
+<ITEM item="y" uniqueid="a2"><Name>A2</Name>
+<ITEM item="y" uniqueid="a21"><Name>A21</Name></ITEM>
+</ITEM>
+</ITEM>
+<ITEM item="y" uniqueid="b"><Name>B</Name>
+<ITEM item="y" uniqueid="b1"><Name>B1</Name></ITEM>
+</ITEM>
+</ROOT>
+"""
+
+
+def ancestorNodes(node):
+    """Return a list of the parent, grandparent, etc. of a node.
+    """
+    ancestors = []
+    while node.parent:
+        node = node.parent
+        ancestors.append(node)
+    return ancestors
+
+
+@unittest.skipUnless(testsetup.qtAvailable, 'requires PyQt4')
+class TreePositionTest(unittest.TestCase):
+    """Tests for the tree position index and branch filtering.
+    """
+    def setUp(self):
+        self.model, rootAttr = testsetup.loadModel(_treeText)
+        self.nodes = self.model.nodeIdDict
+
+    def testPositionOrder(self):
+        names = ['root', 'a', 'a1', 'a2', 'a21', 'b', 'b1']
+        positions = [self.model.treePosition(self.nodes[name]) for name in
+                     names]
+        self.assertEqual(positions, sorted(positions))
+        self.assertEqual(self.model.treeRange(self.nodes['a']),
+                         (1, positions[4]))
+
+    def testUniqueBranches(self):
+        nodes = [self.nodes[name] for name in ('b1', 'a21', 'a', 'b')]
+        for indexed in (False, True):
+            self.model.structureChanged()
+            if indexed:
+                self.model.treePosition(self.model.root)
+            self.assertEqual(self.model.uniqueBranches(nodes),
+                             [self.nodes['a'], self.nodes['b']])
+
+    def testNestedSelections(self):
+        names = ['b1', 'a21', 'root', 'a2', 'a', 'b', 'a1']
+        allNodes = [self.nodes[name] for name in names]
+        for mask in range(1, 1 << len(allNodes)):
+            nodes = [node for bit, node in enumerate(allNodes) if
+                     mask & (1 << bit)]
+            expected = [node for node in nodes if not
+                        any(ancestor in nodes for ancestor in
+                            ancestorNodes(node))]
+            self.model.structureChanged()
+            self.assertEqual(self.model.uniqueBranches(nodes), expected)
+            self.model.treePosition(self.model.root)
+            self.assertEqual(self.model.uniqueBranches(nodes), expected)
+        nodes = [self.nodes[name] for name in ('a21', 'a2', 'a21', 'b1')]
+        self.assertEqual(self.model.uniqueBranches(nodes),
+                         [self.nodes['a2'], self.nodes['b1']])
+
+    def testDeletedNodeKept(self):
+        deleted = self.nodes['b1']
+        deleted.parent.childList.remove(deleted)
+        self.model.structureChanged()
+        self.model.treePosition(self.model.root)
+        nodes = [deleted, self.nodes['a2'], self.nodes['a21']]
+        self.assertEqual(self.model.uniqueBranches(nodes),
+                         [deleted, self.nodes['a2']])
+
+    def testNodeMethodMove(self):
+        self.model.treePosition(self.model.root)
+        self.model.root.sortChildrenByTitle(False, False)
+        self.assertLess(self.model.treePosition(self.nodes['b1']),
+                        self.model.treePosition(self.nodes['a21']))
+        self.assertEqual(self.model.sortedNodes([self.nodes['a1'],
+                                                 self.nodes['b']]),
+                         [self.nodes['b'], self.nodes['a1']])
+
+
+def wideTreeText(numChildren):
+    """Return TreeLine XML text with the given number of root children.
+    """
+    items = ['<ITEM item="y" uniqueid="n{0}"><Name>N{0}</Name></ITEM>'.
+             format(num) for num in range(numChildren)]
+    return ('<?xml version="1.0" encoding="utf-8" ?>\n'
+            '<ROOT item="y" tlversion="2.0.2" uniqueid="root" '
+            'line0="{{*Name*}}"><Name type="Text">Root</Name>\n'
+            '<ITEM item="y" uniqueid="first" line0="{{*Name*}}">'
+            '<Name type="Text">First</Name></ITEM>\n{0}\n</ROOT>\n'.
+            format('\n'.join(items)))
+
+
+@unittest.skipUnless(testsetup.qtAvailable, 'requires PyQt4')
+class WideTreeRowTest(unittest.TestCase):
+    """Tests for child row lookups in a tree with many siblings.
+    """
+    def setUp(self):
+        from PyQt4 import QtCore
+        self.model, rootAttr = testsetup.loadModel(wideTreeText(500))
+        self.root = self.model.root
+        self.rootIndex = self.model.index(0, 0, QtCore.QModelIndex())
+
+    def testIndexRows(self):
+        for row in (0, 1, 250, 500):
+            index = self.model.index(row, 0, self.rootIndex)
+            node = index.internalPointer()
+            self.assertIs(node, self.root.childList[row])
+            self.assertEqual(node.row(), row)
+            self.assertEqual(self.model.parent(index), self.rootIndex)
+
+    def testRowsAfterMove(self):
+        children = self.root.childList
+        self.assertEqual(children[-1].row(), 500)
+        children.insert(0, children.pop())
+        self.assertEqual(children[0].row(), 0)
+        # one lookup renumbers all of the siblings
+        self.assertEqual([child.rowCache for child in children],
+                         list(range(501)))
+        self.assertEqual([child.row() for child in children[::50]],
+                         list(range(0, 501, 50)))
+
+    def testRemovedChild(self):
+        children = self.root.childList
+        removed = children.pop(100)
+        self.assertRaises(ValueError, removed.row)
+        self.assertEqual(children[100].row(), 100)
+        self.assertEqual(children[-1].row(), 499)
+
+
+_titleRefText = """<?xml version="1.0" encoding="utf-8" ?>
+<ROOT item="y" tlversion="2.0.2" uniqueid="root" line0="{*Name*}">
+<Name type="Text">Root</Name>
+<PARENT item="y" uniqueid="p" line0="{*Name*} {*&amp;Name*}">
+<Name type="Text">P</Name>
+<CHILD item="y" uniqueid="c" line0="{*Name*} {**Name*}">
+<Name type="Text">C</Name>
+<CHILD item="y" uniqueid="g"><Name>G</Name></CHILD>
+</CHILD>
+</PARENT>
+</ROOT>
+"""
+
+
+@unittest.skipUnless(testsetup.qtAvailable, 'requires PyQt4')
+class TitleRefTest(unittest.TestCase):
+    """Tests for updating titles that use data from related nodes.
+    """
+    def setUp(self):
+        self.model, rootAttr = testsetup.loadModel(_titleRefText)
+        self.nodes = self.model.nodeIdDict
+
+    def testExternalTitleTypes(self):
+        self.assertEqual(self.model.externalTitleTypes(),
+                         {'PARENT': (0, True), 'CHILD': (1, False)})
+        self.assertIs(self.model.externalTitleTypes(),
+                      self.model.externalTitleTypes())
+
+    def testRelatedTitlesUpdated(self):
+        for node in self.nodes.values():
+            node.title()
+        stamp = self.model.cacheStamp
+        child = self.nodes['c']
+        child.data['Name'] = 'X'
+        self.model.nodeDataChanged(child)
+        self.assertEqual(self.model.cacheStamp, stamp)
+        self.assertEqual(self.nodes['p'].title(), 'P X')
+        self.assertEqual(self.nodes['g'].title(), 'G X')
+        self.assertIsNotNone(self.model.root.titleCache)
+
+    def testParentEditScope(self):
+        for node in self.nodes.values():
+            node.title()
+        grandchildCache = self.nodes['g'].titleCache
+        parent = self.nodes['p']
+        parent.data['Name'] = 'X'
+        self.model.nodeDataChanged(parent)
+        self.assertEqual(parent.title(), 'X C')
+        self.assertEqual(self.nodes['c'].title(), 'C X')
+        # the grandchild title only uses its own parent's data
+        self.assertIs(self.nodes['g'].titleCache, grandchildCache)
+        self.assertEqual(self.nodes['g'].title(), 'G C')
+
+    def testStructureChange(self):
+        grandchild = self.nodes['g']
+        self.assertEqual(grandchild.title(), 'G C')
+        grandchild.parent.childList.remove(grandchild)
+        self.nodes['p'].childList.append(grandchild)
+        grandchild.parent = self.nodes['p']
+        self.model.structureChanged()
+        self.assertEqual(grandchild.title(), 'G P')
+
+    def testCachedTitle(self):
+        child = self.nodes['c']
+        self.assertEqual(child.title(), 'C P')
+        cache = child.titleCache
+        self.assertEqual(child.title(), 'C P')
+        self.assertIs(child.titleCache, cache)
+        self.model.clearNodeCaches()
+        self.assertEqual(child.title(), 'C P')
+        self.assertIsNot(child.titleCache, cache)
+
+
+@unittest.skipUnless(testsetup.qtAvailable, 'requires PyQt4')
+class TitleCacheTest(unittest.TestCase):
+    """Tests for cached titles without references to other nodes.
+    """
+    def testOnlyEditedNodeCleared(self):
+        model, rootAttr = testsetup.loadModel(_treeText)
+        nodes = model.nodeIdDict
+        for node in nodes.values():
+            node.title()
+        stamp = model.cacheStamp
+        sibling = nodes['a2']
+        siblingCache = sibling.titleCache
+        nodes['a1'].data['Name'] = 'New'
+        model.nodeDataChanged(nodes['a1'])
+        self.assertEqual(model.cacheStamp, stamp)
+        self.assertEqual(nodes['a1'].title(), 'New')
+        self.assertIs(sibling.titleCache, siblingCache)
+        self.assertIsNotNone(nodes['a'].titleCache)
+
+
+_mathSettingText = """<?xml version="1.0" encoding="utf-8" ?>
+<ROOT item="y" tlversion="2.0.2" uniqueid="root" line0="{*Name*}"
+zeroblanks="n" mathdigits="20">
+<Name type="Text">Root</Name>
+</ROOT>
+"""
+
+
+@unittest.skipUnless(testsetup.qtAvailable, 'requires PyQt4')
+class MathSettingTest(unittest.TestCase):
+    """Tests for storing the file's math settings.
+    """
+    def testRoundTrip(self):
+        model, rootAttr = testsetup.loadModel(_mathSettingText)
+        self.assertEqual(model.mathXmlAttr(), {})
+        model.restoreMathXmlAttrs(rootAttr)
+        self.assertFalse(model.mathZeroBlanks)
+        self.assertEqual(model.mathDecimalDigits, 20)
+        attrs = model.mathXmlAttr()
+        self.assertEqual(attrs, {'zeroblanks': 'n', 'mathdigits': '20'})
+        model.restoreMathXmlAttrs({})
+        self.assertEqual(model.mathXmlAttr(), {})
+        model.restoreMathXmlAttrs(attrs)
+        self.assertEqual(model.mathXmlAttr(), attrs)
+
+    def testInvalidDigits(self):
+        model, rootAttr = testsetup.loadModel(_mathSettingText)
+        for text in ('x', '-5'):
+            model.restoreMathXmlAttrs({'mathdigits': text})
+            self.assertEqual(model.mathDecimalDigits, 0)
+
+
+if __name__ == '__main__':
+    unittest.main()
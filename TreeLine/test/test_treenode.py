@@ -0,0 +1,139 @@
+#!/usr/bin/env python3
+
+#******************************************************************************
+# test_treenode.py, unit tests for the tree node class
+#
+# TreeLine, an information storage program
+# Copyright (C) 2015, Douglas W. Bell
+#
+# This is free software; you can redistribute it and/or modify it under the
+# terms of the GNU General Public License, either Version 2 or any later
+# version.  This program is distributed in the hope that it will be useful,
+# but WITTHOUT ANY WARRANTY.  See the included LICENSE file for details.
+#******************************************************************************
+
+import copy
+import re
+import unittest
+import testsetup
+
+_treeText = """<?xml version="1.0" encoding="utf-8" ?>
+<ROOT item="y" tlversion="2.0.2" uniqueid="root" line0="{*Name*}">
+<Name type="Text">Root</Name>
+<ITEM item="y" uniqueid="alpha" line0="{*Name*}">
+<Name type="Text">Alpha</Name>
+<Amount type="Number" format="#.##">3</Amount>
+</ITEM>
+<ITEM item="y" uniqueid="beta">
+<Name>Beta</Name>
+<Amount>4.5</Amount>
+</ITEM>
+</ROOT>
+"""
+
+
+@unittest.skipUnless(testsetup.qtAvailable, 'requires PyQt4')
+class TreeNodeCopyTest(unittest.TestCase):
+    """Tests for shallow copies of tree nodes.
+    """
+    def setUp(self):
+        self.model, rootAttr = testsetup.loadModel(_treeText)
+        self.node = self.model.root.childList[0]
+
+    def testCopySharesData(self):
+        nodeCopy = copy.copy(self.node)
+        self.assertIs(nodeCopy.data, self.node.data)
+        self.assertIs(nodeCopy.childList, self.node.childList)
+        self.assertIs(nodeCopy.parent, self.node.parent)
+        self.assertEqual(nodeCopy.title(), 'Alpha')
+
+    def testCopyResetsCaches(self):
+        self.node.title()
+        self.node.searchStrings()
+        field = self.node.nodeFormat().fieldDict['Amount']
+        self.assertEqual(field.mathValue(self.node), 3.0)
+        nodeCopy = copy.copy(self.node)
+        self.assertIsNone(nodeCopy.titleCache)
+        self.assertIsNone(nodeCopy.searchTextCache)
+        self.assertIsNone(nodeCopy.valueCache)
+        field.mathValue(nodeCopy)
+        self.assertIsNot(nodeCopy.valueCache, self.node.valueCache)
+
+
+@unittest.skipUnless(testsetup.qtAvailable, 'requires PyQt4')
+class ReplaceTest(unittest.TestCase):
+    """Tests for replacing found text in node fields.
+    """
+    def setUp(self):
+        self.model, rootAttr = testsetup.loadModel(_treeText)
+        self.node = self.model.root.childList[0]
+
+    def testExpandBackrefs(self):
+        import treenode
+        match = re.search(r'(\w+)-(\w+)', 'ab-cd')
+        self.assertEqual(treenode.expandBackrefs(r'\2:\g<1>', match),
+                         'cd:ab')
+        self.assertEqual(treenode.expandBackrefs(r'\g<0>!', match), 'ab-cd!')
+
+    def testReplacedText(self):
+        import treenode
+        self.assertEqual(treenode.replacedText('Aa-aA', 'aa', 'x'),
+                         ('x-x', 2))
+        self.assertEqual(treenode.replacedText('abc', 'z', 'x'), ('abc', 0))
+
+    def testReplacedFieldTexts(self):
+        count, fieldTexts = self.node.replacedFieldTexts('alpha',
+                                                         replaceText='Beta')
+        self.assertEqual(count, 1)
+        self.assertEqual([text for text in fieldTexts.values()], ['Beta'])
+        count, fieldTexts = self.node.replacedFieldTexts('', re.compile(
+                                                         r'(A)(lpha)'),
+                                                         replaceText=r'\2\1')
+        self.assertEqual([text for text in fieldTexts.values()], ['lphaA'])
+        self.assertEqual(self.node.replacedFieldTexts('alpha', typeName='X',
+                                                      replaceText='B'),
+                         (0, {}))
+
+    def testMatchesFind(self):
+        text = 'Stra\u00dfe STRASSE \u0130x'
+        self.node.data['Name'] = text
+        for searchText in ('strasse', '\u0130x'.lower()):
+            findCount = self.node.searchReplace(searchText,
+                                                skipMatches=-1)[1]
+            replaceCount = self.node.replacedFieldTexts(searchText,
+                                                        replaceText='-')[0]
+            self.assertEqual(findCount, replaceCount)
+
+
+_numberingText = """<?xml version="1.0" encoding="utf-8" ?>
+<ROOT item="y" tlversion="2.0.2" uniqueid="root" line0="{*Name*}">
+<Name type="Text">Root</Name>
+<ITEM item="y" uniqueid="a" line0="{*Name*}">
+<Name type="Text">A</Name>
+<Num type="Numbering" format="1..">1</Num>
+<ITEM item="y" uniqueid="a1"><Name>A1</Name><Num>1.1</Num></ITEM>
+<ITEM item="y" uniqueid="a2"><Name>A2</Name><Num>1.5</Num></ITEM>
+</ITEM>
+</ROOT>
+"""
+
+
+@unittest.skipUnless(testsetup.qtAvailable, 'requires PyQt4')
+class NumberingTest(unittest.TestCase):
+    """Tests for updating numbering fields.
+    """
+    def setUp(self):
+        self.model, rootAttr = testsetup.loadModel(_numberingText)
+        self.nodes = self.model.nodeIdDict
+
+    def testChangedNodes(self):
+        fieldDict = self.model.formats.numberingFieldDict()
+        changedNodes = self.nodes['a'].updateNumbering(fieldDict, [1], 2)
+        self.assertEqual(changedNodes, [self.nodes['a2']])
+        self.assertEqual(self.nodes['a2'].data['Num'], '1.2')
+        self.assertEqual(self.nodes['a'].updateNumbering(fieldDict, [1], 2),
+                         [])
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,101 @@
+#!/usr/bin/env python3
+
+#******************************************************************************
+# test_treeview.py, unit tests for the filtered list view
+#
+# TreeLine, an information storage program
+# Copyright (C) 2015, Douglas W. Bell
+#
+# This is free software; you can redistribute it and/or modify it under the
+# terms of the GNU General Public License, either Version 2 or any later
+# version.  This program is distributed in the hope that it will be useful,
+# but WITTHOUT ANY WARRANTY.  See the included LICENSE file for details.
+#******************************************************************************
+
+import unittest
+from unittest import mock
+import testsetup
+
+_treeText = """<?xml version="1.0" encoding="utf-8" ?>
+<ROOT item="y" tlversion="2.0.2" uniqueid="root" line0="{*Name*}">
+<Name type="Text">Root</Name>
+<ITEM item="y" uniqueid="a" line0="{*Name*}"><Name type="Text">Ax</Name>
+<ITEM item="y" uniqueid="a1"><Name>A1</Name></ITEM>
+<ITEM item="y" uniqueid="a2"><Name>A2x</Name></ITEM>
+</ITEM>
+<ITEM item="y" uniqueid="b"><Name>Bx</Name></ITEM>
+</ROOT>
+"""
+
+
+@unittest.skipUnless(testsetup.qtAvailable, 'requires PyQt4')
+class FilterUpdateTest(unittest.TestCase):
+    """Tests for updating a filtered list in place after node edits.
+    """
+    def setUp(self):
+        import globalref
+        import treeselection
+        import treeview
+        testsetup.application()
+        self.model, rootAttr = testsetup.loadModel(_treeText)
+        self.nodes = self.model.nodeIdDict
+        globalref.genOptions.changeValue('ShowTreeIcons', False)
+        self.view = treeview.TreeFilterView(self.model,
+                                            treeselection.
+                                            TreeSelection(self.model), {})
+        self.view.filterMatchFunc = lambda node: 'x' in node.data['Name']
+        self.view.updateNodes(list(self.model.root.descendantGen()))
+
+    def rowNames(self):
+        """Return the unique IDs of the listed nodes in row order.
+        """
+        return [self.view.item(row).node.uniqueId for row in
+                range(self.view.count())]
+
+    def editName(self, uniqueId, name):
+        """Change the name of a node and record the data change.
+        """
+        node = self.nodes[uniqueId]
+        node.data['Name'] = name
+        self.model.nodeDataChanged(node)
+        return node
+
+    def testInitialRows(self):
+        self.assertEqual(self.rowNames(), ['a', 'a2', 'b'])
+
+    def testAddRemoveKeep(self):
+        kept = self.view.item(2)
+        nodes = [self.editName('a1', 'A1x'), self.editName('a2', 'A2'),
+                 self.editName('b', 'Bxx')]
+        self.view.updateNodes(nodes)
+        self.assertEqual(self.rowNames(), ['a', 'a1', 'b'])
+        self.assertIs(self.view.item(2), kept)
+        self.assertEqual(kept.text(), 'Bxx')
+
+    def testUnchangedNodes(self):
+        items = [self.view.item(row) for row in range(self.view.count())]
+        self.view.updateNodes([self.nodes['a1'], self.nodes['b']])
+        self.assertEqual([self.view.item(row) for row in
+                          range(self.view.count())], items)
+
+    def testCancelledFilter(self):
+        import globalref
+        import treeview
+        with mock.patch.object(treeview, '_filterBatchTime', -1), \
+             mock.patch.object(globalref, 'mainControl', mock.Mock()):
+            # each batch checks one node: root, then a, then a1
+            self.view.startFilter(self.model.root.descendantGen())
+            self.view.filterNextBatch()
+            self.view.filterNextBatch()
+            self.view.cancelFilter()
+        self.assertIsNone(self.view.filterNodeGen)
+        self.assertEqual(self.rowNames(), ['a'])
+        nodes = [self.editName('a1', 'A1x'), self.editName('b', 'Bxy')]
+        self.view.updateNodes(nodes)
+        self.assertEqual(self.rowNames(), ['a', 'a1'])
+        self.view.updateNodes([self.editName('a', 'A')])
+        self.assertEqual(self.rowNames(), ['a1'])
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,162 @@
+#!/usr/bin/env python3
+
+#******************************************************************************
+# testsetup.py, sets up the module path and globals for the unit tests
+#
+# TreeLine, an information storage program
+# Copyright (C) 2015, Douglas W. Bell
+#
+# This is free software; you can redistribute it and/or modify it under the
+# terms of the GNU General Public License, either Version 2 or any later
+# version.  This program is distributed in the hope that it will be useful,
+# but WITTHOUT ANY WARRANTY.  See the included LICENSE file for details.
+#******************************************************************************
+
+import sys
+import os.path
+import io
+import builtins
+
+sourcePath = os.path.join(os.path.dirname(os.path.dirname(os.path.
+                                                          abspath(__file__))),
+                          'source')
+if sourcePath not in sys.path:
+    sys.path.insert(0, sourcePath)
+
+
+def markNoTranslate(text, comment=''):
+    """Dummy translation function, as used by TreeLine without translations.
+
+    Arguments:
+        text -- the text to be translated
+        comment -- a comment used only as a guide for translators
+    """
+    return text
+
+builtins._ = markNoTranslate
+builtins.N_ = markNoTranslate
+
+try:
+    import PyQt4
+    qtAvailable = True
+except ImportError:
+    qtAvailable = False
+
+
+def initOptions():
+    """Set temporary general options with default values.
+    """
+    import globalref
+    import options
+    import optiondefaults
+    if not globalref.genOptions:
+        globalref.genOptions = options.Options()
+        optiondefaults.setGenOptionDefaults(globalref.genOptions)
+
+
+def loadModel(xmlText):
+    """Return a model and its root attributes read from TreeLine XML text.
+
+    Arguments:
+        xmlText -- the file contents as a string
+    """
+    import treeopener
+    initOptions()
+    opener = treeopener.TreeOpener()
+    model = opener.readFile(io.BytesIO(xmlText.encode('utf-8')))
+    return model, opener.rootAttr
+
+
+def application():
+    """Return the Qt application, creating it if needed for widget tests.
+    """
+    from PyQt4 import QtGui
+    return QtGui.QApplication.instance() or QtGui.QApplication(sys.argv)
+
+
+class FakeField:
+    """Minimal field with number or text compare values and math values.
+    """
+    def __init__(self, name, isNumber=False):
+        self.name = name
+        self.isNumber = isNumber
+
+    def compareValue(self, node):
+        value = node.data.get(self.name, '')
+        if self.isNumber:
+            try:
+                return float(value)
+            except ValueError:
+                return value
+        return value.lower()
+
+    def adjustedCompareValue(self, value):
+        if self.isNumber:
+            return float(value)
+        return value.lower()
+
+    def mathValue(self, node, zeroBlanks=True):
+        text = node.data.get(self.name, '')
+        if not text:
+            return 0 if zeroBlanks else None
+        return int(text) if text.isdigit() else float(text)
+
+
+class FakeFormat:
+    """Minimal node format with a dict of fields.
+    """
+    def __init__(self, name, fields=()):
+        self.name = name
+        self.fieldDict = {field.name: field for field in fields}
+
+
+class FakeNode:
+    """Minimal node with field data, an optional format and model ref.
+
+    Search strings use the Name field as the title and the Notes field.
+    """
+    def __init__(self, uniqueId='', nodeFormat=None, modelRef=None, **data):
+        self.uniqueId = uniqueId
+        self.format = nodeFormat
+        self.formatName = nodeFormat.name if nodeFormat else 'ITEM'
+        self.modelRef = modelRef
+        self.data = data
+        self.parent = None
+        self.childList = []
+
+    def nodeFormat(self):
+        return self.format
+
+    def searchStrings(self):
+        title = self.data.get('Name', '')
+        text = '\n'.join((title, self.data.get('Notes', '')))
+        return (text, len(title), text.lower(), len(title))
+
+
+class FakeModel:
+    """Minimal model with a flat list of nodes in tree order.
+
+    Records data change notices and holds the math settings.
+    """
+    def __init__(self, nodes=()):
+        self.nodes = list(nodes)
+        self.root = self.nodes[0] if self.nodes else None
+        self.formats = object()
+        self.treePosDict = None
+        self.changedNodes = []
+        self.aggregateStamp = 0
+        self.childAggregates = {}
+        self.mathZeroBlanks = True
+        self.mathDecimalDigits = 0
+
+    def treePosition(self, node):
+        if self.treePosDict is None:
+            self.treePosDict = {node: (pos, pos) for pos, node in
+                                enumerate(self.nodes)}
+        return self.treePosDict[node][0]
+
+    def externalTitleTypes(self):
+        return {}
+
+    def nodeDataChanged(self, node):
+        self.changedNodes.append(node)